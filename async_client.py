@@ -0,0 +1,185 @@
+"""Native asyncio WatsonX client.
+
+`AsyncWatsonXClient` mirrors `WatsonXClient.generate` (same payload, same
+response JSON, so `extract_text_from_response` works on its results) but
+runs on aiohttp, so one event loop can keep thousands of prompts in flight
+without a thread per call. A semaphore bounds concurrency; cancelling a
+`generate` task releases its connection and its semaphore slot, and so
+does running out of the call's `deadline`.
+
+Requires the optional `aiohttp` package.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Union
+
+from deadline import Deadline, DeadlineExceeded
+from token_manager import IAM_URL, IAMTokenManager
+from watsonx_client import CHAT_PATH, build_chat_payload
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIAMTokenManager(IAMTokenManager):
+    """IAM token manager whose refreshes run on the event loop.
+
+    Shares the expiry tracking and on-disk token cache of `IAMTokenManager`;
+    concurrent coroutines wait on a single refresh instead of starting one each.
+    """
+
+    def __init__(self, api_key: str, iam_url: str = IAM_URL, **kwargs):
+        kwargs['background_refresh'] = False
+        super().__init__(api_key, iam_url=iam_url, **kwargs)
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_token_async(self, session: 'aiohttp.ClientSession') -> str:
+        """Return a valid access token, refreshing it on the event loop if stale."""
+        if self._is_fresh():
+            return self.access_token
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self._is_fresh():
+                return self.access_token
+            # Reads are safe without the file lock: the cache is replaced atomically
+            if self._load_cache():
+                return self.access_token
+            headers, data = self._token_request()
+            logger.info('Requesting access token from IBM IAM...')
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.post(self.iam_url, headers=headers, data=data, timeout=timeout) as resp:
+                resp.raise_for_status()
+                self._accept_token_response(await resp.json(content_type=None))
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._store_cache_with_lock)
+            return self.access_token
+
+    def _store_cache_with_lock(self) -> None:
+        with self._cache_file_lock():
+            self._store_cache()
+
+    async def invalidate_async(self, token: Optional[str] = None) -> None:
+        """`invalidate` on the default executor, since it may wait on the cache file lock."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.invalidate, token)
+
+
+class AsyncWatsonXClient:
+    """Asyncio client for WatsonX text generation with bounded concurrency."""
+
+    def __init__(self, base_url: str, api_key: str, project_id: str, model: str, use_api_key_direct: bool = False,
+                 max_concurrency: int = 64, limit_per_host: int = 0, timeout: float = 60,
+                 token_manager: Optional[AsyncIAMTokenManager] = None,
+                 session: Optional['aiohttp.ClientSession'] = None, iam_url: str = IAM_URL):
+        """Initialize the async client.
+
+        Args:
+            base_url: e.g., 'https://us-south.ml.cloud.ibm.com'
+            api_key: IBM API key
+            project_id: WatsonX project ID
+            model: Model ID (e.g., 'ibm/granite-4-h-small')
+            use_api_key_direct: Send the API key as the bearer token (no IAM exchange)
+            max_concurrency: Maximum number of requests in flight at once
+            limit_per_host: Connection pool limit per host (0 = no extra limit)
+            timeout: Total timeout in seconds for each generate call
+            token_manager: Token manager to share with other async clients
+            session: Existing aiohttp session to use (not closed by `aclose`)
+            iam_url: IAM token endpoint (for a private or test IAM service)
+        """
+        if aiohttp is None:
+            raise RuntimeError('aiohttp package not installed')
+        self.base_url = base_url.rstrip('/')
+        self.project_id = project_id
+        self.model = model
+        self.api_key = api_key
+        self.use_api_key_direct = bool(use_api_key_direct)
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.token_manager = None if self.use_api_key_direct else (
+            token_manager or AsyncIAMTokenManager(api_key, iam_url=iam_url))
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _get_session(self) -> 'aiohttp.ClientSession':
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def _current_token(self, session: 'aiohttp.ClientSession') -> str:
+        if self.token_manager is None:
+            return self.api_key
+        return await self.token_manager.get_token_async(session)
+
+    async def generate(self, prompt: str, max_tokens: int = 512,
+                       deadline: Union[Deadline, float, None] = None, **kwargs) -> Dict[str, Any]:
+        """Generate text using WatsonX chat endpoint.
+
+        Args:
+            prompt: The input text to generate from
+            max_tokens: Maximum tokens to generate (default 512)
+            deadline: Time budget for the whole call (token refresh, waiting for a
+                slot and the request), in seconds or as a shared `Deadline`
+            **kwargs: Additional parameters (temperature, top_p, etc.)
+
+        Returns:
+            Response JSON from WatsonX
+
+        Raises:
+            aiohttp.ClientResponseError: On a non-2xx response
+            DeadlineExceeded: The budget ran out; the request is cancelled
+        """
+        deadline = Deadline.coerce(deadline)
+        budget = deadline.timeout()
+        if budget is None:
+            return await self._generate(prompt, max_tokens, kwargs)
+        try:
+            return await asyncio.wait_for(self._generate(prompt, max_tokens, kwargs), budget)
+        except asyncio.TimeoutError:
+            if not deadline.expired:
+                raise  # the per-request timeout, not the budget
+            raise DeadlineExceeded('deadline exceeded') from None
+
+    async def _generate(self, prompt: str, max_tokens: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.base_url}{CHAT_PATH}"
+        payload = build_chat_payload(self.model, self.project_id, prompt, max_tokens, **kwargs)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with self._semaphore:
+            session = await self._get_session()
+            for attempt in range(2):
+                token = await self._current_token(session)
+                headers = {
+                    'Authorization': f'Bearer {token}',
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                }
+                async with session.post(url, headers=headers, json=payload, timeout=timeout) as resp:
+                    if resp.status == 401 and self.token_manager is not None and attempt == 0:
+                        await self.token_manager.invalidate_async(token)
+                        continue
+                    if resp.status != 200 and logger.isEnabledFor(logging.WARNING):
+                        logger.warning("WatsonX error %s: %s", resp.status, (await resp.text())[:500])
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+
+    async def aclose(self) -> None:
+        """Close the HTTP session if this client created it."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -0,0 +1,235 @@
+"""Resumable JSONL batch runner.
+
+Streams prompts from a JSONL file through the configured client (see
+main.py / .env) with bounded concurrency and appends one result per line
+to an output JSONL file as soon as it completes.
+
+Input lines are either a JSON string or an object:
+    {"id": "q1", "prompt": "What is 2+2?", "params": {"max_tokens": 50}}
+`id` defaults to the 1-based line number and `params` to the CLI defaults.
+A line that isn't valid JSON or has no `prompt` is not sent; an error
+record with its line number is written instead (once: a resumed run skips
+line numbers already recorded) and the batch goes on.
+
+Output lines:
+    {"id": "q1", "text": "...", "usage": {...}, "latency_ms": 812.4, "error": null}
+    {"id": "7", "text": null, "usage": null, "latency_ms": null, "error": "line 7: KeyError: 'prompt'", "line": 7}
+
+The output file doubles as the checkpoint: on restart, ids already written
+without an error are skipped, so a crashed run resumes where it stopped.
+Failed items are retried on the next run; for an id that appears more than
+once, the last line wins.
+
+Usage:
+    python batch_runner.py prompts.jsonl results.jsonl [--concurrency 16] [--max-tokens 512]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from main import create_client
+from watsonx_client import extract_text_from_response
+
+
+def load_checkpoint(path: str) -> Tuple[Set[str], Set[int]]:
+    """Return the ids answered successfully and the invalid input line numbers recorded in an output file."""
+    done: Set[str] = set()
+    invalid_lines: Set[int] = set()
+    if not os.path.exists(path):
+        return done, invalid_lines
+    # errors='replace' so a multibyte character torn by a crash only spoils its own line
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            if record.get('error') is None:
+                done.add(str(record.get('id')))
+            else:
+                done.discard(str(record.get('id')))
+                if isinstance(record.get('line'), int):
+                    invalid_lines.add(record['line'])
+    return done, invalid_lines
+
+
+def load_completed_ids(path: str) -> Set[str]:
+    """Return ids already answered successfully in an existing output file."""
+    return load_checkpoint(path)[0]
+
+
+def truncate_torn_line(path: str) -> None:
+    """Cut a partial final line (left by a crash) off an output file so appends start on a fresh line.
+
+    Works on bytes, since the tear may fall inside a multibyte UTF-8 character.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(pos - 4096, 0)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            if pos == end and chunk.endswith(b'\n'):
+                return
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+def iter_items(path: str, skip: Set[str], stats: Dict[str, int],
+               invalid: Optional[List[Dict[str, Any]]] = None,
+               recorded_lines: Set[int] = frozenset()) -> Iterator[Dict[str, Any]]:
+    """Lazily read input items, skipping ids in `skip`.
+
+    Lines that can't be parsed are appended to `invalid` as error records
+    (or skipped if it is None) instead of ending the batch; those whose
+    line number is in `recorded_lines` already have one and are skipped.
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item_id = str(line_no)
+            try:
+                record = json.loads(line)
+                if isinstance(record, str):
+                    record = {'prompt': record}
+                elif not isinstance(record, dict):
+                    raise ValueError(f'expected a JSON string or object, got {type(record).__name__}')
+                item_id = str(record.get('id', line_no))
+                prompt = record['prompt']
+            except (ValueError, KeyError) as e:
+                if line_no in recorded_lines:
+                    stats['skipped'] += 1
+                    continue
+                stats['invalid'] = stats.get('invalid', 0) + 1
+                if invalid is not None:
+                    invalid.append({'id': item_id, 'text': None, 'usage': None, 'latency_ms': None,
+                                    'error': f'line {line_no}: {type(e).__name__}: {e}', 'line': line_no})
+                continue
+            if item_id in skip:
+                stats['skipped'] += 1
+                continue
+            yield {'id': item_id, 'prompt': prompt, 'params': record.get('params') or {}}
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+class Progress:
+    """Tracks throughput and a sliding window of latencies for live reporting."""
+
+    def __init__(self, interval: float, window: int = 10000):
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        """Count one finished item; `latency` is None for items never sent (e.g. unparseable lines)."""
+        self.completed += 1
+        if not ok:
+            self.failed += 1
+        if latency is not None:
+            self.latencies.append(latency)
+        if time.monotonic() - self.last_report >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        now = time.monotonic()
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        lat = sorted(self.latencies)
+        label = 'done' if final else 'progress'
+        print(f'[{label}] {self.completed} completed ({self.failed} failed) in {elapsed:.1f}s, '
+              f'{self.completed / elapsed:.2f} req/s, latency ms p50={_percentile(lat, 0.50) * 1000:.0f} '
+              f'p95={_percentile(lat, 0.95) * 1000:.0f} p99={_percentile(lat, 0.99) * 1000:.0f}',
+              file=sys.stderr, flush=True)
+
+
+def run(client, input_path: str, output_path: str, concurrency: int = 16,
+        progress_interval: float = 5.0, fsync_interval: float = 1.0, **params) -> Progress:
+    """Run every pending item in `input_path` and append results to `output_path`."""
+    truncate_torn_line(output_path)
+    completed, recorded_lines = load_checkpoint(output_path)
+    stats = {'skipped': 0, 'invalid': 0}
+    invalid: List[Dict[str, Any]] = []
+    progress = Progress(progress_interval)
+
+    def write_invalid():
+        # iter_items runs on this thread (generate_many pulls items lazily), so the list needs no lock
+        while invalid:
+            out.write(json.dumps(invalid.pop(0), ensure_ascii=False) + '\n')
+            progress.record(None, False)
+        out.flush()
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        last_sync = time.monotonic()
+        items = iter_items(input_path, completed, stats, invalid, recorded_lines)
+        for result in client.generate_many(items, concurrency=concurrency, ordered=False, **params):
+            write_invalid()
+            record = {'id': result.item['id'], 'text': None, 'usage': None,
+                      'latency_ms': round(result.elapsed * 1000, 1), 'error': None}
+            if result.ok:
+                record['text'] = extract_text_from_response(result.response)
+                if isinstance(result.response, dict):
+                    record['usage'] = result.response.get('usage')
+            else:
+                record['error'] = f'{type(result.error).__name__}: {result.error}'
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            if time.monotonic() - last_sync >= fsync_interval:
+                os.fsync(out.fileno())
+                last_sync = time.monotonic()
+            progress.record(result.elapsed, result.ok)
+        write_invalid()
+        os.fsync(out.fileno())
+
+    if stats['invalid']:
+        print(f'[input] {stats["invalid"]} invalid lines in {input_path} recorded as errors', file=sys.stderr)
+    if stats['skipped']:
+        print(f'[resume] skipped {stats["skipped"]} items already in {output_path}', file=sys.stderr)
+    progress.report(final=True)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a JSONL file of prompts through WatsonX.')
+    parser.add_argument('input', help='input JSONL file')
+    parser.add_argument('output', help='output JSONL file (appended to; also the resume checkpoint)')
+    parser.add_argument('--concurrency', type=int, default=16, help='requests in flight (default 16)')
+    parser.add_argument('--max-tokens', type=int, default=512, help='default max_tokens per prompt')
+    parser.add_argument('--temperature', type=float, help='default temperature per prompt')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='seconds between progress lines')
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    client = create_client()
+    params = {'max_tokens': args.max_tokens}
+    if args.temperature is not None:
+        params['temperature'] = args.temperature
+    progress = run(client, args.input, args.output, concurrency=args.concurrency,
+                   progress_interval=args.progress_interval, **params)
+    sys.exit(1 if progress.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
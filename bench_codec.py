@@ -0,0 +1,115 @@
+"""Microbenchmark: client CPU spent encoding requests and decoding responses, by prompt size.
+
+For each prompt size (RAG-style text with some non-ASCII), measures per request:
+
+- encoding the chat payload the way `requests` does for ``json=`` (stdlib
+  `json.dumps`) against `codec.PayloadTemplate` with the stdlib codec and,
+  when installed, with orjson;
+- gzip time, compressed size and the upload time saved at `--mbps`;
+- decoding a response whose answer is a tenth of the prompt size with
+  ``resp.json()`` against `codec.loads`, plus `extract_text_from_response`.
+
+Usage:
+    python bench_codec.py [--sizes 1,10,50,100] [--mbps 20] [--seconds 0.5]
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+
+import requests
+
+import codec
+from watsonx_client import build_chat_payload, extract_text_from_response
+
+WORDS = ('the', 'revenue', 'quarter', 'policy', 'customer', 'contract', 'année', 'größe', 'naïve', 'data',
+         'shipment', 'invoice', 'clause', 'section', 'warranty', 'latency', 'region', '2024', 'total', 'über')
+
+
+def text_of(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+
+def per_call_us(fn, seconds: float) -> float:
+    n, start = 0, time.perf_counter()
+    while True:
+        fn()
+        n += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return round(elapsed / n * 1e6, 1)
+
+
+def fake_response(body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.headers['Content-Type'] = 'application/json'
+    resp._content = body
+    return resp
+
+
+def bench_size(kb: int, args) -> dict:
+    prompt = text_of(kb * 1024)
+    model, project = 'ibm/granite-4-h-small', '7398bce0-0000-0000-0000-000000000000'
+    template = codec.PayloadTemplate({'model_id': model, 'project_id': project})
+
+    def build():
+        return build_chat_payload(model, project, prompt, 512, temperature=0.2)
+
+    report = {'encode_us': {'requests_json': per_call_us(lambda: json.dumps(build(), allow_nan=False).encode('utf-8'),
+                                                         args.seconds)}}
+    fast = codec.orjson
+    codec.orjson = None
+    try:
+        report['encode_us']['template_stdlib'] = per_call_us(lambda: template.encode(build()), args.seconds)
+    finally:
+        codec.orjson = fast
+    if fast is not None:
+        report['encode_us']['template_orjson'] = per_call_us(lambda: template.encode(build()), args.seconds)
+
+    body = template.encode(build())
+    compressed = gzip.compress(body, compresslevel=codec.GZIP_LEVEL, mtime=0)
+    report['gzip'] = {
+        'body_bytes': len(body),
+        'gzip_bytes': len(compressed),
+        'ratio': round(len(compressed) / len(body), 3),
+        'compress_us': per_call_us(lambda: gzip.compress(body, compresslevel=codec.GZIP_LEVEL, mtime=0), args.seconds),
+        'upload_saved_us': round((len(body) - len(compressed)) * 8 / (args.mbps * 1e6) * 1e6, 1),
+    }
+
+    answer = text_of(max(kb * 1024 // 10, 64), seed=1)
+    response = json.dumps({
+        'id': 'chat-1', 'model_id': model, 'created': 1700000000,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': kb * 256, 'completion_tokens': len(answer) // 4, 'total_tokens': kb * 300},
+    }).encode('utf-8')
+    report['decode_us'] = {
+        'response_bytes': len(response),
+        'resp_json': per_call_us(lambda: fake_response(response).json(), args.seconds),
+        'codec_loads': per_call_us(lambda: codec.loads(fake_response(response).content), args.seconds),
+        'extract_text': per_call_us(lambda: extract_text_from_response(codec.loads(response)), args.seconds),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1,10,50,100', help='prompt sizes in KiB, comma-separated')
+    parser.add_argument('--mbps', type=float, default=20.0, help='uplink speed for the upload-time estimate')
+    parser.add_argument('--seconds', type=float, default=0.5, help='measuring time per case')
+    args = parser.parse_args()
+
+    report = {'orjson': codec.orjson is not None, 'gzip_level': codec.GZIP_LEVEL,
+              'sizes': {f'{kb}KiB': bench_size(kb, args) for kb in (int(s) for s in args.sizes.split(','))}}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark: embedding texts one request at a time vs batched.
+
+Starts the local stand-in (stub_server.py), whose `/ml/v1/text/embeddings`
+answers after `--latency` seconds, and embeds the same texts three ways:
+one `embed([text])` request per text, one chunked `embed(texts)` call, and
+`embed_one` from many threads (micro-batched). Checks that every mode
+returns the same vectors in input order.
+
+Usage:
+    python bench_embed.py [-n 2000] [--latency 0.02] [--threads 32] [--sequential 200]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stub_server import StubConfig, start_stub_server
+from watsonx_client import WatsonXClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help='texts to embed')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per embeddings request')
+    parser.add_argument('--threads', type=int, default=32, help='threads calling embed_one')
+    parser.add_argument('--sequential', type=int, default=200,
+                        help='texts embedded one request at a time (extrapolated to -n)')
+    args = parser.parse_args()
+
+    config = StubConfig(latency=f'fixed:{args.latency}', require_auth=False)
+    server, base = start_stub_server(config)
+    client = WatsonXClient(base, 'bench-key', 'bench-project', 'bench-model', use_api_key_direct=True)
+    texts = [f'document {i}: ' + 'lorem ipsum dolor sit amet ' * (1 + i % 8) for i in range(args.n)]
+
+    try:
+        sample = texts[:args.sequential]
+        start = time.perf_counter()
+        single = np.vstack([client.embed([text]) for text in sample])
+        per_text = (time.perf_counter() - start) / len(sample)
+
+        start = time.perf_counter()
+        batched = client.embed(texts)
+        batched_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            micro = np.vstack(list(pool.map(client.embed_one, texts)))
+        micro_time = time.perf_counter() - start
+        batcher = client._embed_batchers[client.embed_model].stats()
+    finally:
+        server.shutdown()
+
+    assert batched.dtype == np.float32 and batched.flags['C_CONTIGUOUS'] and batched.shape[0] == args.n
+    assert np.array_equal(single, batched[:len(sample)]) and np.array_equal(micro, batched)
+
+    print(f'{args.n} texts, {args.latency * 1000:.0f} ms per request, dim {batched.shape[1]}')
+    print(f'one request per text   {per_text * args.n:8.2f} s (extrapolated from {len(sample)})')
+    print(f'embed(texts)           {batched_time:8.2f} s')
+    print(f"embed_one x{args.threads} threads  {micro_time:8.2f} s ({batcher['batches']} requests, "
+          f"{batcher['mean_batch']:.1f} texts each)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: interactive latency while a bulk job saturates the shared limits.
+
+Starts the local stand-in (stub_server.py), which answers 429 above
+`--server-concurrency` requests in flight. One client per lane shares a
+`RateGovernor` (and, in the second run, a `LaneScheduler`). `--bulk`
+threads then call `generate` back to back while one interactive caller
+sends a request every `--interval` seconds. The interactive latency
+percentiles, the bulk throughput and the scheduler's per-lane stats are
+printed for both runs, without lanes and with them.
+
+Usage:
+    python bench_lanes.py [--bulk 64] [--latency 0.2] [--server-concurrency 16] [--duration 10]
+"""
+import argparse
+import json
+import threading
+import time
+
+from rate_limit import AIMDController, RateGovernor
+from scheduler import LaneScheduler
+from stub_server import StubConfig, start_stub_server
+from watsonx_client import WatsonXClient
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)] if sorted_values else 0.0
+
+
+def run(base: str, args, use_lanes: bool):
+    governor = RateGovernor(concurrency=AIMDController(initial=args.server_concurrency,
+                                                       maximum=args.server_concurrency * 2))
+    scheduler = LaneScheduler(max_concurrency=args.server_concurrency, governor=governor) if use_lanes else None
+    common = dict(use_api_key_direct=True, rate_governor=governor, scheduler=scheduler)
+    interactive = WatsonXClient(base, 'bench-key', 'bench-project', 'bench-model', lane='interactive', **common)
+    bulk = WatsonXClient(base, 'bench-key', 'bench-project', 'bench-model', lane='bulk', **common)
+
+    stop = threading.Event()
+    bulk_done = [0]
+    lock = threading.Lock()
+
+    def bulk_worker(n: int) -> None:
+        i = 0
+        while not stop.is_set():
+            try:
+                bulk.generate(f'bulk {n}-{i}', max_tokens=64, tenant=f'job-{n % 4}')
+                with lock:
+                    bulk_done[0] += 1
+            except Exception:
+                pass
+            i += 1
+
+    threads = [threading.Thread(target=bulk_worker, args=(n,), daemon=True) for n in range(args.bulk)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+
+    latencies = []
+    start = time.monotonic()
+    i = 0
+    while time.monotonic() - start < args.duration:
+        t0 = time.perf_counter()
+        interactive.generate(f'interactive {i}', max_tokens=64)
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+        time.sleep(max(args.interval - latencies[-1], 0.0))
+    elapsed = time.monotonic() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'interactive_ms': {q: round(percentile(latencies, p) * 1000, 1)
+                           for q, p in (('p50', 0.50), ('p95', 0.95), ('max', 1.0))},
+        'bulk_per_second': round(bulk_done[0] / (elapsed + args.warmup), 1),
+        'governor': governor.stats(),
+        'lanes': scheduler.stats()['lanes'] if scheduler else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bulk', type=int, default=64, help='bulk threads calling generate back to back')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per chat request')
+    parser.add_argument('--server-concurrency', type=int, default=16, help='in-flight requests before 429s')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of interactive traffic per run')
+    parser.add_argument('--interval', type=float, default=0.25, help='seconds between interactive requests')
+    parser.add_argument('--warmup', type=float, default=1.0, help='seconds of bulk load before measuring')
+    args = parser.parse_args()
+
+    config = StubConfig(latency=f'fixed:{args.latency}', max_concurrency=args.server_concurrency,
+                        retry_after=0.1, require_auth=False)
+    server, base = start_stub_server(config)
+    try:
+        report = {'without_lanes': run(base, args, False), 'with_lanes': run(base, args, True)}
+    finally:
+        server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
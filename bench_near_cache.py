@@ -0,0 +1,132 @@
+"""Benchmark NearDuplicateCache lookup cost and hit rate on a synthetic FAQ corpus.
+
+Builds a cache of distinct synthetic questions, then queries it with
+variants of cached questions (casing, whitespace and punctuation changes,
+a typo, a dropped word) and with questions that were never cached.
+Reports build time, lookup latency percentiles, the hit rate per variant
+kind, the wrong-hit rate (a hit on a different question) and, optionally,
+traced memory.
+
+Usage:
+    python bench_near_cache.py [--entries 100000] [--queries 20000] [--threshold 0.8]
+        [--trace-memory] [--json near_cache.json] [--max-p99-us 1000]
+
+Use ``--entries 1000000`` to check lookup cost at a million entries.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from near_cache import NearDuplicateCache
+
+OPENERS = ['How do I', 'Can I', 'What is the best way to', 'Is it possible to', 'Why can\'t I', 'Where do I']
+VERBS = ['reset', 'change', 'export', 'delete', 'configure', 'upgrade', 'cancel', 'share', 'restore', 'rename']
+
+
+def make_vocabulary(rng: random.Random, size: int = 20000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_question(rng: random.Random, vocabulary) -> str:
+    nouns = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(2, 4)))
+    tail = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+    return f'{rng.choice(OPENERS)} {rng.choice(VERBS)} my {nouns} in the {tail}?'
+
+
+def variant(rng: random.Random, question: str, kind: str) -> str:
+    if kind == 'format':
+        text = question.upper() if rng.random() < 0.5 else question.lower()
+        return '  ' + text.replace(' ', '   ', 2).rstrip('?') + ' ??'
+    words = question.split()
+    if kind == 'typo':
+        i = rng.randrange(len(words))
+        word = words[i]
+        if len(word) > 3:
+            j = rng.randrange(1, len(word) - 1)
+            words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+        return ' '.join(words)
+    if kind == 'drop_word':
+        del words[rng.randrange(1, len(words))]
+        return ' '.join(words)
+    raise ValueError(kind)
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the near-duplicate prompt cache.')
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=20_000)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--trace-memory', action='store_true', help='report traced memory of the index')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--max-p99-us', type=float, help='fail if p99 lookup latency exceeds this')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    questions = list({make_question(rng, vocabulary) for _ in range(args.entries)})
+    cache = NearDuplicateCache(threshold=args.threshold, max_entries=len(questions))
+
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for i, question in enumerate(questions):
+        cache.add(question, i)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] if args.trace_memory else None
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    kinds = ('format', 'typo', 'drop_word', 'novel')
+    results = {kind: {'queries': 0, 'hits': 0, 'wrong_hits': 0} for kind in kinds}
+    latencies = []
+    for _ in range(args.queries):
+        kind = rng.choice(kinds)
+        if kind == 'novel':
+            expected, query = None, make_question(rng, vocabulary)
+        else:
+            expected = rng.randrange(len(questions))
+            query = variant(rng, questions[expected], kind)
+        t0 = time.perf_counter()
+        hit = cache.lookup(query)
+        latencies.append(time.perf_counter() - t0)
+        stats = results[kind]
+        stats['queries'] += 1
+        if hit is not None:
+            stats['hits'] += 1
+            if hit[0] != expected:
+                stats['wrong_hits'] += 1
+
+    latencies.sort()
+    report = {
+        'entries': len(cache),
+        'build_seconds': round(build, 2),
+        'insert_us': round(build / len(questions) * 1e6, 1),
+        'lookup_us': {q: round(percentile(latencies, p) * 1e6, 1)
+                      for q, p in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        'hit_rate': {kind: round(s['hits'] / max(s['queries'], 1), 4) for kind, s in results.items()},
+        'wrong_hit_rate': {kind: round(s['wrong_hits'] / max(s['queries'], 1), 4) for kind, s in results.items()},
+        'cache': cache.stats(),
+    }
+    if memory is not None:
+        report['traced_bytes_per_entry'] = memory // max(len(cache), 1)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.max_p99_us is not None and report['lookup_us']['p99'] > args.max_p99_us:
+        print(f"[FAIL] p99 lookup {report['lookup_us']['p99']} us > {args.max_p99_us} us", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Startup benchmark: import time and client construction time.
+
+Each measurement runs in a fresh interpreter (median of --runs), because
+short-lived CLI and serverless invocations pay these costs on every start:
+
+- import time of the CLI entry modules, and which heavy packages
+  (`requests`, `openai`, `aiohttp`) importing them drags in
+- time to build a WatsonX client from the environment while the IAM
+  endpoint (the local stand-in) is slow, which should not wait for IAM
+
+Usage:
+    python bench_startup.py [--runs 5] [--iam-latency 0.5] [--json startup.json]
+        [--max-import-ms 300] [--max-construct-ms 500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from stub_server import StubConfig, start_stub_server
+
+ENTRY_MODULES = ('main', 'providers', 'watson_connect', 'watsonx_client')
+HEAVY_MODULES = ('requests', 'openai', 'aiohttp')
+# Entry points that must stay free of heavy imports until a client is created
+LIGHT_MODULES = ('main', 'providers')
+
+IMPORT_SNIPPET = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+CONSTRUCT_SNIPPET = '''
+import json, time
+start = time.perf_counter()
+from providers import client_from_env
+client = client_from_env('watsonx')
+print(json.dumps({"seconds": time.perf_counter() - start}))
+'''
+
+
+def run_snippet(code: str, env=None) -> dict:
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def median_ms(samples) -> float:
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import and client construction time.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--iam-latency', type=float, default=0.5, help='seconds the stand-in IAM takes to answer')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--max-import-ms', type=float, help='fail if importing main takes longer')
+    parser.add_argument('--max-construct-ms', type=float, help='fail if building a client takes longer')
+    args = parser.parse_args()
+
+    report = {'runs': args.runs, 'import_ms': {}, 'heavy_imports': {}}
+    for module in ENTRY_MODULES:
+        results = [run_snippet(IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)) for _ in range(args.runs)]
+        report['import_ms'][module] = median_ms([r['seconds'] for r in results])
+        report['heavy_imports'][module] = results[0]['heavy']
+
+    server, url = start_stub_server(StubConfig(iam_latency=f'fixed:{args.iam_latency}'))
+    try:
+        env = dict(os.environ, PROVIDER='watsonx', WATSONX_BASE_URL=url, WATSONX_API_KEY='bench-key',
+                   WATSONX_PROJECT_ID='bench-project', MODEL='stub/model',
+                   WATSONX_IAM_URL=f'{url}/identity/token', HOME=os.environ.get('HOME', '/tmp'))
+        samples = [run_snippet(CONSTRUCT_SNIPPET, env)['seconds'] for _ in range(args.runs)]
+        report['construct_ms'] = median_ms(samples)
+        report['iam_requests_during_construct'] = server.state.counts['iam']
+    finally:
+        server.shutdown()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    failures = [f'importing {m} pulls in {", ".join(report["heavy_imports"][m])}'
+                for m in LIGHT_MODULES if report['heavy_imports'][m]]
+    if report['iam_requests_during_construct']:
+        failures.append('client construction contacted IAM')
+    if args.max_import_ms is not None and report['import_ms']['main'] > args.max_import_ms:
+        failures.append(f"import main {report['import_ms']['main']} ms > {args.max_import_ms} ms")
+    if args.max_construct_ms is not None and report['construct_ms'] > args.max_construct_ms:
+        failures.append(f"construct {report['construct_ms']} ms > {args.max_construct_ms} ms")
+    if failures:
+        print('[FAIL] ' + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark: time-to-first-token with streaming vs a blocking generate call.
+
+Starts the local stand-in (stub_server.py) for `/ml/v1/text/chat` and
+`/ml/v1/text/chat_stream`, which emits one token every `--token-delay`
+seconds, then measures how long the user waits before seeing any text with
+`generate` and `stream_generate`.
+
+Usage:
+    python bench_stream.py [-n 10] [--tokens 50] [--token-delay 0.02]
+"""
+import argparse
+import statistics
+import time
+
+from stub_server import StubConfig, start_stub_server
+from watsonx_client import WatsonXClient, extract_text_from_response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=10, help='requests per mode')
+    parser.add_argument('--tokens', type=int, default=50, help='tokens per completion')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='seconds between tokens')
+    args = parser.parse_args()
+
+    config = StubConfig(token_delay=args.token_delay, completion_tokens=args.tokens, require_auth=False)
+    server, base = start_stub_server(config)
+    client = WatsonXClient(base, 'bench-key', 'bench-project', 'bench-model', use_api_key_direct=True)
+
+    blocking, ttft, total = [], [], []
+    try:
+        for _ in range(args.n):
+            start = time.perf_counter()
+            extract_text_from_response(client.generate('hello'))
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            first = None
+            for delta in client.stream_generate('hello'):
+                if first is None and delta.content:
+                    first = time.perf_counter() - start
+            ttft.append(first)
+            total.append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+
+    def ms(values):
+        return statistics.median(values) * 1000
+
+    print(f'{args.n} requests, {args.tokens} tokens at {args.token_delay * 1000:.0f} ms/token')
+    print(f'generate         time to first text {ms(blocking):8.1f} ms (p50)')
+    print(f'stream_generate  time to first text {ms(ttft):8.1f} ms (p50), full answer {ms(total):8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark: per-request latency with fresh connections vs the pooled transport.
+
+Starts a local stand-in for the WatsonX chat endpoint and sends the same
+short-prompt request N times, first with module-level `requests.post`
+(new connection per call) and then through `PooledTransport`.
+
+Usage:
+    python bench_transport.py [-n 200] [--certfile cert.pem --keyfile key.pem]
+
+Pass a certificate/key pair to serve over TLS, where the handshake saving
+is largest; without one the server speaks plain HTTP.
+"""
+import argparse
+import json
+import ssl
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from transport import PooledTransport
+
+CHAT_RESPONSE = json.dumps({
+    'choices': [{'message': {'role': 'assistant', 'content': 'Paris'}}],
+    'usage': {'prompt_tokens': 8, 'completion_tokens': 1, 'total_tokens': 9},
+}).encode()
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(CHAT_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(CHAT_RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(certfile=None, keyfile=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ChatHandler)
+    scheme = 'http'
+    if certfile:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(certfile, keyfile)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'{scheme}://127.0.0.1:{server.server_address[1]}'
+
+
+def _run(post, url, n, verify):
+    payload = {'model_id': 'bench', 'project_id': 'bench',
+               'messages': [{'role': 'user', 'content': 'What is the capital of France?'}]}
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = post(url, json=payload, timeout=10, verify=verify)
+        resp.raise_for_status()
+        resp.json()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{name:<22} mean {statistics.mean(latencies):7.3f} ms   '
+          f'p50 {statistics.median(latencies):7.3f} ms   p95 {p95:7.3f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=200, help='requests per mode')
+    parser.add_argument('--certfile', help='PEM certificate to serve TLS')
+    parser.add_argument('--keyfile', help='PEM private key to serve TLS')
+    args = parser.parse_args()
+
+    server, base = _start_server(args.certfile, args.keyfile)
+    url = f'{base}/ml/v1/text/chat?version=2023-05-29'
+    verify = False if args.certfile else True
+    if not verify:
+        requests.packages.urllib3.disable_warnings()
+
+    try:
+        fresh = _run(requests.post, url, args.n, verify)
+        with PooledTransport() as transport:
+            pooled = _run(transport.post, url, args.n, verify)
+            stats = transport.stats_snapshot()
+    finally:
+        server.shutdown()
+
+    print(f'{args.n} requests per mode against {base}')
+    _report('requests.post (fresh)', fresh)
+    _report('PooledTransport', pooled)
+    print(f"pooled connections: opened={stats['connections_opened']} reused={stats['connections_reused']}")
+    print(f'mean latency reduction: {(1 - statistics.mean(pooled) / statistics.mean(fresh)) * 100:.1f}%')
+
+
+if __name__ == '__main__':
+    main()
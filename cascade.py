@@ -0,0 +1,285 @@
+"""Model cascade: answer with a small, fast model and escalate only when needed.
+
+`CascadeClient` holds an ordered list of tiers (cheapest/fastest model
+first). Each prompt goes to the first tier, and the answer is checked by a
+validator. Only a rejected answer (or an endpoint failure such as a 429 or
+5xx) moves the prompt to the next, larger model. The last tier's answer is
+returned as is. Most simple traffic never pays large-model latency:
+
+    cascade = CascadeClient.from_models(
+        ['ibm/granite-3-2b-instruct', 'ibm/granite-4-h-small'],
+        base_url=url, api_key=key, project_id=project,
+        validator=all_of(min_length(20), confidence_heuristic()))
+    cascade.generate('Summarize ...')
+    cascade.stats()      # per-tier hit rate, escalations and latency percentiles
+
+A validator is any ``callable(text, response) -> bool``. `min_length`,
+`max_length`, `matches`, `json_validator` and `confidence_heuristic` are
+included, and `all_of` combines them. `confidence_heuristic` looks for
+truncation and hedging phrases. It also uses token log-probabilities when
+the response has them: the cascade asks the non-final tiers for
+``logprobs`` when a validator sets ``needs_logprobs``.
+
+With ``PROVIDER=watsonx-cascade``, `client_from_env` builds a cascade from
+a comma-separated ``MODEL`` list.
+"""
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Union
+
+from conversation import Conversation
+from deadline import Deadline
+from router import is_endpoint_failure
+from structured import StructuredOutputError, parse_structured
+from token_manager import IAM_URL, IAMTokenManager
+from transport import PooledTransport, get_default_transport
+from watsonx_client import BatchGenerateMixin, WatsonXClient, extract_text_from_response
+
+Validator = Callable[[str, Dict[str, Any]], bool]
+
+HEDGING_PHRASES = ("i'm not sure", 'i am not sure', "i don't know", 'i do not know', 'i cannot answer',
+                   "i can't answer", 'i am unable to', "i'm unable to", 'not enough information',
+                   'as an ai language model')
+
+
+def min_length(chars: int) -> Validator:
+    """Accept answers with at least `chars` non-blank characters."""
+    return lambda text, response: len(text.strip()) >= chars
+
+
+def max_length(chars: int) -> Validator:
+    """Accept answers no longer than `chars` characters."""
+    return lambda text, response: len(text) <= chars
+
+
+def matches(pattern: str, flags: int = 0) -> Validator:
+    """Accept answers in which the regular expression `pattern` is found."""
+    compiled = re.compile(pattern, flags)
+    return lambda text, response: compiled.search(text) is not None
+
+
+def json_validator(schema: Optional[Dict[str, Any]] = None) -> Validator:
+    """Accept answers that are a JSON document matching `schema` (see `structured.parse_structured`)."""
+    def validate(text: str, response: Dict[str, Any]) -> bool:
+        try:
+            parse_structured(text, schema)
+        except StructuredOutputError:
+            return False
+        return True
+    return validate
+
+
+def token_confidence(response: Dict[str, Any]) -> Optional[float]:
+    """Geometric-mean token probability of the answer, or None without ``logprobs`` in the response."""
+    try:
+        content = response['choices'][0]['logprobs']['content']
+        logprobs = [token['logprob'] for token in content if token.get('logprob') is not None]
+    except (KeyError, IndexError, TypeError):
+        return None
+    if not logprobs:
+        return None
+    return math.exp(sum(logprobs) / len(logprobs))
+
+
+def confidence_heuristic(min_confidence: float = 0.5, phrases: Sequence[str] = HEDGING_PHRASES) -> Validator:
+    """Reject empty, truncated (``finish_reason == 'length'``) or hedging answers, and low-confidence ones.
+
+    The token-probability check applies only when the response carries
+    ``logprobs``; the cascade requests them from the non-final tiers.
+    """
+    lowered = tuple(phrase.lower() for phrase in phrases)
+
+    def validate(text: str, response: Dict[str, Any]) -> bool:
+        if not text.strip():
+            return False
+        choices = response.get('choices') or [{}]
+        if isinstance(choices[0], dict) and choices[0].get('finish_reason') == 'length':
+            return False
+        head = text[:400].lower()
+        if any(phrase in head for phrase in lowered):
+            return False
+        confidence = token_confidence(response)
+        return confidence is None or confidence >= min_confidence
+
+    validate.needs_logprobs = True
+    return validate
+
+
+def all_of(*validators: Validator) -> Validator:
+    """Accept only answers every validator accepts."""
+    def validate(text: str, response: Dict[str, Any]) -> bool:
+        return all(validator(text, response) for validator in validators)
+
+    validate.needs_logprobs = any(getattr(v, 'needs_logprobs', False) for v in validators)
+    return validate
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)] if sorted_values else 0.0
+
+
+class Tier:
+    """One model in the cascade plus its live statistics."""
+
+    def __init__(self, client: WatsonXClient, validator: Optional[Validator] = None, name: Optional[str] = None,
+                 window: int = 1024):
+        """Create a tier.
+
+        Args:
+            client: Client for this tier's model
+            validator: Validator for this tier's answers (default: the cascade's)
+            name: Label in `stats()`, unique within the cascade (default: the model ID)
+            window: Latency samples kept for the percentiles
+        """
+        self.client = client
+        self.validator = validator
+        self.name = name or client.model
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'accepted': 0, 'rejected': 0, 'errors': 0}
+
+    def record(self, outcome: str, elapsed: Optional[float] = None) -> None:
+        with self._lock:
+            self._counts['requests'] += 1
+            self._counts[outcome] += 1
+            if elapsed is not None:
+                self._latencies.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+            latencies = sorted(self._latencies)
+        stats['hit_rate'] = round(stats['accepted'] / stats['requests'], 4) if stats['requests'] else 0.0
+        stats['latency_p50_ms'] = round(_percentile(latencies, 0.50) * 1000, 1)
+        stats['latency_p95_ms'] = round(_percentile(latencies, 0.95) * 1000, 1)
+        return stats
+
+
+class CascadeClient(BatchGenerateMixin):
+    """Sends each prompt to the cheapest tier first and escalates rejected answers to larger models."""
+
+    def __init__(self, clients: Sequence[Union[WatsonXClient, Tier]], validator: Optional[Validator] = None,
+                 failover: bool = True):
+        """Create a cascade.
+
+        Args:
+            clients: Clients (or pre-built `Tier`s), cheapest/fastest model first
+            validator: Decides whether an answer is good enough to stop at
+                (default: `confidence_heuristic()`); the last tier's answer is always returned
+            failover: Escalate on endpoint failures (connection errors, timeouts, 429, 5xx) too
+        """
+        if not clients:
+            raise ValueError('CascadeClient needs at least one client')
+        self.tiers: List[Tier] = [c if isinstance(c, Tier) else Tier(c) for c in clients]
+        names = [tier.name for tier in self.tiers]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            # stats() and warm_up() are keyed by tier name
+            raise ValueError(f'Duplicate cascade tier names {duplicates}; '
+                             'pass Tier(client, name=...) to tell them apart')
+        self.validator = validator or confidence_heuristic()
+        self.failover = failover
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'escalations': 0}
+
+    @classmethod
+    def from_models(cls, models: Sequence[str], base_url: str, api_key: str, project_id: str,
+                    iam_url: str = IAM_URL, transport: Optional[PooledTransport] = None,
+                    token_manager: Optional[IAMTokenManager] = None, client_kwargs: Optional[Dict[str, Any]] = None,
+                    **cascade_kwargs) -> 'CascadeClient':
+        """Build a cascade over `models` on one endpoint, sharing a token manager and pooled transport."""
+        client_kwargs = dict(client_kwargs or {})
+        transport = transport or get_default_transport()
+        if token_manager is None and not client_kwargs.get('use_api_key_direct'):
+            token_manager = IAMTokenManager(api_key, iam_url=iam_url, transport=transport)
+        clients = [WatsonXClient(base_url, api_key, project_id, model, transport=transport,
+                                 token_manager=token_manager, iam_url=iam_url, **client_kwargs) for model in models]
+        return cls(clients, **cascade_kwargs)
+
+    @property
+    def model(self) -> str:
+        return '>'.join(tier.name for tier in self.tiers)
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += amount
+
+    def generate(self, prompt: str, max_tokens: int = 512, conversation: Optional[Conversation] = None,
+                 **kwargs) -> Dict[str, Any]:
+        """Generate text, escalating through the tiers until an answer passes validation.
+
+        Takes the same arguments as `WatsonXClient.generate`. The response
+        gets a ``cascade`` entry with the answering tier, its index and the
+        number of escalations.
+        """
+        self._count('requests')
+        if kwargs.get('deadline') is not None:
+            # One budget for the whole cascade, not one per tier
+            kwargs['deadline'] = Deadline.coerce(kwargs['deadline'])
+        if conversation is not None:
+            # Prepared once; every tier sees the same history and only the kept answer is added
+            kwargs['messages'] = conversation.prepare(prompt, max_tokens)
+        try:
+            result = self._cascade(prompt, max_tokens, kwargs)
+        except BaseException:
+            if conversation is not None:
+                conversation.pop()
+            raise
+        if conversation is not None:
+            conversation.add_assistant(extract_text_from_response(result))
+        return result
+
+    def _cascade(self, prompt: str, max_tokens: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        last = len(self.tiers) - 1
+        for i, tier in enumerate(self.tiers):
+            validator = tier.validator or self.validator
+            call_kwargs = kwargs
+            if i < last and getattr(validator, 'needs_logprobs', False) and 'logprobs' not in kwargs:
+                call_kwargs = {**kwargs, 'logprobs': True}
+            start = time.perf_counter()
+            try:
+                result = tier.client.generate(prompt, max_tokens, **call_kwargs)
+            except Exception as e:
+                tier.record('errors')
+                if i == last or not (self.failover and is_endpoint_failure(e)):
+                    raise
+                self._count('escalations')
+                continue
+            elapsed = time.perf_counter() - start
+            if i < last and not validator(extract_text_from_response(result), result):
+                tier.record('rejected', elapsed)
+                self._count('escalations')
+                continue
+            tier.record('accepted', elapsed)
+            result = dict(result)
+            result['cascade'] = {'tier': i, 'model': tier.name, 'escalations': i}
+            return result
+
+    def warm_up(self, **kwargs) -> Dict[str, Any]:
+        """Warm every tier up; returns ``{tier name: WarmupReport}``."""
+        return {tier.name: tier.client.warm_up(**kwargs) for tier in self.tiers}
+
+    def stats(self) -> Dict[str, Any]:
+        """Cascade counters plus each tier's requests, hit rate (accepted/requests) and latency percentiles."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+        tiers = {tier.name: tier.stats() for tier in self.tiers}
+        requests = stats['requests']
+        for tier_stats in tiers.values():
+            # Share of all prompts answered by this tier
+            tier_stats['share'] = round(tier_stats['accepted'] / requests, 4) if requests else 0.0
+        stats['tiers'] = tiers
+        return stats
+
+
+def create_cascade(base_url: str, api_key: str, project_id: str, model: Union[str, Sequence[str]],
+                   validator: Optional[Validator] = None, failover: bool = True, **client_kwargs) -> CascadeClient:
+    """Provider factory: `model` is a list or a comma-separated string, cheapest first."""
+    models = [m.strip() for m in model.split(',') if m.strip()] if isinstance(model, str) else list(model)
+    iam_url = client_kwargs.pop('iam_url', IAM_URL)
+    transport = client_kwargs.pop('transport', None)
+    return CascadeClient.from_models(models, base_url, api_key, project_id, iam_url=iam_url, transport=transport,
+                                     client_kwargs=client_kwargs, validator=validator, failover=failover)
@@ -0,0 +1,114 @@
+"""Single-flight coalescing of identical in-flight requests.
+
+While a request for a given key is in flight, further callers with the
+same key wait for it and receive the same result (or a copy of the same exception)
+instead of sending a duplicate. `WatsonXClient(..., coalescer=SingleFlight())`
+keys on the canonical request payload, so a burst of users asking the same
+question costs one completion. Nothing is remembered once the leader
+finishes; pair it with `ResponseCache` for that.
+
+Each caller waits within its own `Deadline`. If the leader is cancelled or
+runs out of its budget, waiting callers don't inherit that: one of them
+becomes the new leader and runs the call for the others.
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from deadline import Cancelled, Deadline
+from response_cache import is_deterministic
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    """A copy of `error` (same type, args and attributes) caused by it, or `error` itself if it can't be copied."""
+    try:
+        clone = copy.copy(error)
+    except Exception:
+        return error
+    clone.__cause__ = error
+    return clone
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome with concurrent callers."""
+
+    def __init__(self, include_sampled: bool = True):
+        """Create a coalescer.
+
+        Args:
+            include_sampled: Also coalesce sampled (temperature > 0) payloads. Set False
+                when every caller must get an independent sample.
+        """
+        self.include_sampled = include_sampled
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {'leaders': 0, 'coalesced': 0, 'errors': 0}
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        """Whether a request with this payload may share another caller's result."""
+        return self.include_sampled or is_deterministic(payload)
+
+    def do(self, key: str, fn: Callable[[], Any], deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """Run `fn` unless a call with `key` is already in flight.
+
+        Returns ``(result, shared)`` where `shared` is True for callers that
+        received another caller's result; they get a deep copy so nobody can
+        mutate a response someone else is holding. A waiting caller gives up
+        with `DeadlineExceeded` when its own `deadline` passes.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self._stats['leaders'] += 1
+                else:
+                    call.waiters += 1
+            if leader:
+                break
+            if deadline is not None:
+                deadline.wait(call.done)
+            else:
+                call.done.wait()
+            if isinstance(call.error, Cancelled):
+                # The leader's budget or cancellation isn't ours: try again, so one of the
+                # waiters becomes the new leader and the rest wait for it
+                continue
+            with self._lock:
+                self._stats['coalesced'] += 1
+            if call.error is not None:
+                # Each waiter raises its own copy; one exception object raised in several
+                # threads would collect all their tracebacks
+                raise _copy_error(call.error)
+            return copy.deepcopy(call.result), True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Return leader/coalesced/error counters and the number of keys in flight."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+            return stats
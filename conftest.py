@@ -0,0 +1,7 @@
+"""pytest configuration: hermetic tests live in tests/ and run against stub_server.py.
+
+test_llm.py, test_formats.py and smoke_test.py are scripts that call the
+live WatsonX API at import time with WATSONX_* credentials; run them
+directly (``python test_llm.py``) instead of collecting them.
+"""
+collect_ignore = ['test_llm.py', 'test_formats.py', 'smoke_test.py']
@@ -0,0 +1,172 @@
+"""Multi-turn chat history trimmed to a token budget.
+
+A `Conversation` keeps the messages of a chat session together with a
+per-message token estimate and a running total, so preparing a request only
+touches the turns that have to be dropped instead of re-counting the whole
+history. Before each request the oldest turns are dropped (or folded into a
+running summary by an optional summarizer) until the history, the system
+prompt and the room reserved for the reply fit `max_context_tokens`.
+
+Pass one to `WatsonXClient.generate(..., conversation=conv)` or
+`WatsonXConnector.chat(..., conversation=conv)`; the prompt and the model's
+reply are appended automatically.
+"""
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Role/formatting tokens the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Message = Dict[str, str]
+Summarizer = Callable[[Optional[str], List[Message]], str]
+
+
+def estimate_message_tokens(message: Message) -> int:
+    """Rough token count for one chat message (~4 characters per token, like `estimate_tokens`)."""
+    return len(str(message.get('content', ''))) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class Conversation:
+    """Chat history that fits itself into a context budget before each request."""
+
+    def __init__(self, system_prompt: Optional[str] = None, max_context_tokens: int = 8192,
+                 summarizer: Optional[Summarizer] = None):
+        """Create a conversation.
+
+        Args:
+            system_prompt: Optional system message sent first with every request
+            max_context_tokens: Budget for prompt plus reply; older turns are trimmed to fit
+            summarizer: Optional ``summarizer(previous_summary, dropped_messages) -> str``
+                used to fold trimmed turns into a summary instead of forgetting them
+        """
+        self.system_prompt = system_prompt
+        self.max_context_tokens = max_context_tokens
+        self.summarizer = summarizer
+        self.summary: Optional[str] = None
+        self.trimmed_messages = 0
+        self._messages: Deque[Message] = deque()
+        self._tokens: Deque[int] = deque()
+        self._history_tokens = 0
+        self._fixed_tokens = 0
+        self._update_fixed_tokens()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def messages(self) -> List[Message]:
+        """The retained history (without system prompt or summary)."""
+        return list(self._messages)
+
+    @property
+    def token_count(self) -> int:
+        """Estimated prompt tokens of the context as it would be sent now."""
+        return self._fixed_tokens + self._history_tokens
+
+    def add(self, role: str, content: str) -> None:
+        message = {'role': role, 'content': content}
+        tokens = estimate_message_tokens(message)
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self._history_tokens += tokens
+
+    def add_user(self, content: str) -> None:
+        self.add('user', content)
+
+    def add_assistant(self, content: str) -> None:
+        self.add('assistant', content)
+
+    def pop(self) -> Optional[Message]:
+        """Remove and return the newest message (e.g. the prompt of a failed request)."""
+        if not self._messages:
+            return None
+        self._history_tokens -= self._tokens.pop()
+        return self._messages.pop()
+
+    def clear(self) -> None:
+        """Forget the history and summary, keeping the system prompt."""
+        self._messages.clear()
+        self._tokens.clear()
+        self._history_tokens = 0
+        self.summary = None
+        self._update_fixed_tokens()
+
+    def prepare(self, prompt: str, max_tokens: int = 0) -> List[Message]:
+        """Append a user prompt and return the trimmed messages to send.
+
+        Args:
+            prompt: The new user message
+            max_tokens: Tokens to leave free for the reply
+        """
+        self.add_user(prompt)
+        self.trim(self.max_context_tokens - max_tokens)
+        return self.context()
+
+    def trim(self, budget: int) -> int:
+        """Drop the oldest turns until the context fits `budget` tokens; returns messages dropped.
+
+        The newest message is always kept, and history never starts with an
+        assistant reply whose prompt was dropped.
+        """
+        dropped: List[Message] = []
+        while len(self._messages) > 1 and self.token_count > budget:
+            self._history_tokens -= self._tokens.popleft()
+            dropped.append(self._messages.popleft())
+        while dropped and len(self._messages) > 1 and self._messages[0]['role'] == 'assistant':
+            self._history_tokens -= self._tokens.popleft()
+            dropped.append(self._messages.popleft())
+        if not dropped:
+            return 0
+        self.trimmed_messages += len(dropped)
+        if self.summarizer is not None:
+            try:
+                self.summary = self.summarizer(self.summary, dropped)
+            except Exception as e:
+                logger.warning('Conversation summarizer failed; dropping %d messages: %s', len(dropped), e)
+            self._update_fixed_tokens()
+            if self.token_count > budget:
+                # The summary itself no longer fits; trim again without re-summarizing
+                summarizer, self.summarizer = self.summarizer, None
+                try:
+                    return len(dropped) + self.trim(budget)
+                finally:
+                    self.summarizer = summarizer
+        if self.token_count > budget:
+            logger.warning('Conversation context (%d tokens) exceeds its budget of %d tokens',
+                           self.token_count, budget)
+        return len(dropped)
+
+    def context(self) -> List[Message]:
+        """Messages to send: system prompt (with any summary) followed by the history."""
+        system = self._system_content()
+        head = [{'role': 'system', 'content': system}] if system else []
+        return head + list(self._messages)
+
+    def _system_content(self) -> Optional[str]:
+        parts = [self.system_prompt] if self.system_prompt else []
+        if self.summary:
+            parts.append(f'Summary of the earlier conversation: {self.summary}')
+        return '\n\n'.join(parts) or None
+
+    def _update_fixed_tokens(self) -> None:
+        system = self._system_content()
+        self._fixed_tokens = estimate_message_tokens({'content': system}) if system else 0
+
+
+def model_summarizer(client, max_tokens: int = 256) -> Summarizer:
+    """Build a summarizer that asks `client.generate` to condense dropped turns."""
+    from watsonx_client import extract_text_from_response
+
+    def summarize(previous: Optional[str], dropped: List[Message]) -> str:
+        transcript = '\n'.join(f"{m['role']}: {m['content']}" for m in dropped)
+        prompt = ('Summarize the following conversation in a few sentences, keeping facts, names and '
+                  'decisions the assistant may need later.\n\n')
+        if previous:
+            prompt += f'Earlier summary: {previous}\n\n'
+        resp = client.generate(prompt + transcript, max_tokens=max_tokens, temperature=0)
+        return extract_text_from_response(resp).strip()
+
+    return summarize
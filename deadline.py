@@ -0,0 +1,270 @@
+"""Deadlines and cooperative cancellation for WatsonX calls.
+
+A `Deadline` is an overall time budget for one call: the IAM token
+refresh, waiting for the rate governor, retries with their back-off and
+reading the response all draw from it. Every public call accepts
+``deadline=`` as seconds from now or as a `Deadline` shared by several
+calls (e.g. the budget of an upstream request):
+
+    client.generate('Hello', deadline=5.0)
+
+    budget = Deadline(5.0)
+    client.generate('Summarize...', deadline=budget)
+    client.embed(chunks, deadline=budget)      # whatever is left of the 5 s
+
+Socket timeouts are capped at the time remaining, and a request whose
+response is being read (e.g. a stream) is aborted when the deadline passes
+or `cancel()` is called from another thread, so the connection is released
+instead of running on after the caller gave up. Calls then raise
+`DeadlineExceeded` or `Cancelled`; neither is retried. One shared watchdog
+thread keeps a heap of expiry times and aborts the guarded requests of
+every deadline, so guarding a request doesn't start a thread.
+"""
+import heapq
+import itertools
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+class Cancelled(Exception):
+    """The call was cancelled before it finished."""
+
+
+class DeadlineExceeded(Cancelled, TimeoutError):
+    """The call's time budget ran out."""
+
+
+class _Watchdog:
+    """Single daemon thread that expires deadlines in order of their expiry times."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, 'weakref.ref[Deadline]']] = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, deadline: 'Deadline') -> None:
+        with self._cond:
+            entry = (deadline.expires_at, next(self._seq), weakref.ref(deadline))
+            heapq.heappush(self._heap, entry)
+            # is_alive() also covers a forked child process, which has no watchdog thread
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='deadline-watchdog', daemon=True)
+                self._thread.start()
+            elif self._heap[0] is entry:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    delay = self._heap[0][0] - time.monotonic() if self._heap else None
+                    if delay is not None and delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                # Entries hold weak references, so finished deadlines are freed before they expire
+                deadline = heapq.heappop(self._heap)[2]()
+            if deadline is not None:
+                deadline._expire()
+
+
+_WATCHDOG = _Watchdog()
+
+
+class Deadline:
+    """Absolute time budget for a call, which can also be cancelled explicitly."""
+
+    def __init__(self, timeout: Optional[float] = None):
+        """Create a deadline.
+
+        Args:
+            timeout: Seconds from now until the deadline (None = no time limit,
+                only explicit cancellation)
+        """
+        self.expires_at = None if timeout is None else time.monotonic() + max(float(timeout), 0.0)
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._aborts: Dict[int, Callable[[], None]] = {}
+        self._next_id = 0
+        self._scheduled = False
+        self._detach: Optional[weakref.finalize] = None
+
+    @classmethod
+    def coerce(cls, value: Union['Deadline', float, None]) -> 'Deadline':
+        """Return `value` if it is a `Deadline`, else a new one with `value` seconds (None = unbounded)."""
+        return value if isinstance(value, Deadline) else cls(value)
+
+    def child(self, timeout: Optional[float] = None) -> 'Deadline':
+        """A deadline that can be cancelled on its own (and is cancelled with this one).
+
+        It expires with this one, or after `timeout` seconds if that is sooner.
+        Call `close()` on it when the work it bounds is done; it is detached
+        from this deadline then, or at the latest when it is garbage-collected.
+        """
+        child = Deadline(timeout)
+        if self.expires_at is not None and (child.expires_at is None or self.expires_at < child.expires_at):
+            child.expires_at = self.expires_at
+        if self.cancelled:
+            child.cancel()
+        else:
+            ref = weakref.ref(child)
+            key = self._register(lambda: _cancel_ref(ref), timed=False)
+            child._detach = weakref.finalize(child, self._unregister, key)
+        return child
+
+    def close(self) -> None:
+        """Detach a `child()` deadline from its parent; a no-op for other deadlines."""
+        if self._detach is not None:
+            self._detach()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a time limit."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        """True once cancelled or out of time."""
+        return self.cancelled or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def check(self) -> None:
+        """Raise `DeadlineExceeded` or `Cancelled` if the call must stop now."""
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded('deadline exceeded')
+        if self.cancelled:
+            raise Cancelled('call cancelled')
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Timeout for the next blocking step: the time remaining, capped at `cap`. Raises if none is left."""
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(cap, remaining)
+
+    def allows(self, seconds: float) -> bool:
+        """Whether `seconds` of waiting still fit in the budget."""
+        remaining = self.remaining()
+        return not self.cancelled and (remaining is None or seconds < remaining)
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep, waking early (and raising) on cancellation or when the deadline passes."""
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            self._cancelled.wait(remaining)
+            self.check()
+            raise DeadlineExceeded('deadline exceeded')
+        if self._cancelled.wait(seconds):
+            self.check()
+
+    def wait(self, event: threading.Event, cap: Optional[float] = None) -> None:
+        """Wait for `event` within the budget; raises if it isn't set in time."""
+        timeout = self.timeout(cap)
+        step = 0.05
+        # Poll so an explicit cancel() also ends the wait
+        while not event.wait(step if timeout is None else min(step, timeout)):
+            self.check()
+            if timeout is not None:
+                timeout = self.timeout(cap)
+
+    def cancel(self) -> None:
+        """Cancel the call: waits end and in-flight requests are aborted."""
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        self._abort_all()
+        self.close()
+
+    def translate(self, error: BaseException) -> BaseException:
+        """Map an error caused by cancellation or an aborted/timed-out socket to `Cancelled`/`DeadlineExceeded`."""
+        if isinstance(error, Cancelled):
+            return error
+        if self.expires_at is not None and time.monotonic() >= self.expires_at - 0.001:
+            return DeadlineExceeded('deadline exceeded')
+        if self.cancelled:
+            return Cancelled('call cancelled')
+        return error
+
+    def guard(self, abort: Callable[[], None]) -> '_Guard':
+        """Context manager that runs `abort` if the deadline passes or is cancelled inside it."""
+        return _Guard(self, abort)
+
+    def _register(self, abort: Callable[[], None], timed: bool = True) -> int:
+        with self._lock:
+            key = self._next_id
+            self._next_id += 1
+            self._aborts[key] = abort
+            schedule = timed and self.expires_at is not None and not self._scheduled
+            if schedule:
+                self._scheduled = True
+        if schedule:
+            _WATCHDOG.schedule(self)
+        return key
+
+    def _unregister(self, key: int) -> None:
+        with self._lock:
+            self._aborts.pop(key, None)
+
+    def _expire(self) -> None:
+        with self._lock:
+            self._scheduled = False
+        self._abort_all()
+
+    def _abort_all(self) -> None:
+        with self._lock:
+            aborts = list(self._aborts.values())
+            self._aborts.clear()
+        for abort in aborts:
+            try:
+                abort()
+            except Exception:
+                pass
+
+    def __repr__(self) -> str:
+        remaining = self.remaining()
+        state = 'cancelled' if self.cancelled else ('unbounded' if remaining is None else f'{remaining:.3f}s left')
+        return f'Deadline({state})'
+
+
+def _cancel_ref(ref: 'weakref.ref[Deadline]') -> None:
+    deadline = ref()
+    if deadline is not None:
+        deadline.cancel()
+
+
+class _Guard:
+    __slots__ = ('deadline', 'abort', 'key', 'finished')
+
+    def __init__(self, deadline: Deadline, abort: Callable[[], None]):
+        self.deadline = deadline
+        self.abort = abort
+        self.key = None
+        self.finished = False
+
+    def __enter__(self):
+        if self.deadline.cancelled:
+            self.abort()
+        else:
+            self.key = self.deadline._register(self._fire)
+        return self
+
+    def __exit__(self, *exc):
+        with self.deadline._lock:
+            self.finished = True
+            if self.key is not None:
+                self.deadline._aborts.pop(self.key, None)
+        return False
+
+    def _fire(self) -> None:
+        # `_abort_all` runs this after releasing the lock. By then the guarded
+        # request may have finished and its connection may serve another one.
+        with self.deadline._lock:
+            if not self.finished:
+                self.abort()
@@ -0,0 +1,154 @@
+"""Helpers for the WatsonX embeddings endpoint.
+
+`POST /ml/v1/text/embeddings` accepts many inputs per call, so
+`WatsonXClient.embed` splits a list of texts into chunks bounded by input
+count and total characters (`chunk_ranges`), sends the chunks concurrently
+and writes the vectors into one float32 NumPy array in input order.
+
+`EmbeddingBatcher` goes the other way: it collects single-text `embed_one`
+calls arriving from many threads within a short window and sends them as
+one request, so code that embeds one text at a time still gets batched
+throughput.
+
+NumPy is an optional dependency, imported on the first embedding call.
+"""
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from deadline import Deadline, DeadlineExceeded
+
+EMBED_PATH = '/ml/v1/text/embeddings?version=2023-05-29'
+DEFAULT_EMBED_MODEL = 'ibm/slate-125m-english-rtrvr-v2'
+# WatsonX rejects requests with more inputs than this
+MAX_INPUTS_PER_REQUEST = 1000
+
+
+def require_numpy():
+    # Imported on first use so clients that never embed don't pay for numpy at startup
+    try:
+        import numpy
+    except Exception:
+        raise RuntimeError('numpy package not installed')
+    return numpy
+
+
+def build_embed_payload(model: str, project_id: str, texts: Sequence[str],
+                        truncate_input_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """Build the WatsonX embeddings payload for one chunk of texts."""
+    payload: Dict[str, Any] = {"model_id": model, "project_id": project_id, "inputs": list(texts)}
+    if truncate_input_tokens:
+        payload["parameters"] = {"truncate_input_tokens": truncate_input_tokens}
+    return payload
+
+
+def chunk_ranges(texts: Sequence[str], max_inputs: int = 256, max_chars: int = 200_000) -> List[Tuple[int, int]]:
+    """Split `texts` into consecutive ``(start, end)`` ranges within both limits.
+
+    A single text longer than `max_chars` gets a chunk of its own (the server
+    truncates or rejects it).
+    """
+    max_inputs = max(1, min(max_inputs, MAX_INPUTS_PER_REQUEST))
+    ranges = []
+    start, chars = 0, 0
+    for i, text in enumerate(texts):
+        size = len(text)
+        if i > start and (i - start >= max_inputs or chars + size > max_chars):
+            ranges.append((start, i))
+            start, chars = i, 0
+        chars += size
+    if start < len(texts):
+        ranges.append((start, len(texts)))
+    return ranges
+
+
+def parse_embeddings(result: Dict[str, Any], expected: int):
+    """Turn an embeddings response into a float32 array of shape ``(expected, dim)``."""
+    rows = [item['embedding'] for item in result.get('results') or []]
+    if len(rows) != expected:
+        raise ValueError(f'WatsonX returned {len(rows)} embeddings for {expected} inputs')
+    np = require_numpy()
+    return np.asarray(rows, dtype=np.float32)
+
+
+class _Batch:
+    __slots__ = ('texts', 'futures', 'full')
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.futures: List[Future] = []
+        self.full = threading.Event()
+
+
+class EmbeddingBatcher:
+    """Coalesces single-text embedding calls from many threads into shared requests.
+
+    The first caller of a batch waits up to `window` seconds (or until
+    `max_batch` texts have joined), then sends the batch through `embed_fn`
+    and hands every caller its row.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], Any], window: float = 0.005, max_batch: int = 64):
+        """Create a batcher.
+
+        Args:
+            embed_fn: Embeds a list of texts, returning a ``(len(texts), dim)`` array
+            window: Seconds a batch stays open for more texts
+            max_batch: Texts per batch; a full batch is sent immediately
+        """
+        self.embed_fn = embed_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+        self._stats = {'texts': 0, 'batches': 0, 'errors': 0}
+
+    def submit(self, text: str, deadline: Optional[Deadline] = None):
+        """Embed one text, sharing a request with concurrent callers; returns a float32 vector.
+
+        `deadline` bounds how long this caller waits for the shared request.
+        """
+        future: Future = Future()
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.texts.append(text)
+            batch.futures.append(future)
+            self._stats['texts'] += 1
+            if len(batch.texts) >= self.max_batch:
+                self._open = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._flush(batch)
+        try:
+            return future.result(deadline.timeout() if deadline is not None else None)
+        except FutureTimeout:
+            raise DeadlineExceeded('deadline exceeded waiting for a batched embedding') from None
+
+    def _flush(self, batch: _Batch) -> None:
+        with self._lock:
+            self._stats['batches'] += 1
+        try:
+            vectors = self.embed_fn(batch.texts)
+        except BaseException as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        for i, future in enumerate(batch.futures):
+            # Copy so callers don't keep the whole batch's array alive
+            future.set_result(vectors[i].copy())
+
+    def stats(self) -> Dict[str, float]:
+        """Return text/batch/error counters and the mean batch size."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['mean_batch'] = stats['texts'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
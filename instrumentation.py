@@ -0,0 +1,248 @@
+"""Per-call latency breakdown and token-usage instrumentation.
+
+A client given an `Instrumentation` fills in one `CallRecord` per public call,
+covering queue wait, connect time, time to first byte, total latency,
+attempts, IAM refresh time and the token counts from the response's `usage`.
+It then hands the record to every registered hook. Two exporters are
+included: `PrometheusExporter` (counters and histograms in the text
+exposition format) and `JSONLinesExporter` (one JSON object per call).
+Clients without instrumentation skip all of this.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CallRecord:
+    """Timings and usage for one client call."""
+
+    __slots__ = ('operation', 'model', 'started', 'queue_wait', 'connect', 'ttfb', 'first_token', 'total', 'attempts',
+                 'iam_refresh', 'status', 'error', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+                 'cached', 'coalesced', 'lane', '_start')
+
+    def __init__(self, operation: str, model: Optional[str] = None):
+        self.operation = operation
+        self.model = model
+        self.started = time.time()
+        self.queue_wait = 0.0
+        self.connect = 0.0
+        self.ttfb: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.total: Optional[float] = None
+        self.attempts = 0
+        self.iam_refresh = 0.0
+        self.status: Optional[int] = None
+        self.error: Optional[str] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.total_tokens: Optional[int] = None
+        self.cached = False
+        self.coalesced = False
+        self.lane: Optional[str] = None
+        self._start = time.perf_counter()
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    def observe_attempt(self, resp, connect_time: float = 0.0) -> None:
+        """Account for one HTTP attempt (headers received)."""
+        self.attempts += 1
+        self.connect += connect_time
+        self.status = resp.status_code
+        # Time from the start of the call until the final attempt's headers arrived
+        self.ttfb = time.perf_counter() - self._start
+
+    def observe_first_token(self) -> None:
+        """Mark the arrival of the first streamed content."""
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self._start
+
+    def set_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        if usage:
+            self.prompt_tokens = usage.get('prompt_tokens')
+            self.completion_tokens = usage.get('completion_tokens')
+            self.total_tokens = usage.get('total_tokens')
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__ if not name.startswith('_')}
+        data['retries'] = self.retries
+        return data
+
+
+class Instrumentation:
+    """Creates call records and fans finished ones out to hooks."""
+
+    def __init__(self, *hooks: Callable[[CallRecord], None]):
+        self.hooks: List[Callable[[CallRecord], None]] = list(hooks)
+
+    def add_hook(self, hook: Callable[[CallRecord], None]) -> None:
+        self.hooks.append(hook)
+
+    def start(self, operation: str, model: Optional[str] = None) -> CallRecord:
+        return CallRecord(operation, model)
+
+    def finish(self, record: CallRecord, error: Optional[BaseException] = None) -> None:
+        """Stamp the total latency and deliver the record to every hook."""
+        record.total = time.perf_counter() - record._start
+        if error is not None:
+            record.error = type(error).__name__
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception:
+                logger.exception('Instrumentation hook %r failed', hook)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs: Dict[str, Any]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(pairs.items())) + '}'
+
+
+class PrometheusExporter:
+    """Aggregates call records into Prometheus counters and histograms."""
+
+    HISTOGRAMS = (
+        ('watsonx_request_duration_seconds', 'total', 'Total call latency'),
+        ('watsonx_time_to_first_byte_seconds', 'ttfb', 'Time until response headers arrived'),
+        ('watsonx_time_to_first_token_seconds', 'first_token', 'Time until the first streamed token arrived'),
+        ('watsonx_connect_seconds', 'connect', 'Time spent opening connections'),
+        ('watsonx_queue_wait_seconds', 'queue_wait', 'Time spent waiting for rate/concurrency limits'),
+        ('watsonx_iam_refresh_seconds', 'iam_refresh', 'Time spent obtaining IAM tokens'),
+    )
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple, int] = {}
+        self._retries: Dict[Tuple, int] = {}
+        self._tokens: Dict[Tuple, int] = {}
+        self._histograms: Dict[Tuple, _Histogram] = {}
+        self._collectors: List[Callable[[], str]] = []
+
+    def add_collector(self, collector: Callable[[], str]) -> None:
+        """Append another source's metrics (text format, e.g. `LaneScheduler.render_metrics`) to `render`."""
+        self._collectors.append(collector)
+
+    def __call__(self, record: CallRecord) -> None:
+        outcome = record.error or (str(record.status) if record.status is not None else 'none')
+        base = (('model', record.model or ''), ('operation', record.operation))
+        with self._lock:
+            key = base + (('cached', str(record.cached).lower()), ('coalesced', str(record.coalesced).lower()),
+                          ('outcome', outcome))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if record.retries:
+                self._retries[base] = self._retries.get(base, 0) + record.retries
+            for kind in ('prompt', 'completion'):
+                value = getattr(record, f'{kind}_tokens')
+                if value:
+                    tkey = base + (('type', kind),)
+                    self._tokens[tkey] = self._tokens.get(tkey, 0) + value
+            for name, attr, _ in self.HISTOGRAMS:
+                value = getattr(record, attr)
+                if value is None or (attr in ('connect', 'iam_refresh', 'queue_wait') and not value):
+                    continue
+                hkey = (name,) + base
+                histogram = self._histograms.get(hkey)
+                if histogram is None:
+                    histogram = self._histograms[hkey] = _Histogram(self.buckets)
+                histogram.observe(value)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, values, help_text in (
+                    ('watsonx_requests_total', self._requests, 'Client calls by outcome'),
+                    ('watsonx_retries_total', self._retries, 'Retried attempts'),
+                    ('watsonx_tokens_total', self._tokens, 'Tokens reported by WatsonX usage')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{_labels(dict(key))} {value}' for key, value in sorted(values.items())]
+            for name, attr, help_text in self.HISTOGRAMS:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for hkey, histogram in sorted(self._histograms.items()):
+                    if hkey[0] != name:
+                        continue
+                    labels = dict(hkey[1:])
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{_labels({**labels, "le": f"{bound:g}"})} {count}')
+                    lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {histogram.count}')
+                    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        text = '\n'.join(lines) + '\n'
+        for collector in self._collectors:
+            text += collector()
+        return text
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1'):
+        """Serve `/metrics` on a background thread; returns the server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        exporter = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode()
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class JSONLinesExporter:
+    """Writes each call record as one JSON line to a file or stream."""
+
+    def __init__(self, target):
+        """Create an exporter.
+
+        Args:
+            target: File path (opened for append) or a writable text stream
+        """
+        self._owns = isinstance(target, str)
+        self._stream: IO[str] = open(target, 'a', encoding='utf-8') if self._owns else target
+        self._lock = threading.Lock()
+
+    def __call__(self, record: CallRecord) -> None:
+        line = json.dumps(record.as_dict(), separators=(',', ':'))
+        with self._lock:
+            self._stream.write(line + '\n')
+            self._stream.flush()
+
+    def close(self) -> None:
+        if self._owns:
+            self._stream.close()
@@ -0,0 +1,161 @@
+"""Load test for WatsonXClient against the local stand-in server.
+
+Spawns stub_server.py in a subprocess (so its CPU isn't charged to the
+client), drives it through `WatsonXClient` with the requested concurrency
+and reports throughput, latency percentiles and client CPU/memory per
+request. Thresholds turn it into a regression gate for CI.
+
+Usage:
+    python load_test.py [--requests 1000] [--concurrency 32] [--latency fixed:0.05]
+        [--error-rate 0] [--rate-429 0] [--stream] [--json results.json]
+        [--max-p99-ms 500] [--min-rps 100]
+
+Pass --url to target an already running stand-in instead of spawning one.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from token_manager import IAMTokenManager
+from watsonx_client import WatsonXClient
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def spawn_stub(args) -> (subprocess.Popen, str):
+    """Start stub_server.py on a free port and return (process, base_url)."""
+    cmd = [sys.executable, 'stub_server.py', '--port', '0', '--latency', args.latency,
+           '--error-rate', str(args.error_rate), '--rate-429', str(args.rate_429),
+           '--token-delay', str(args.token_delay), '--completion-tokens', str(args.completion_tokens),
+           '--token-ttl', str(args.token_ttl)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline().strip()
+    if not line.startswith('STUB_URL='):
+        proc.kill()
+        raise RuntimeError(f'stub server failed to start: {line!r}')
+    return proc, line.split('=', 1)[1]
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+def run_load(client: WatsonXClient, requests_total: int, concurrency: int, stream: bool, max_tokens: int):
+    """Send `requests_total` prompts and return (latencies, first_token_latencies, errors)."""
+    prompts = (f'Load test prompt {i}: what is {i} + {i}?' for i in range(requests_total))
+    latencies, first_tokens, errors = [], [], 0
+
+    if not stream:
+        for result in client.generate_many(prompts, concurrency=concurrency, ordered=False, max_tokens=max_tokens):
+            latencies.append(result.elapsed)
+            errors += 0 if result.ok else 1
+        return latencies, first_tokens, errors
+
+    def consume(prompt):
+        start = time.perf_counter()
+        first = None
+        for delta in client.stream_generate(prompt, max_tokens=max_tokens):
+            if first is None and delta.content:
+                first = time.perf_counter() - start
+        return first, time.perf_counter() - start
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(consume, p) for p in prompts]
+        for future in futures:
+            try:
+                first, total = future.result()
+                latencies.append(total)
+                if first is not None:
+                    first_tokens.append(first)
+            except Exception:
+                errors += 1
+    return latencies, first_tokens, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test WatsonXClient against the local stand-in.')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--max-tokens', type=int, default=64)
+    parser.add_argument('--stream', action='store_true', help='use stream_generate and report time to first token')
+    parser.add_argument('--url', help='base URL of a running stand-in (default: spawn one)')
+    parser.add_argument('--latency', default='fixed:0.05', help='stub latency spec')
+    parser.add_argument('--token-delay', type=float, default=0.0)
+    parser.add_argument('--completion-tokens', type=int, default=16)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--token-ttl', type=int, default=3600)
+    parser.add_argument('--trace-memory', action='store_true', help='report traced allocations per request')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--max-p99-ms', type=float, help='fail if p99 latency exceeds this')
+    parser.add_argument('--min-rps', type=float, help='fail if throughput is below this')
+    args = parser.parse_args()
+
+    proc, url = (None, args.url.rstrip('/')) if args.url else spawn_stub(args)
+    try:
+        token_manager = IAMTokenManager('load-test-key', iam_url=f'{url}/identity/token', disk_cache=False)
+        client = WatsonXClient(url, 'load-test-key', 'load-test-project', 'stub/model', token_manager=token_manager)
+
+        if args.trace_memory:
+            tracemalloc.start()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+        cpu_before = time.process_time()
+        wall_before = time.perf_counter()
+        latencies, first_tokens, errors = run_load(client, args.requests, args.concurrency,
+                                                   args.stream, args.max_tokens)
+        wall = time.perf_counter() - wall_before
+        cpu = time.process_time() - cpu_before
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    lat = sorted(latencies)
+    report = {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'errors': errors,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(args.requests / wall, 2) if wall else 0.0,
+        'latency_ms': {q: round(percentile(lat, p) * 1000, 2)
+                       for q, p in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        'cpu_ms_per_request': round(cpu * 1000 / max(args.requests, 1), 3),
+        'peak_rss_growth_kb': rss_after - rss_before,
+        'iam_refreshes': token_manager.refresh_count,
+        'transport': client.transport.stats_snapshot(),
+    }
+    if first_tokens:
+        ft = sorted(first_tokens)
+        report['first_token_ms'] = {'p50': round(percentile(ft, 0.50) * 1000, 2),
+                                    'p99': round(percentile(ft, 0.99) * 1000, 2)}
+    if traced_peak is not None:
+        report['traced_peak_bytes_per_request'] = traced_peak // max(args.requests, 1)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.max_p99_ms is not None and report['latency_ms']['p99'] > args.max_p99_ms:
+        failures.append(f"p99 {report['latency_ms']['p99']} ms > {args.max_p99_ms} ms")
+    if args.min_rps is not None and report['throughput_rps'] < args.min_rps:
+        failures.append(f"throughput {report['throughput_rps']} rps < {args.min_rps} rps")
+    if failures:
+        print('[FAIL] ' + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,36 +2,54 @@
 
 Usage: create a `.env` file (see `.env.example`) then run `python main.py`.
 """
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-from watsonx_client import WatsonXClient, OpenAIClient, extract_text_from_response
+from conversation import Conversation
+from providers import client_from_env
 
+# Providers whose clients return coroutines; they are for asyncio code, not these synchronous CLIs
+ASYNC_PROVIDERS = ('watsonx-async',)
 
-def get_env(name, default=None):
-    v = os.getenv(name, default)
-    if v is None:
-        raise RuntimeError(f'Missing environment variable: {name}')
-    return v
+
+def require_sync_provider(provider: str) -> None:
+    """Exit with a message if `provider` is an asyncio client, which the CLIs can't drive."""
+    if provider.lower() in ASYNC_PROVIDERS:
+        raise SystemExit(f'PROVIDER={provider} is an asyncio client for use from async code '
+                         '(see async_client.py); set PROVIDER=watsonx for the command-line tools')
+
+
+def create_client():
+    """Create the client selected by PROVIDER from environment variables.
+
+    Only the selected backend is imported. WatsonX clients are warmed up (IAM
+    token plus an open connection) so the first answer doesn't pay for either.
+    """
+    require_sync_provider(os.getenv('PROVIDER', 'watsonx'))
+    client = client_from_env()
+    if hasattr(client, 'warm_up'):
+        report = client.warm_up()
+        if not report.ready:
+            logging.getLogger(__name__).warning('Warm-up incomplete: %s', report.summary())
+    return client
 
 
 def main():
     load_dotenv(override=True)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper(), format='[%(levelname)s] %(message)s')
     provider = os.getenv('PROVIDER', 'watsonx').lower()
-    if provider == 'openai':
-        api_key = get_env('OPENAI_API_KEY')
-        model = os.getenv('MODEL', 'gpt-4o')
-        client = OpenAIClient(api_key=api_key, model=model)
-    else:
-        base_url = get_env('WATSONX_BASE_URL')
-        api_key = get_env('WATSONX_API_KEY')
-        project_id = get_env('WATSONX_PROJECT_ID')
-        model = get_env('MODEL')
-        use_api_key_direct = os.getenv('WATSONX_USE_APIKEY_DIRECT', 'false').lower() in ('1', 'true', 'yes')
-        client = WatsonXClient(base_url=base_url, api_key=api_key, project_id=project_id, model=model, use_api_key_direct=use_api_key_direct)
+    require_sync_provider(provider)
+    # Import the backend and build the client while the prompt is already on screen
+    loader = ThreadPoolExecutor(max_workers=1)
+    pending_client = loader.submit(create_client)
+    loader.shutdown(wait=False)
+    conversation = Conversation(max_context_tokens=int(os.getenv('WATSONX_CONTEXT_TOKENS', '8192')))
+    answer_timeout = float(os.getenv('WATSONX_ANSWER_TIMEOUT')) if os.getenv('WATSONX_ANSWER_TIMEOUT') else None
 
     print(f"Provider: {provider}")
-    print('Enter a question (empty to quit)')
+    print('Enter a question (empty to quit, Ctrl-C stops an answer)')
     while True:
         try:
             prompt = input('\n> ').strip()
@@ -40,11 +58,25 @@ def main():
             break
         if not prompt:
             break
+        stream = None
         try:
-            resp = client.generate(prompt)
-            text = extract_text_from_response(resp)
+            client = pending_client.result()
             print('\n--- Answer ---')
-            print(text)
+            if hasattr(client, 'stream_generate'):
+                # Print tokens as they arrive
+                stream = client.stream_generate(prompt, conversation=conversation, deadline=answer_timeout)
+                for delta in stream:
+                    print(delta.content, end='', flush=True)
+                print()
+            else:
+                from watsonx_client import extract_text_from_response
+                resp = client.generate(prompt, conversation=conversation, deadline=answer_timeout)
+                print(extract_text_from_response(resp))
+        except KeyboardInterrupt:
+            # Closing the stream aborts the request and releases its connection
+            if stream is not None:
+                stream.close()
+            print('\n[cancelled]')
         except Exception as e:
             print(f'Error calling model: {e}')
 
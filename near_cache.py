@@ -0,0 +1,320 @@
+"""Approximate response cache for near-duplicate prompts.
+
+`ResponseCache` only hits when the payload is byte-for-byte identical.
+`NearDuplicateCache` also serves prompts that differ in casing, whitespace,
+sentence punctuation or a typo. Digits, operators and other symbols
+are kept and must match exactly, so 'What is 2+2?' never gets the answer
+cached for 'What is 2*2?'. The words must match too, except for one typo
+inside a word (a letter added, dropped, replaced or swapped with its
+neighbour, keeping the first and last letters): 'acount' finds 'account',
+but 'unsafe' never finds 'safe', 'descending' never finds 'ascending' and
+'Germans' never finds 'Germany'. A high shingle similarity alone would
+accept all three. Prompts are normalized and turned into
+character-shingle MinHash signatures, which are indexed with LSH banding.
+Signatures use one-permutation hashing with rotation densification (one
+hash per shingle instead of one per shingle and permutation), which keeps
+them cheap enough to compute in pure Python. A lookup only verifies the
+handful of entries that share a band with the query, so its cost doesn't
+grow with the number of entries.
+
+The index uses Python's `hash()`, so it is only meaningful within one
+process; it is purely in memory.
+
+Everything else in the request (model, parameters, earlier messages) must
+match exactly; only the final user message is compared approximately.
+Like `ResponseCache`, only greedy (``temperature=0``) payloads are served
+unless ``force=True``.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from response_cache import is_deterministic
+
+_MASK64 = (1 << 64) - 1
+_MASK32 = (1 << 32) - 1
+# Offset added per bin of distance when densification borrows a neighbouring bin's value
+_DENSIFY_OFFSET = 0x9E3779B1
+# Sentence punctuation and quotes, except inside a word or number ("3.14", "don't")
+_PUNCTUATION = re.compile(r'(?<!\w)[.,!?;:"\'`\u2018\u2019\u201c\u201d]+|[.,!?;:"\'`\u2018\u2019\u201c\u201d]+(?!\w)')
+_WHITESPACE = re.compile(r'\s+')
+_INSIGNIFICANT = re.compile(r'[^\W\d_]+|\s+')
+
+
+def normalize_prompt(text: str) -> str:
+    """Casefold, drop sentence punctuation and collapse whitespace; digits and symbols are kept."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _significant(text: str) -> str:
+    """The digits and symbols of a normalized prompt, in order; a near-duplicate must have the same."""
+    return _INSIGNIFICANT.sub('', text)
+
+
+def _is_typo(a: str, b: str) -> bool:
+    """Whether `b` is `a` with one inner letter added, dropped, replaced or swapped with its neighbour."""
+    if min(len(a), len(b)) < 5 or a[0] != b[0] or a[-1] != b[-1]:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if abs(len(a) - len(b)) != 1:
+        return False
+    short, long = (a, b) if len(a) < len(b) else (b, a)
+    i = 0
+    while i < len(short) and short[i] == long[i]:
+        i += 1
+    return short[i:] == long[i + 1:]
+
+
+def _same_words(a: str, b: str) -> bool:
+    """Whether two normalized prompts have the same words, apart from at most one typo."""
+    words_a, words_b = a.split(' '), b.split(' ')
+    if len(words_a) != len(words_b):
+        return False
+    typos = 0
+    for x, y in zip(words_a, words_b):
+        if x != y:
+            typos += 1
+            if typos > 1 or not _is_typo(x, y):
+                return False
+    return True
+
+
+def split_payload(payload: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Split a chat payload into (namespace, final user prompt).
+
+    The namespace is a digest of everything that must match exactly. Returns
+    None for payloads that don't end with a user message.
+    """
+    messages = payload.get('messages') or []
+    if not messages or messages[-1].get('role') != 'user':
+        return None
+    rest = {k: v for k, v in payload.items() if k != 'messages'}
+    rest['history'] = messages[:-1]
+    namespace = hashlib.sha256(json.dumps(rest, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+    return namespace, str(messages[-1].get('content', ''))
+
+
+class _Entry:
+    __slots__ = ('namespace', 'text', 'symbols', 'signature', 'bands', 'value', 'created')
+
+    def __init__(self, namespace: str, text: str, signature: array, bands: Tuple[int, ...], value: str):
+        self.namespace = namespace
+        self.text = text
+        self.symbols = _significant(text)
+        self.signature = signature
+        self.bands = bands
+        self.value = value
+        self.created = time.time()
+
+
+class NearDuplicateCache:
+    """MinHash/LSH index of normalized prompts with bounded LRU eviction."""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 32, bands: int = 8, shingle_size: int = 4,
+                 max_entries: int = 100_000, ttl: Optional[float] = None, max_candidates: int = 16,
+                 max_bucket: int = 32):
+        """Create a cache.
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity (0-1) of prompt shingles for a hit;
+                the words must also match apart from one typo (see the module docstring)
+            num_perm: MinHash values (bins) per signature
+            bands: LSH bands; `num_perm` must be a multiple. More bands find
+                less similar candidates at a higher lookup cost
+            shingle_size: Characters per shingle of the normalized prompt
+            max_entries: Entries kept before the least recently used are evicted
+            ttl: Seconds an entry stays valid (None = forever)
+            max_candidates: Entries verified per lookup (those sharing the most bands first)
+            max_bucket: Entries kept per LSH bucket; a band shared by more prompts
+                carries little information, so further entries skip it
+        """
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_candidates = max_candidates
+        self.max_bucket = max_bucket
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, _Entry]' = OrderedDict()
+        self._exact: Dict[Tuple[str, str], int] = {}
+        # Band key -> entry id, or a set of ids once several entries share the band
+        self._buckets: Dict[int, Union[int, Set[int]]] = {}
+        self._next_id = 0
+        self._stats = {'hits': 0, 'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0,
+                       'expired': 0, 'candidates_checked': 0}
+
+    def _shingles(self, text: str) -> List[int]:
+        n = self.shingle_size
+        return [hash(text[i:i + n]) & _MASK64 for i in range(max(len(text) - n + 1, 1))]
+
+    def signature(self, text: str) -> array:
+        """One-permutation MinHash signature of an already-normalized prompt."""
+        k = self.num_perm
+        bins: List[Optional[int]] = [None] * k
+        for h in self._shingles(text):
+            index, value = h % k, h >> 32
+            current = bins[index]
+            if current is None or value < current:
+                bins[index] = value
+        # Rotation densification: an empty bin takes the next non-empty bin's value plus an offset
+        signature = array('I', bytes(4 * k))
+        for i in range(k):
+            value, distance = bins[i], 0
+            while value is None:
+                distance += 1
+                value = bins[(i + distance) % k]
+            signature[i] = (value + distance * _DENSIFY_OFFSET) & _MASK32
+        return signature
+
+    def _band_keys(self, namespace: str, signature: array) -> Tuple[int, ...]:
+        r = self.rows
+        return tuple(hash((namespace, i) + tuple(signature[i * r:(i + 1) * r])) for i in range(self.bands))
+
+    @staticmethod
+    def similarity(a: array, b: array) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl is not None and now - entry.created > self.ttl
+
+    def lookup(self, prompt: str, namespace: str = '') -> Optional[Tuple[Any, float]]:
+        """Return ``(value, similarity)`` of the most similar cached prompt above the threshold."""
+        text = normalize_prompt(prompt)
+        symbols = _significant(text)
+        now = time.time()
+        with self._lock:
+            entry_id = self._exact.get((namespace, text))
+            if entry_id is not None:
+                entry = self._entries[entry_id]
+                if entry.text != text or entry.symbols != symbols:
+                    entry_id = None
+                elif not self._expired(entry, now):
+                    self._entries.move_to_end(entry_id)
+                    self._stats['hits'] += 1
+                    self._stats['exact_hits'] += 1
+                    return json.loads(entry.value), 1.0
+                else:
+                    self._remove(entry_id)
+                    self._stats['expired'] += 1
+
+        signature = self.signature(text)
+        bands = self._band_keys(namespace, signature)
+        with self._lock:
+            # Entries sharing more bands with the query are likelier to be similar; verify those first
+            shared: Dict[int, int] = {}
+            for key in bands:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                for entry_id in ((bucket,) if isinstance(bucket, int) else bucket):
+                    shared[entry_id] = shared.get(entry_id, 0) + 1
+            candidates = sorted(shared, key=shared.__getitem__, reverse=True)[:self.max_candidates]
+            best_id, best = None, self.threshold
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.namespace != namespace or entry.symbols != symbols:
+                    continue
+                self._stats['candidates_checked'] += 1
+                score = self.similarity(signature, entry.signature)
+                if score >= best and _same_words(text, entry.text):
+                    best_id, best = entry_id, score
+                    if score == 1.0:
+                        break
+            if best_id is not None:
+                entry = self._entries[best_id]
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(best_id)
+                    self._stats['hits'] += 1
+                    self._stats['near_hits'] += 1
+                    return json.loads(entry.value), best
+                self._remove(best_id)
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def add(self, prompt: str, value: Any, namespace: str = '') -> None:
+        """Index `prompt` (normalized) with a JSON-serializable value."""
+        text = normalize_prompt(prompt)
+        signature = self.signature(text)
+        bands = self._band_keys(namespace, signature)
+        data = json.dumps(value, separators=(',', ':'))
+        with self._lock:
+            old = self._exact.get((namespace, text))
+            if old is not None:
+                self._remove(old)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(namespace, text, signature, bands, data)
+            self._exact[(namespace, text)] = entry_id
+            for key in bands:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    self._buckets[key] = entry_id
+                elif isinstance(bucket, int):
+                    self._buckets[key] = {bucket, entry_id}
+                elif len(bucket) < self.max_bucket:
+                    bucket.add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        if self._exact.get((entry.namespace, entry.text)) == entry_id:
+            del self._exact[(entry.namespace, entry.text)]
+        for key in entry.bands:
+            bucket = self._buckets.get(key)
+            if bucket == entry_id:
+                del self._buckets[key]
+            elif isinstance(bucket, set):
+                bucket.discard(entry_id)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket.pop()
+
+    def get(self, payload: Dict[str, Any], force: bool = False) -> Optional[Dict[str, Any]]:
+        """Cached response for a chat payload whose final prompt is a near-duplicate, or None."""
+        split = split_payload(payload) if force or is_deterministic(payload) else None
+        if split is None:
+            return None
+        hit = self.lookup(split[1], split[0])
+        return hit[0] if hit is not None else None
+
+    def put(self, payload: Dict[str, Any], response: Dict[str, Any], force: bool = False) -> None:
+        split = split_payload(payload) if force or is_deterministic(payload) else None
+        if split is not None:
+            self.add(split[1], response, split[0])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the number of entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._buckets.clear()
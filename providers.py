@@ -0,0 +1,93 @@
+"""Registry of LLM provider backends, imported on first use.
+
+Each provider is registered as a ``'module:attribute'`` string (or a
+callable), so importing this module pulls in neither `requests` nor the
+`openai` package; only the backend that is actually selected gets
+imported. `client_from_env` builds the client chosen by `PROVIDER` from the
+same environment variables the CLIs use.
+
+    from providers import client_from_env
+    client = client_from_env()          # PROVIDER=watsonx (default) or openai
+
+With ``PROVIDER=watsonx-cascade``, ``MODEL`` is a comma-separated list of
+models (cheapest first) for a `cascade.CascadeClient`. ``WATSONX_RECORD``
+names a file to record the sync clients' traffic to (see `recording`).
+"""
+import importlib
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+_registry: Dict[str, Union[str, Callable[..., Any]]] = {
+    'watsonx': 'watsonx_client:WatsonXClient',
+    'openai': 'watsonx_client:OpenAIClient',
+    'watsonx-async': 'async_client:AsyncWatsonXClient',
+    'watsonx-cascade': 'cascade:create_cascade',
+}
+_lock = threading.Lock()
+
+
+def register_provider(name: str, target: Union[str, Callable[..., Any]]) -> None:
+    """Register a client factory as a callable or a lazily imported ``'module:attribute'`` path."""
+    with _lock:
+        _registry[name.lower()] = target
+
+
+def available_providers() -> List[str]:
+    return sorted(_registry)
+
+
+def get_provider(name: str) -> Callable[..., Any]:
+    """Return the client factory for `name`, importing its module on first use."""
+    key = name.lower()
+    with _lock:
+        target = _registry.get(key)
+    if target is None:
+        raise ValueError(f"Unknown provider {name!r}; available: {', '.join(available_providers())}")
+    if isinstance(target, str):
+        module_name, _, attribute = target.partition(':')
+        target = getattr(importlib.import_module(module_name), attribute)
+        with _lock:
+            _registry[key] = target
+    return target
+
+
+def create_client(name: str, **kwargs) -> Any:
+    """Instantiate the client registered as `name`."""
+    return get_provider(name)(**kwargs)
+
+
+def _require_env(name: str) -> str:
+    value = os.getenv(name)
+    if value is None:
+        raise RuntimeError(f'Missing environment variable: {name}')
+    return value
+
+
+def client_from_env(provider: Optional[str] = None, **overrides) -> Any:
+    """Create the client selected by `provider` (default: $PROVIDER) from environment variables.
+
+    WatsonX clients don't contact IAM here; the token is fetched on the first
+    request (pass ``prefetch_token=True`` to start the exchange in the background).
+    """
+    provider = (provider or os.getenv('PROVIDER', 'watsonx')).lower()
+    if provider == 'openai':
+        kwargs = {'api_key': _require_env('OPENAI_API_KEY'), 'model': os.getenv('MODEL', 'gpt-4o')}
+    else:
+        kwargs = {
+            'base_url': _require_env('WATSONX_BASE_URL'),
+            'api_key': _require_env('WATSONX_API_KEY'),
+            'project_id': _require_env('WATSONX_PROJECT_ID'),
+            'model': _require_env('MODEL'),
+            'use_api_key_direct': os.getenv('WATSONX_USE_APIKEY_DIRECT', 'false').lower() in ('1', 'true', 'yes'),
+        }
+        if os.getenv('WATSONX_IAM_URL'):
+            kwargs['iam_url'] = os.getenv('WATSONX_IAM_URL')
+        if os.getenv('WATSONX_GZIP_THRESHOLD') and provider != 'watsonx-async':
+            kwargs['gzip_threshold'] = int(os.getenv('WATSONX_GZIP_THRESHOLD'))
+        if os.getenv('WATSONX_RECORD') and provider != 'watsonx-async':
+            # Imported only when recording, so normal start-up doesn't pay for it
+            from recording import RecordingTransport
+            kwargs['transport'] = RecordingTransport(os.getenv('WATSONX_RECORD'))
+    kwargs.update(overrides)
+    return create_client(provider, **kwargs)
@@ -0,0 +1,389 @@
+"""OpenAI-compatible local proxy in front of WatsonX.
+
+Serves ``POST /v1/chat/completions`` in the OpenAI request/response shape
+(including ``stream=true`` as `chat.completion.chunk` server-sent events)
+and forwards each call to WatsonX's ``/ml/v1/text/chat`` or
+``/ml/v1/text/chat_stream``. Every downstream request shares one IAM token
+manager, one keep-alive connection pool and one `RateGovernor`, so N
+applications behind the proxy cost one token exchange and one quota
+instead of N. Existing OpenAI SDK code only needs its base URL changed:
+
+    client = OpenAI(base_url='http://127.0.0.1:8000/v1', api_key='unused')
+
+Usage:
+    python proxy_server.py [--host 127.0.0.1] [--port 8000] [--max-concurrency 32]
+        [--requests-per-second 10] [--tokens-per-minute 200000] [--model-map gpt-4o=ibm/granite-4-h-small]
+
+Credentials and the default model come from the same environment variables
+as the CLIs. Requires the optional `aiohttp` package.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from async_client import AsyncIAMTokenManager
+from rate_limit import AIMDController, RateGovernor, estimate_tokens
+from streaming import iter_sse_events, parse_chat_chunk
+from token_manager import IAM_URL
+from watsonx_client import CHAT_PATH, CHAT_STREAM_PATH, build_chat_payload
+
+try:
+    import aiohttp
+    from aiohttp import web
+except Exception:
+    aiohttp = None
+    web = None
+
+logger = logging.getLogger(__name__)
+
+# OpenAI request fields WatsonX's chat endpoint accepts under the same name
+PASSTHROUGH_PARAMS = ('temperature', 'top_p', 'frequency_penalty', 'presence_penalty', 'stop', 'seed', 'n',
+                      'tools', 'tool_choice', 'response_format', 'logprobs', 'top_logprobs')
+
+
+def openai_to_watsonx(body: Dict[str, Any], project_id: str, model: str, max_tokens: int = 1024) -> Dict[str, Any]:
+    """Translate an OpenAI chat completion request body into a WatsonX chat payload.
+
+    Args:
+        body: Decoded OpenAI request (``messages`` is required)
+        project_id: WatsonX project ID
+        model: WatsonX model ID to send the request to
+        max_tokens: Used when the request sets neither ``max_tokens`` nor ``max_completion_tokens``
+    """
+    messages = body.get('messages')
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("'messages' must be a non-empty list")
+    limit = body.get('max_completion_tokens') or body.get('max_tokens') or max_tokens
+    payload = build_chat_payload(model, project_id, '', int(limit), messages=messages)
+    for key in PASSTHROUGH_PARAMS:
+        if body.get(key) is not None:
+            payload[key] = body[key]
+    return payload
+
+
+def watsonx_to_openai(result: Dict[str, Any], model: str) -> Dict[str, Any]:
+    """Reshape a WatsonX chat response into an OpenAI ``chat.completion`` object."""
+    return {
+        'id': result.get('id') or f'chatcmpl-{uuid.uuid4().hex}',
+        'object': 'chat.completion',
+        'created': result.get('created') or int(time.time()),
+        'model': model,
+        'choices': result.get('choices') or [],
+        'usage': result.get('usage') or {},
+    }
+
+
+def _error_body(message: str, kind: str = 'invalid_request_error', code: Optional[str] = None) -> Dict[str, Any]:
+    return {'error': {'message': message, 'type': kind, 'param': None, 'code': code}}
+
+
+class UpstreamError(Exception):
+    """WatsonX answered with a non-2xx status; carries the status and body to relay."""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f'WatsonX error {status}: {body[:200]}')
+        self.status = status
+        self.body = body
+
+
+class WatsonXProxy:
+    """aiohttp application translating OpenAI chat requests to WatsonX over shared state."""
+
+    def __init__(self, base_url: str, api_key: str, project_id: str, model: str, use_api_key_direct: bool = False,
+                 iam_url: str = IAM_URL, rate_governor: Optional[RateGovernor] = None,
+                 max_connections: int = 100, timeout: float = 120, model_map: Optional[Dict[str, str]] = None,
+                 default_max_tokens: int = 1024, proxy_api_key: Optional[str] = None):
+        """Configure the proxy; the connection pool is created when the app starts.
+
+        Args:
+            base_url: e.g., 'https://us-south.ml.cloud.ibm.com'
+            api_key: IBM API key
+            project_id: WatsonX project ID
+            model: WatsonX model used for requests whose `model` isn't mapped
+            use_api_key_direct: Send the API key as the bearer token (no IAM exchange)
+            iam_url: IAM token endpoint (override to point at a local stand-in)
+            rate_governor: Governor shared by all downstream requests (a default AIMD one if omitted)
+            max_connections: Size of the shared connection pool to WatsonX
+            timeout: Seconds allowed for a completion (for streams: between chunks)
+            model_map: OpenAI model name -> WatsonX model ID; names containing '/'
+                are taken as WatsonX IDs as they are
+            default_max_tokens: Completion limit for requests that don't set one
+            proxy_api_key: If set, callers must send it as their bearer token
+        """
+        if aiohttp is None:
+            raise RuntimeError('aiohttp package not installed')
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.project_id = project_id
+        self.model = model
+        self.use_api_key_direct = bool(use_api_key_direct)
+        self.token_manager = None if self.use_api_key_direct else AsyncIAMTokenManager(api_key, iam_url=iam_url)
+        self.rate_governor = rate_governor or RateGovernor(concurrency=AIMDController(maximum=max_connections))
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.model_map = dict(model_map or {})
+        self.default_max_tokens = default_max_tokens
+        self.proxy_api_key = proxy_api_key
+        self._session: Optional['aiohttp.ClientSession'] = None
+        self._stats = {'requests': 0, 'streams': 0, 'errors': 0}
+
+    def resolve_model(self, name: Optional[str]) -> str:
+        """WatsonX model ID for the `model` field of an OpenAI request."""
+        if name in self.model_map:
+            return self.model_map[name]
+        return name if name and '/' in name else self.model
+
+    def app(self) -> 'web.Application':
+        """Build the aiohttp application; the shared session lives as long as the app."""
+        app = web.Application(client_max_size=8 * 1024 * 1024)
+        app.router.add_post('/v1/chat/completions', self.handle_chat)
+        app.router.add_get('/v1/models', self.handle_models)
+        app.router.add_get('/healthz', self.handle_health)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def _start(self, app) -> None:
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def _close(self, app) -> None:
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def _current_token(self) -> str:
+        if self.token_manager is None:
+            return self.api_key
+        return await self.token_manager.get_token_async(self._session)
+
+    async def _post(self, path: str, payload: Dict[str, Any],
+                    stream: bool) -> Tuple['aiohttp.ClientResponse', Callable[[], None]]:
+        """POST to WatsonX under the shared governor; returns a 200 response and its `release` callable.
+
+        The response keeps its governor slot until the caller has read the
+        body and calls `release` (which also releases the connection), so the
+        concurrency limit bounds streams for as long as they run. Retries once
+        with a fresh token on 401 and re-sends throttled (429/503) requests
+        after the governor's back-off.
+        """
+        url = f'{self.base_url}{path}'
+        tokens = estimate_tokens(payload)
+        if stream:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        else:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+        auth_retried = False
+        throttle_retries = 0
+        while True:
+            token = await self._current_token()
+            headers = {
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream' if stream else 'application/json',
+            }
+            await self.rate_governor.acquire_async(tokens)
+            status, retry_after = None, None
+            try:
+                resp = await self._session.post(url, headers=headers, json=payload, timeout=timeout)
+                status, retry_after = resp.status, resp.headers.get('Retry-After')
+            finally:
+                if status != 200:
+                    throttled = self.rate_governor.release(status, retry_after)
+            if status == 200:
+                def release(resp=resp) -> None:
+                    resp.release()
+                    self.rate_governor.release(200, None)
+                return resp, release
+            if resp.status == 401 and self.token_manager is not None and not auth_retried:
+                logger.debug('Access token rejected (401); refreshing and retrying once')
+                resp.release()
+                await self.token_manager.invalidate_async(token)
+                auth_retried = True
+                continue
+            if throttled and throttle_retries < self.rate_governor.max_throttle_retries:
+                logger.debug('Throttled (%s); backing off and retrying', resp.status)
+                resp.release()
+                throttle_retries += 1
+                continue
+            body = await resp.text()
+            resp.release()
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning('WatsonX error %s: %s', resp.status, body[:500])
+            raise UpstreamError(resp.status, body)
+
+    def _refund(self, payload: Dict[str, Any], usage: Optional[Dict[str, Any]]) -> None:
+        if usage and usage.get('total_tokens') is not None:
+            self.rate_governor.refund_tokens(estimate_tokens(payload) - usage['total_tokens'])
+
+    def _authorized(self, request: 'web.Request') -> bool:
+        if self.proxy_api_key is None:
+            return True
+        return request.headers.get('Authorization', '') == f'Bearer {self.proxy_api_key}'
+
+    async def handle_chat(self, request: 'web.Request') -> 'web.StreamResponse':
+        """``POST /v1/chat/completions``."""
+        if not self._authorized(request):
+            return web.json_response(_error_body('Invalid API key', code='invalid_api_key'), status=401)
+        try:
+            body = await request.json()
+            model = self.resolve_model(body.get('model'))
+            payload = openai_to_watsonx(body, self.project_id, model, self.default_max_tokens)
+        except (ValueError, AttributeError) as e:
+            return web.json_response(_error_body(f'Invalid request: {e}'), status=400)
+
+        self._stats['requests'] += 1
+        try:
+            if body.get('stream'):
+                self._stats['streams'] += 1
+                include_usage = bool((body.get('stream_options') or {}).get('include_usage'))
+                return await self._stream(request, payload, body.get('model') or model, include_usage)
+            resp, release = await self._post(CHAT_PATH, payload, stream=False)
+            try:
+                result = await resp.json(content_type=None)
+            finally:
+                release()
+        except UpstreamError as e:
+            self._stats['errors'] += 1
+            return web.json_response(_error_body(e.body[:1000], 'upstream_error', str(e.status)), status=e.status)
+        except asyncio.TimeoutError:
+            self._stats['errors'] += 1
+            return web.json_response(_error_body('WatsonX request timed out', 'upstream_error', 'timeout'), status=504)
+        except aiohttp.ClientError as e:
+            self._stats['errors'] += 1
+            return web.json_response(_error_body(f'WatsonX unreachable: {e}', 'upstream_error'), status=502)
+        self._refund(payload, result.get('usage'))
+        return web.json_response(watsonx_to_openai(result, body.get('model') or model))
+
+    async def _stream(self, request: 'web.Request', payload: Dict[str, Any], model: str,
+                      include_usage: bool) -> 'web.StreamResponse':
+        # Upstream errors before the first byte still get a proper status code
+        resp, release = await self._post(CHAT_STREAM_PATH, payload, stream=True)
+        out = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        try:
+            await out.prepare(request)
+        except BaseException:
+            release()
+            raise
+        chunk_id, created = f'chatcmpl-{uuid.uuid4().hex}', int(time.time())
+        usage = None
+        first = True
+
+        async def relay(block: List[bytes]) -> None:
+            nonlocal usage, first
+            for event, data in iter_sse_events(block):
+                if event == 'error':
+                    raise RuntimeError(f'WatsonX stream error: {data[:500]}')
+                if data.strip() == '[DONE]':
+                    continue
+                delta = parse_chat_chunk(json.loads(data))
+                usage = delta.usage or usage
+                choices = delta.raw.get('choices') or []
+                if first and choices and isinstance(choices[0].get('delta'), dict):
+                    choices[0]['delta'].setdefault('role', 'assistant')
+                    first = False
+                chunk = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': created,
+                         'model': model, 'choices': choices}
+                await out.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+
+        try:
+            # Relay event by event so tokens reach the caller as soon as WatsonX sends them
+            block: List[bytes] = []
+            async for line in resp.content:
+                line = line.rstrip(b'\r\n')
+                block.append(line)
+                if not line:
+                    await relay(block)
+                    block = []
+            await relay(block)
+            if include_usage and usage:
+                chunk = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': created,
+                         'model': model, 'choices': [], 'usage': usage}
+                await out.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+        except (RuntimeError, ValueError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Headers are gone; report the failure in-band the way OpenAI streams do
+            self._stats['errors'] += 1
+            logger.warning('Stream from WatsonX failed: %s', e)
+            await out.write(f"data: {json.dumps(_error_body(str(e), 'upstream_error'))}\n\n".encode())
+        except ConnectionResetError:
+            logger.debug('Caller disconnected mid-stream')
+            return out
+        finally:
+            release()
+        self._refund(payload, usage)
+        await out.write(b'data: [DONE]\n\n')
+        await out.write_eof()
+        return out
+
+    async def handle_models(self, request: 'web.Request') -> 'web.Response':
+        """``GET /v1/models``: the default model plus every mapped name."""
+        names = [self.model] + sorted(set(self.model_map) | set(self.model_map.values()) - {self.model})
+        return web.json_response({'object': 'list', 'data': [
+            {'id': name, 'object': 'model', 'created': 0, 'owned_by': 'watsonx'} for name in names]})
+
+    async def handle_health(self, request: 'web.Request') -> 'web.Response':
+        """``GET /healthz``: proxy counters and the shared governor's state."""
+        return web.json_response(self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request/stream/error counters plus the governor's stats."""
+        return {**self._stats, 'governor': self.rate_governor.stats()}
+
+
+def _parse_model_map(items: List[str]) -> Dict[str, str]:
+    mapping = {}
+    for item in items:
+        name, sep, target = item.partition('=')
+        if not sep:
+            raise ValueError(f'Expected NAME=WATSONX_MODEL, got {item!r}')
+        mapping[name.strip()] = target.strip()
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI-compatible proxy in front of WatsonX.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-concurrency', type=int, default=32, help='initial downstream concurrency limit')
+    parser.add_argument('--max-connections', type=int, default=100, help='connection pool size (and AIMD ceiling)')
+    parser.add_argument('--requests-per-second', type=float, help='downstream request rate cap')
+    parser.add_argument('--tokens-per-minute', type=float, help='downstream token rate cap')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--model-map', action='append', default=[], metavar='NAME=MODEL',
+                        help='map an OpenAI model name to a WatsonX model (repeatable)')
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper(), format='[%(levelname)s] %(message)s')
+    for name in ('WATSONX_BASE_URL', 'WATSONX_API_KEY', 'WATSONX_PROJECT_ID', 'MODEL'):
+        if not os.getenv(name):
+            raise SystemExit(f'[ERROR] Missing environment variable: {name}')
+
+    governor = RateGovernor(requests_per_second=args.requests_per_second, tokens_per_minute=args.tokens_per_minute,
+                            concurrency=AIMDController(initial=args.max_concurrency, maximum=args.max_connections))
+    proxy = WatsonXProxy(
+        base_url=os.getenv('WATSONX_BASE_URL'),
+        api_key=os.getenv('WATSONX_API_KEY'),
+        project_id=os.getenv('WATSONX_PROJECT_ID'),
+        model=os.getenv('MODEL'),
+        use_api_key_direct=os.getenv('WATSONX_USE_APIKEY_DIRECT', 'false').lower() in ('1', 'true', 'yes'),
+        iam_url=os.getenv('WATSONX_IAM_URL') or IAM_URL,
+        rate_governor=governor,
+        max_connections=args.max_connections,
+        timeout=args.timeout,
+        model_map=_parse_model_map(args.model_map),
+        proxy_api_key=os.getenv('PROXY_API_KEY'),
+    )
+    print(f'[INFO] OpenAI-compatible endpoint: http://{args.host}:{args.port}/v1 -> {proxy.base_url}')
+    web.run_app(proxy.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
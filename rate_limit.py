@@ -0,0 +1,275 @@
+"""Client-side rate governor for WatsonX requests.
+
+`RateGovernor` combines token buckets for requests/second and tokens/minute
+with an AIMD (additive-increase, multiplicative-decrease) concurrency limit.
+A 429 or 503 halves the concurrency limit and pauses every caller for the
+server's `Retry-After`; healthy responses grow the limit again by about one
+slot per round trip. One governor is shared by every caller of a client
+(and can be shared between clients that hit the same quota). Coroutines
+use `acquire_async`, which waits on the event loop instead of blocking it,
+so threads and event loops can share one governor.
+"""
+import email.utils
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from deadline import Cancelled, Deadline, DeadlineExceeded
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `reserve` books capacity and returns the wait needed."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """Create a bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Burst size (defaults to one second's worth, at least 1)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens (possibly going into debt); return seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Return unused tokens (e.g. when actual usage was below the estimate)."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class AIMDController:
+    """Concurrency limit that backs off multiplicatively and recovers additively."""
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 256,
+                 decrease_factor: float = 0.5, cooldown: float = 1.0):
+        """Create a controller.
+
+        Args:
+            initial: Starting concurrency limit
+            minimum: Lowest limit after back-off
+            maximum: Highest limit reached by ramp-up
+            decrease_factor: Multiplier applied to the limit on throttling
+            cooldown: Seconds after a decrease during which further throttles
+                don't decrease again (they belong to the same overload episode)
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[Any, Any]] = []  # (event loop, future) of waiting coroutines
+
+    def acquire(self, timeout: Optional[float] = None, deadline: Optional[Deadline] = None) -> float:
+        """Block until a slot is free; return the seconds spent waiting.
+
+        Raises `DeadlineExceeded` if no slot frees up within `timeout` seconds,
+        and `Cancelled` as soon as `deadline` is cancelled.
+        """
+        start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                left = None if timeout is None else timeout - (time.monotonic() - start)
+                if left is not None and left <= 0:
+                    raise DeadlineExceeded('timed out waiting for a concurrency slot')
+                if deadline is not None:
+                    deadline.check()
+                    # Poll so an explicit cancel() also ends the wait
+                    left = 0.05 if left is None else min(left, 0.05)
+                self._cond.wait(left)
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    async def acquire_async(self) -> float:
+        """Wait on the event loop until a slot is free; return the seconds spent waiting."""
+        import asyncio  # only coroutine callers pay for the import
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return time.monotonic() - start
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, throttled: bool = False, success: bool = True) -> None:
+        """Free a slot and adapt the limit to the outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            # Waiters re-check the limit, so waking all of them is safe
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RateGovernor:
+    """Shared request/token rate limits plus adaptive concurrency for one quota."""
+
+    def __init__(self, requests_per_second: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 concurrency: Optional[AIMDController] = None, max_throttle_retries: int = 3,
+                 default_retry_after: float = 1.0):
+        """Create a governor.
+
+        Args:
+            requests_per_second: Request rate cap (None = unlimited)
+            tokens_per_minute: Prompt + completion token rate cap (None = unlimited)
+            concurrency: AIMD concurrency controller (a default one is created if omitted)
+            max_throttle_retries: Times a throttled (429/503) request is re-sent
+            default_retry_after: Pause in seconds when a throttle carries no Retry-After
+        """
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = concurrency or AIMDController()
+        self.max_throttle_retries = max_throttle_retries
+        self.default_retry_after = default_retry_after
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+    def acquire(self, tokens: float = 0.0, timeout: Optional[float] = None,
+                deadline: Optional[Deadline] = None) -> float:
+        """Block until the request may be sent; return the seconds spent waiting.
+
+        With a `timeout`, raises `DeadlineExceeded` right away (without waiting)
+        when the back-off or rate limits need longer than that, or once no
+        concurrency slot has freed up in time. A `deadline` caps `timeout` at
+        the time it has left, and cancelling it ends the wait with `Cancelled`.
+        """
+        sleep = time.sleep
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+            sleep = deadline.sleep
+        waited = 0.0
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            if timeout is not None and pause >= timeout:
+                raise DeadlineExceeded(f'throttled for {pause:.2f}s, longer than the time left')
+            sleep(pause)
+            waited += pause
+        delay = self._reserve(tokens)
+        if delay > 0:
+            if timeout is not None and waited + delay >= timeout:
+                self._unreserve(tokens)
+                raise DeadlineExceeded(f'rate limit needs {delay:.2f}s, longer than the time left')
+            try:
+                sleep(delay)
+            except Cancelled:
+                self._unreserve(tokens)
+                raise
+            waited += delay
+        waited += self.concurrency.acquire(None if timeout is None else timeout - waited, deadline)
+        self._record_acquire(waited)
+        return waited
+
+    async def acquire_async(self, tokens: float = 0.0) -> float:
+        """Like `acquire`, but waits on the event loop; release with `release` as usual."""
+        import asyncio
+        waited = 0.0
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+            waited += pause
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        waited += await self.concurrency.acquire_async()
+        self._record_acquire(waited)
+        return waited
+
+    def _reserve(self, tokens: float) -> float:
+        delay = self.request_bucket.reserve() if self.request_bucket else 0.0
+        if self.token_bucket and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        return delay
+
+    def _unreserve(self, tokens: float) -> None:
+        if self.request_bucket:
+            self.request_bucket.refund(1.0)
+        if self.token_bucket and tokens:
+            self.token_bucket.refund(tokens)
+
+    def _record_acquire(self, waited: float) -> None:
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['wait_seconds'] += waited
+
+    def release(self, status_code: Optional[int], retry_after: Optional[str] = None) -> bool:
+        """Report a finished request; return True if it was throttled."""
+        throttled = status_code in THROTTLE_STATUSES
+        if throttled:
+            pause = parse_retry_after(retry_after)
+            with self._lock:
+                self._stats['throttled'] += 1
+                until = time.monotonic() + (pause if pause is not None else self.default_retry_after)
+                self._paused_until = max(self._paused_until, until)
+        healthy = status_code is not None and status_code < 500
+        self.concurrency.release(throttled=throttled, success=healthy)
+        return throttled
+
+    def refund_tokens(self, tokens: float) -> None:
+        """Give back tokens reserved beyond what a request actually used."""
+        if self.token_bucket and tokens > 0:
+            self.token_bucket.refund(tokens)
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters plus the current concurrency limit."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['concurrency_limit'] = int(self.concurrency.limit)
+        stats['in_flight'] = self.concurrency.in_flight
+        return stats
+
+
+def estimate_tokens(payload: Dict) -> int:
+    """Rough token estimate for a chat or embeddings payload: ~4 characters per input token plus max_tokens."""
+    chars = sum(len(str(m.get('content', ''))) for m in payload.get('messages', []))
+    chars += sum(len(text) for text in payload.get('inputs', ()))
+    return chars // 4 + int(payload.get('max_tokens') or 0)
@@ -0,0 +1,363 @@
+"""Record WatsonX traffic to a file and replay it offline.
+
+`RecordingTransport` is a drop-in `PooledTransport` that appends every
+exchange to a JSON-lines file (gzip-compressed when the name ends in
+``.gz``). Each record holds the request, the status, the response headers
+and body, the time to first byte and the total time. Streams are stored as
+their raw chunks with arrival offsets. Secrets are redacted before anything
+is written: auth headers and cookies, the IAM API key, and issued tokens.
+
+    recorder = RecordingTransport('traffic.jsonl.gz')
+    client = WatsonXClient(..., transport=recorder)
+
+`ReplayTransport` serves recorded exchanges back without credentials or a
+network, waiting the recorded latency times `latency_scale`. A request
+gets the next recorded exchange with the same method, path and (redacted)
+body. If the body changed, for example because the client under test
+builds payloads differently, it gets the next exchange for the same
+endpoint instead. `replay_traffic.py` uses this to re-issue a recording at
+N times its original pace and report throughput and tail latency.
+
+`WATSONX_RECORD=traffic.jsonl` makes `providers.client_from_env` (and so
+the CLIs) record through a `RecordingTransport`.
+"""
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from codec import decode_body, loads
+from deadline import Deadline
+from transport import PooledTransport
+
+REDACTED = '[REDACTED]'
+SECRET_HEADERS = frozenset({'authorization', 'proxy-authorization', 'cookie', 'set-cookie', 'x-api-key'})
+SECRET_KEYS = frozenset({'apikey', 'api_key', 'access_token', 'refresh_token', 'delegated_refresh_token',
+                         'password', 'client_secret', 'secret'})
+
+
+def redact(value: Any, keys: Iterable[str] = SECRET_KEYS) -> Any:
+    """Copy of a JSON-like value with the values of secret keys replaced, at any depth."""
+    keys = keys if isinstance(keys, frozenset) else frozenset(k.lower() for k in keys)
+    if isinstance(value, dict):
+        return {k: REDACTED if str(k).lower() in keys else redact(v, keys) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, keys) for v in value]
+    return value
+
+
+def redact_headers(headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    return {k: REDACTED if k.lower() in SECRET_HEADERS else v for k, v in (headers or {}).items()}
+
+
+def redact_url(url: str, keys: Iterable[str] = SECRET_KEYS) -> str:
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, REDACTED if k.lower() in keys else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(query, safe='[]')))
+
+
+def _request_body(kwargs: Dict[str, Any], keys: frozenset) -> Dict[str, Any]:
+    if kwargs.get('json') is not None:
+        return {'json': redact(kwargs['json'], keys)}
+    data = kwargs.get('data')
+    if data is None:
+        return {}
+    headers = {k.lower(): v for k, v in (kwargs.get('headers') or {}).items()}
+    if isinstance(data, bytes):
+        data = decode_body(data, headers.get('content-encoding'))
+        if headers.get('content-type', '').startswith('application/json'):
+            return {'json': redact(loads(data), keys)}
+        data = data.decode('utf-8', 'replace')
+    if isinstance(data, str):
+        data = dict(parse_qsl(data, keep_blank_values=True)) or data
+    return {'form': redact(data, keys) if isinstance(data, dict) else data}
+
+
+def _decode(data: bytes) -> str:
+    # surrogateescape keeps bytes split mid-character intact through JSON
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def _encode(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogateescape')
+
+
+def fingerprint(method: str, url: str, body: Dict[str, Any]) -> str:
+    """Key matching a replayed request to recorded ones: method, path and redacted body."""
+    canonical = json.dumps(body, sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+    return hashlib.sha1(f'{method.upper()} {urlsplit(url).path}\n{canonical}'.encode()).hexdigest()
+
+
+class TrafficRecorder:
+    """Thread-safe append-only writer of exchange records (JSON lines, gzip if the path ends in ``.gz``)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: IO[str] = (gzip.open(path, 'at', encoding='utf-8') if path.endswith('.gz')
+                               else open(path, 'a', encoding='utf-8'))
+        self.records = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=True) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def load_exchanges(path: str) -> List[Dict[str, Any]]:
+    """Read a recording written by `TrafficRecorder`, skipping a torn final line."""
+    opener = gzip.open if path.endswith('.gz') else open
+    exchanges = []
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        exchanges.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except EOFError:
+            # A gzip member cut short by a crash
+            pass
+    return exchanges
+
+
+class RecordingTransport(PooledTransport):
+    """`PooledTransport` that records each exchange (redacted) while passing it through."""
+
+    def __init__(self, recorder: Union[TrafficRecorder, str], redact_keys: Sequence[str] = (), **pool_kwargs):
+        """Create a recording transport.
+
+        Args:
+            recorder: A `TrafficRecorder` or the path of the file to append to
+            redact_keys: Extra JSON keys whose values must never be written
+            **pool_kwargs: Passed to `PooledTransport`
+        """
+        super().__init__(**pool_kwargs)
+        self.recorder = recorder if isinstance(recorder, TrafficRecorder) else TrafficRecorder(recorder)
+        self.secret_keys = SECRET_KEYS | {k.lower() for k in redact_keys}
+
+    def request(self, method: str, url: str, deadline: Optional[Deadline] = None, **kwargs) -> requests.Response:
+        record: Dict[str, Any] = {
+            't': round(time.time(), 4),
+            'method': method.upper(),
+            'url': redact_url(url, self.secret_keys),
+            'request_headers': redact_headers(kwargs.get('headers')),
+            'stream': bool(kwargs.get('stream')),
+            **_request_body(kwargs, self.secret_keys),
+        }
+        start = time.perf_counter()
+        try:
+            resp = super().request(method, url, deadline=deadline, **kwargs)
+        except Exception as e:
+            record['error'] = f'{type(e).__name__}: {e}'
+            record['total'] = round(time.perf_counter() - start, 4)
+            self.recorder.write(record)
+            raise
+        record['status'] = resp.status_code
+        record['headers'] = redact_headers(dict(resp.headers))
+        record['ttfb'] = round(resp.elapsed.total_seconds(), 4)
+        if record['stream']:
+            self._tap(resp, record, start)
+        else:
+            record['body'] = self._body(resp)
+            record['total'] = round(time.perf_counter() - start, 4)
+            self.recorder.write(record)
+        return resp
+
+    def _body(self, resp: requests.Response) -> Any:
+        try:
+            return {'json': redact(resp.json(), self.secret_keys)}
+        except ValueError:
+            return {'text': _decode(resp.content)}
+
+    def _tap(self, resp: requests.Response, record: Dict[str, Any], start: float) -> None:
+        """Record a streamed body chunk by chunk as the caller reads it; written when the stream ends."""
+        chunks: List[Tuple[float, str]] = []
+        record['chunks'] = chunks
+        written = []
+
+        def finish(error: Optional[BaseException] = None) -> None:
+            if written:
+                return
+            written.append(True)
+            if isinstance(error, GeneratorExit):
+                # The caller stopped reading early (cancelled, or a stop sequence was seen)
+                record['aborted'] = True
+            elif error is not None:
+                record['error'] = f'{type(error).__name__}: {error}'
+            record['total'] = round(time.perf_counter() - start, 4)
+            self.recorder.write(record)
+
+        read = resp.iter_content
+        close = resp.close
+
+        def iter_content(chunk_size=1, decode_unicode=False):
+            error = None
+            try:
+                for chunk in read(chunk_size, decode_unicode):
+                    data = chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+                    chunks.append((round(time.perf_counter() - start, 4), _decode(data)))
+                    yield chunk
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                finish(error)
+
+        def close_and_record():
+            close()
+            finish()
+
+        resp.iter_content = iter_content
+        resp.close = close_and_record
+
+    def close(self) -> None:
+        super().close()
+        self.recorder.close()
+
+
+class _ReplayStream:
+    """Stands in for ``resp.raw``: yields recorded chunks at their recorded offsets (scaled)."""
+
+    def __init__(self, chunks: List[List[Any]], ttfb: float, scale: float, start: float,
+                 deadline: Optional[Deadline], error: Optional[str]):
+        self.chunks = chunks
+        self.ttfb = ttfb
+        self.scale = scale
+        self.start = start
+        self.deadline = deadline
+        self.error = error
+        self.closed = threading.Event()
+
+    def stream(self, chunk_size=None, decode_content=True) -> Iterator[bytes]:
+        for offset, text in self.chunks:
+            delay = self.start + max(offset - self.ttfb, 0.0) * self.scale - time.perf_counter()
+            if delay > 0:
+                if self.deadline is not None:
+                    self.deadline.sleep(delay)
+                elif self.closed.wait(delay):
+                    return
+            if self.closed.is_set():
+                return
+            yield _encode(text)
+        if self.error:
+            raise requests.ConnectionError(f'replayed: {self.error}')
+
+    def read(self, amt=None, decode_content=True) -> bytes:
+        return b''.join(self.stream())
+
+    def close(self) -> None:
+        self.closed.set()
+
+    def release_conn(self) -> None:
+        pass
+
+
+class ReplayTransport(PooledTransport):
+    """Serves recorded exchanges instead of sending requests; no credentials or network needed."""
+
+    def __init__(self, exchanges: Union[str, Sequence[Dict[str, Any]]], latency_scale: float = 1.0,
+                 redact_keys: Sequence[str] = ()):
+        """Create a replay transport.
+
+        Args:
+            exchanges: A recording's path or its loaded records
+            latency_scale: Multiplier for recorded latencies (0.1 = ten times faster, 0 = instant)
+            redact_keys: The extra keys redacted when recording, so request bodies match exactly
+        """
+        super().__init__()
+        self.secret_keys = SECRET_KEYS | {k.lower() for k in redact_keys}
+        self.exchanges = load_exchanges(exchanges) if isinstance(exchanges, str) else list(exchanges)
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_path: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._cursor: Dict[Any, int] = {}
+        self._counts = {'exact': 0, 'by_path': 0, 'missing': 0}
+        for exchange in self.exchanges:
+            body = {k: exchange[k] for k in ('json', 'form') if k in exchange}
+            self._by_key.setdefault(fingerprint(exchange['method'], exchange['url'], body), []).append(exchange)
+            self._by_path.setdefault((exchange['method'], urlsplit(exchange['url']).path), []).append(exchange)
+
+    def _next(self, key: Any, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Caller holds the lock; cycles so a recording can be replayed for longer than it lasted
+        i = self._cursor.get(key, 0)
+        self._cursor[key] = i + 1
+        return candidates[i % len(candidates)]
+
+    def match(self, method: str, url: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """The recorded exchange to serve for a request."""
+        method = method.upper()
+        key = fingerprint(method, url, _request_body(kwargs, self.secret_keys))
+        path = (method, urlsplit(url).path)
+        with self._lock:
+            if key in self._by_key:
+                self._counts['exact'] += 1
+                return self._next(key, self._by_key[key])
+            if path in self._by_path:
+                self._counts['by_path'] += 1
+                return self._next(path, self._by_path[path])
+            self._counts['missing'] += 1
+        raise requests.ConnectionError(f'No recorded exchange for {method} {path[1]}')
+
+    def request(self, method: str, url: str, deadline: Optional[Deadline] = None, **kwargs) -> requests.Response:
+        self.stats.record_request()
+        start = time.perf_counter()
+        if deadline is not None:
+            deadline.check()
+        exchange = self.match(method, url, kwargs)
+        streamed = bool(kwargs.get('stream')) and 'chunks' in exchange
+        wait = (exchange.get('ttfb', 0.0) if streamed or 'status' not in exchange
+                else exchange.get('total', 0.0)) * self.latency_scale
+        if wait > 0:
+            if deadline is not None:
+                deadline.sleep(wait)
+            else:
+                time.sleep(wait)
+        if 'status' not in exchange:
+            raise requests.ConnectionError(f"replayed: {exchange.get('error', 'no response')}")
+
+        resp = requests.Response()
+        resp.status_code = exchange['status']
+        resp.reason = http.client.responses.get(resp.status_code, '')
+        resp.headers = CaseInsensitiveDict(exchange.get('headers') or {})
+        resp.headers.pop('Content-Encoding', None)
+        resp.url = url
+        resp.encoding = 'utf-8'
+        resp.elapsed = timedelta(seconds=time.perf_counter() - start)
+        if streamed:
+            resp.raw = _ReplayStream(exchange['chunks'], exchange.get('ttfb', 0.0), self.latency_scale,
+                                     time.perf_counter(), deadline, exchange.get('error'))
+        else:
+            body = exchange.get('body') or {}
+            if 'json' in body:
+                resp._content = json.dumps(body['json']).encode('utf-8')
+            elif 'chunks' in exchange:
+                resp._content = b''.join(_encode(text) for _, text in exchange['chunks'])
+            else:
+                resp._content = _encode(body.get('text', ''))
+            resp._content_consumed = True
+        return resp
+
+    def replay_stats(self) -> Dict[str, int]:
+        """Requests served by exact match, by endpoint only, and those with no recording."""
+        with self._lock:
+            return dict(self._counts)
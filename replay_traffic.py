@@ -0,0 +1,155 @@
+"""Replay recorded WatsonX traffic through the current client and report throughput and tail latency.
+
+Reads a recording made with `recording.RecordingTransport` (for example
+with ``WATSONX_RECORD=traffic.jsonl``). Every chat, chat-stream and
+embeddings call in it is re-issued through `WatsonXClient` at its original
+offset divided by `--speed`. The client runs over a `ReplayTransport` that
+serves the recorded responses with their latency times `--latency-scale`,
+so no credentials or network are needed. Each latency is measured from the
+call's scheduled start, so time spent queued behind a slow client counts.
+
+Write a run's report with `--json`, then pass it as `--baseline` after a
+client change to print the differences. `--max-p99-ms` makes the script
+exit non-zero on a regression.
+
+Usage:
+    python replay_traffic.py traffic.jsonl.gz [--speed 10] [--latency-scale 1.0] [--concurrency 64]
+                             [--json report.json] [--baseline before.json] [--max-p99-ms 2000]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+from recording import ReplayTransport, load_exchanges
+from watsonx_client import CHAT_PARAMS, WatsonXClient
+
+KINDS = {'/ml/v1/text/chat': 'chat', '/ml/v1/text/chat_stream': 'chat_stream', '/ml/v1/text/embeddings': 'embed'}
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)] if sorted_values else 0.0
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        'calls': len(latencies) + errors,
+        'errors': errors,
+        'per_second': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        **{f'{q}_ms': round(percentile(latencies, p) * 1000, 1)
+           for q, p in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+    }
+
+
+def replay(exchanges: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    transport = ReplayTransport(exchanges, latency_scale=args.latency_scale)
+    calls = [e for e in exchanges if urlsplit(e['url']).path in KINDS and 'json' in e]
+    if not calls:
+        raise SystemExit('No chat or embeddings calls in the recording')
+    clients: Dict[Any, WatsonXClient] = {}
+
+    def client_for(exchange: Dict[str, Any]) -> WatsonXClient:
+        # One client per recorded endpoint, project and model, all over the replay transport
+        parts = urlsplit(exchange['url'])
+        key = (parts.netloc, exchange['json'].get('project_id'), exchange['json'].get('model_id'))
+        if key not in clients:
+            clients[key] = WatsonXClient(f'{parts.scheme}://{parts.netloc}', 'replay', key[1] or 'replay',
+                                         key[2] or 'replay', use_api_key_direct=True, transport=transport)
+        return clients[key]
+
+    def issue(exchange: Dict[str, Any]) -> None:
+        kind = KINDS[urlsplit(exchange['url']).path]
+        payload = exchange['json']
+        client = client_for(exchange)
+        if kind == 'embed':
+            client.embed(payload['inputs'], model=payload.get('model_id'))
+            return
+        kwargs = {key: payload[key] for key in CHAT_PARAMS if key in payload and key != 'max_tokens'}
+        max_tokens = payload.get('max_tokens', 512)
+        if kind == 'chat':
+            client.generate('', max_tokens, messages=payload['messages'], **kwargs)
+        else:
+            for _ in client.stream_generate('', max_tokens, messages=payload['messages'], **kwargs):
+                pass
+
+    results: Dict[str, Dict[str, list]] = {kind: {'latencies': [], 'errors': []} for kind in KINDS.values()}
+    lock = threading.Lock()
+    late = [0]
+
+    def run(exchange: Dict[str, Any], due: float) -> None:
+        kind = KINDS[urlsplit(exchange['url']).path]
+        if time.perf_counter() - due > 0.05:
+            with lock:
+                late[0] += 1
+        try:
+            issue(exchange)
+        except Exception as e:
+            with lock:
+                results[kind]['errors'].append(f'{type(e).__name__}: {e}')
+            return
+        with lock:
+            results[kind]['latencies'].append(time.perf_counter() - due)
+
+    first = calls[0]['t']
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for exchange in calls:
+            due = start + (exchange['t'] - first) / args.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, exchange, due)
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [x for r in results.values() for x in r['latencies']]
+    all_errors = [x for r in results.values() for x in r['errors']]
+    return {
+        'recorded_seconds': round(calls[-1]['t'] - first, 2),
+        'replay_seconds': round(elapsed, 2),
+        'speed': args.speed,
+        'latency_scale': args.latency_scale,
+        'overall': summarize(all_latencies, len(all_errors), elapsed),
+        'by_kind': {kind: summarize(r['latencies'], len(r['errors']), elapsed)
+                    for kind, r in results.items() if r['latencies'] or r['errors']},
+        'late_starts': late[0],
+        'matching': transport.replay_stats(),
+        'sample_errors': all_errors[:5],
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    before, after = baseline['overall'], report['overall']
+    return {key: {'before': before[key], 'after': after[key], 'change': round(after[key] - before[key], 2)}
+            for key in ('per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'errors')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording', help='file written by recording.RecordingTransport')
+    parser.add_argument('--speed', type=float, default=1.0, help='divide the recorded inter-arrival times by this')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='multiply the recorded latencies by this')
+    parser.add_argument('--concurrency', type=int, default=64, help='maximum calls in flight')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--max-p99-ms', type=float, help='exit with status 1 if the overall p99 is higher')
+    args = parser.parse_args()
+
+    report = replay(load_exchanges(args.recording), args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['compared_to_baseline'] = compare(report, json.load(f))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if args.max_p99_ms is not None and report['overall']['p99_ms'] > args.max_p99_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
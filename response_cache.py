@@ -0,0 +1,166 @@
+"""Two-tier response cache keyed on the canonical WatsonX request payload.
+
+The key is a SHA-256 of the payload built by `build_chat_payload` (model_id,
+project_id, messages and sampling parameters) serialized with sorted keys,
+so identical requests map to one entry regardless of dict ordering. Entries
+live in a bounded in-memory LRU and, optionally, in a SQLite file with a TTL
+and a size cap, so they survive restarts and are shared between processes.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def payload_key(payload: Dict[str, Any]) -> str:
+    """Return a stable hash of a request payload."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def is_deterministic(payload: Dict[str, Any]) -> bool:
+    """True when the payload asks for greedy decoding, so the answer is repeatable."""
+    return float(payload.get('temperature', 0) or 0) == 0.0
+
+
+class ResponseCache:
+    """Bounded LRU memory tier in front of an optional on-disk tier."""
+
+    def __init__(self, max_entries: int = 1024, disk_path: Optional[str] = None,
+                 ttl: Optional[float] = None, max_disk_bytes: int = 256 * 1024 * 1024):
+        """Create a cache.
+
+        Args:
+            max_entries: Maximum entries kept in memory
+            disk_path: SQLite file for the persistent tier (None = memory only)
+            ttl: Seconds an entry stays valid in either tier (None = forever)
+            max_disk_bytes: Size cap for stored responses in the disk tier
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                       'evictions': 0, 'disk_evictions': 0, 'expired': 0}
+        self._db = None
+        self._disk_bytes = 0
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, '
+                'accessed REAL NOT NULL, size INTEGER NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+            self._disk_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['memory_hits'] += 1
+                    return json.loads(value)
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+                        self._remember(key, created, value)
+                        self._stats['hits'] += 1
+                        self._stats['disk_hits'] += 1
+                        return json.loads(value)
+                    self._delete_disk(key)
+                    self._stats['expired'] += 1
+
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Store a response in both tiers."""
+        value = json.dumps(response, separators=(',', ':'), ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                size = len(value)
+                old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)',
+                    (key, value, now, now, size),
+                )
+                self._disk_bytes += size - (old[0] if old else 0)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+
+    def _remember(self, key: str, created: float, value: str) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _delete_disk(self, key: str) -> None:
+        row = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+        if row:
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._disk_bytes -= row[0]
+
+    def _evict_disk(self) -> None:
+        # Drop expired rows first, then least recently used ones down to 90% of the cap
+        if self.ttl is not None:
+            cur = self._db.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl,))
+            self._stats['disk_evictions'] += max(cur.rowcount, 0)
+        # Other processes may share the file, so resync the total before trimming
+        self._disk_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 64').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._disk_bytes -= size
+                self._stats['disk_evictions'] += 1
+                if self._disk_bytes <= target:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and current sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_bytes'] = self._disk_bytes
+            return stats
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,242 @@
+"""Retry policy with exponential backoff and a circuit breaker.
+
+`RetryPolicy` decides which failures are retried (statuses, exception
+types, idempotency), waits with exponential backoff and full jitter, and
+draws retries from a shared budget so an outage can't multiply load.
+`CircuitBreaker` fails fast with `CircuitOpenError` after repeated failures
+and lets a single trial request through once the cool-down has passed.
+`call_with_retries` ties both around one "send the request" callable.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Type
+
+import requests
+
+from deadline import Cancelled, Deadline
+from rate_limit import THROTTLE_STATUSES, parse_retry_after
+
+# Exceptions raised before the request reached the server; always safe to retry
+PRE_SEND_EXCEPTIONS: Tuple[Type[BaseException], ...] = (requests.exceptions.ConnectTimeout,)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open -> closed)."""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Create a breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before allowing a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'successes': 0}
+
+    def before_request(self) -> None:
+        """Raise `CircuitOpenError` unless a request may be sent now."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._stats['rejected'] += 1
+            retry_in = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+            raise CircuitOpenError(f'WatsonX circuit breaker is {self.state}; retry in {retry_in:.1f}s')
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats['successes'] += 1
+            self._failures = 0
+            self._trial_in_flight = False
+            self.state = self.CLOSED
+
+    def record_cancelled(self) -> None:
+        """A request was cancelled by its caller: says nothing about health, but frees the trial slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self._stats['opened'] += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, object]:
+        """Return the current state and counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self.state
+            stats['consecutive_failures'] = self._failures
+            return stats
+
+
+class RetryPolicy:
+    """Which failures to retry and how long to wait between attempts."""
+
+    def __init__(self, max_attempts: int = 3,
+                 retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504),
+                 retry_exceptions: Tuple[Type[BaseException], ...] = (requests.exceptions.ConnectionError,
+                                                                      requests.exceptions.Timeout),
+                 backoff_base: float = 0.5, backoff_max: float = 20.0, max_elapsed: float = 60.0,
+                 budget_ratio: float = 0.2, budget_min: float = 10.0):
+        """Create a policy.
+
+        Args:
+            max_attempts: Total attempts per call, including the first
+            retry_statuses: HTTP statuses worth retrying
+            retry_exceptions: Exception types worth retrying
+            backoff_base: First backoff ceiling in seconds (doubles per attempt)
+            backoff_max: Largest backoff ceiling in seconds
+            max_elapsed: Give up once a call has spent this many seconds in total
+            budget_ratio: Retries earned per successful call
+            budget_min: Retry budget available before any success (and its cap is 10x this)
+        """
+        self.max_attempts = max_attempts
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_elapsed = max_elapsed
+        self.budget_ratio = budget_ratio
+        self.budget_min = budget_min
+        self._budget = budget_min
+        self._lock = threading.Lock()
+        self._stats = {'successes': 0, 'retries': 0, 'exhausted': 0, 'budget_rejections': 0}
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based), honoring Retry-After."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_elapsed))
+        return delay
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._budget >= 1.0:
+                self._budget -= 1.0
+                self._stats['retries'] += 1
+                return True
+            self._stats['budget_rejections'] += 1
+            return False
+
+    def _record_exhausted(self) -> None:
+        with self._lock:
+            self._stats['exhausted'] += 1
+
+    def _earn_budget(self) -> None:
+        with self._lock:
+            self._stats['successes'] += 1
+            self._budget = min(self.budget_min * 10, self._budget + self.budget_ratio)
+
+    def retryable_exception(self, exc: BaseException, idempotent: bool) -> bool:
+        if isinstance(exc, PRE_SEND_EXCEPTIONS):
+            return True
+        return idempotent and isinstance(exc, self.retry_exceptions)
+
+    def retryable_status(self, status: int, idempotent: bool) -> bool:
+        # 429 and 503 mean the request was turned away before processing, so they're safe either way
+        return status in self.retry_statuses and (idempotent or status in THROTTLE_STATUSES)
+
+    def stats(self) -> Dict[str, float]:
+        """Return retry counters and the remaining retry budget."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['budget'] = round(self._budget, 2)
+            return stats
+
+
+def call_with_retries(send: Callable[[], requests.Response], policy: Optional[RetryPolicy] = None,
+                      breaker: Optional[CircuitBreaker] = None, idempotent: bool = True,
+                      deadline: Optional[Deadline] = None) -> requests.Response:
+    """Run `send` under a retry policy and circuit breaker.
+
+    With ``idempotent=False`` (generation POSTs) only failures that happened
+    before the server processed the request are retried: connect timeouts
+    and throttling (429/503). Read timeouts and other 5xx responses are
+    returned or raised at once.
+
+    Returns the final response, which may still carry an error status for the
+    caller to raise on; the last exception is re-raised once retries run out.
+    A retry whose back-off doesn't fit in `deadline` isn't attempted, and
+    `Cancelled`/`DeadlineExceeded` are never retried.
+    """
+    start = time.monotonic()
+    attempt = 1
+    while True:
+        if deadline is not None:
+            deadline.check()
+        if breaker is not None:
+            breaker.before_request()
+        resp, error = None, None
+        try:
+            resp = send()
+        except Cancelled:
+            if breaker is not None:
+                breaker.record_cancelled()
+            raise
+        except Exception as e:
+            error = e
+        if breaker is not None:
+            if error is not None or resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+        if error is not None:
+            retry = policy is not None and policy.retryable_exception(error, idempotent)
+            delay = policy.backoff(attempt) if retry else 0.0
+        else:
+            retry = policy is not None and policy.retryable_status(resp.status_code, idempotent)
+            if not retry:
+                if policy is not None and resp.status_code < 400:
+                    policy._earn_budget()
+                return resp
+            delay = policy.backoff(attempt, parse_retry_after(resp.headers.get('Retry-After')))
+
+        if retry and (attempt >= policy.max_attempts or time.monotonic() - start + delay > policy.max_elapsed):
+            policy._record_exhausted()
+            retry = False
+        if retry and deadline is not None and not deadline.allows(delay):
+            retry = False
+        if retry and not policy._take_budget():
+            retry = False
+        if not retry:
+            if error is not None:
+                raise error
+            return resp
+
+        if resp is not None:
+            resp.close()
+        logger.debug("Retrying in %.2fs (attempt %d/%d)", delay, attempt + 1, policy.max_attempts)
+        if deadline is not None:
+            deadline.sleep(delay)
+        else:
+            time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,359 @@
+"""Latency-aware routing and hedged requests across WatsonX endpoints.
+
+`RouterClient` fronts several `WatsonXClient`s (regions such as us-south
+and eu-de, or interchangeable models) and sends each request to the
+endpoint with the best live score: an EWMA of its latency scaled by the
+requests it already has in flight, plus a penalty proportional to an EWMA
+of its failure rate. A small share of traffic explores the other endpoints
+so a recovered region is noticed.
+
+With ``hedge=True`` a request that hasn't answered within the primary
+endpoint's recent latency percentile is duplicated to the next-best
+endpoint; the first success wins and the other is cancelled, its socket
+shut down so the connection isn't held until the server answers. Hedges are
+capped at a fraction of traffic so a slow period can't double the load.
+Connection errors, timeouts, 429s and 5xx fail over to the next endpoint.
+A ``deadline=`` bounds the whole routed call, hedges and failovers included.
+
+    router = RouterClient.from_endpoints(
+        ['https://us-south.ml.cloud.ibm.com', 'https://eu-de.ml.cloud.ibm.com'],
+        api_key=key, project_id=project, model='ibm/granite-4-h-small', hedge=True)
+    router.generate('Hello')
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Union
+
+import requests
+
+from conversation import Conversation
+from deadline import Cancelled, Deadline, DeadlineExceeded
+from retry import CircuitOpenError
+from streaming import ChatDelta
+from token_manager import IAM_URL, IAMTokenManager
+from transport import PooledTransport, get_default_transport
+from watsonx_client import BatchGenerateMixin, WatsonXClient, extract_text_from_response
+
+
+def is_endpoint_failure(exc: BaseException) -> bool:
+    """True for errors that say something about the endpoint (not about the request)."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, (CircuitOpenError, requests.ConnectionError, requests.Timeout))
+
+
+class Endpoint:
+    """A routed client plus its live latency and error statistics."""
+
+    def __init__(self, client: WatsonXClient, name: Optional[str] = None, alpha: float = 0.2, window: int = 256):
+        self.client = client
+        self.name = name or f'{client.base_url}|{client.model}'
+        self.alpha = alpha
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'errors': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def begin(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self._counts['requests'] += 1
+
+    def end(self, elapsed: float, failed: bool, sample: bool = True, hedge_sample: bool = True) -> None:
+        """Finish a call; `hedge_sample=False` keeps `elapsed` out of the window that sets the hedge delay."""
+        with self._lock:
+            self.in_flight -= 1
+            if not sample:
+                # Cancelled calls say nothing about the endpoint's latency or health
+                return
+            self.error_ewma += self.alpha * ((1.0 if failed else 0.0) - self.error_ewma)
+            if failed:
+                self._counts['errors'] += 1
+                # A failing endpoint must not look fast just because it fails quickly
+                if self.latency_ewma is None:
+                    self.latency_ewma = elapsed
+                return
+            if hedge_sample:
+                self._latencies.append(elapsed)
+            if self.latency_ewma is None:
+                self.latency_ewma = elapsed
+            else:
+                self.latency_ewma += self.alpha * (elapsed - self.latency_ewma)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def score(self, error_penalty: float) -> float:
+        """Lower is better; endpoints without samples score 0 so they get tried."""
+        with self._lock:
+            latency = self.latency_ewma or 0.0
+            return latency * (1 + self.in_flight) + self.error_ewma * error_penalty
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update(in_flight=self.in_flight, error_ewma=round(self.error_ewma, 4),
+                         latency_ewma=round(self.latency_ewma, 4) if self.latency_ewma is not None else None)
+            return stats
+
+
+class RouterClient(BatchGenerateMixin):
+    """Routes `generate` calls across several WatsonX clients, optionally hedging slow ones."""
+
+    def __init__(self, clients: Sequence[Union[WatsonXClient, Endpoint]], hedge: bool = False,
+                 hedge_percentile: float = 0.95, hedge_delay: Optional[float] = None,
+                 hedge_min_delay: float = 0.01, max_hedge_ratio: float = 0.1, min_samples: int = 20,
+                 error_penalty: float = 5.0, explore: float = 0.05, failover: bool = True, max_workers: int = 64):
+        """Create a router.
+
+        Args:
+            clients: Clients (or pre-built `Endpoint`s) to route across
+            hedge: Duplicate slow requests to the next-best endpoint
+            hedge_percentile: Hedge once a request outlives this latency percentile of its endpoint
+            hedge_delay: Fixed hedge delay in seconds (overrides the percentile); also used
+                until an endpoint has `min_samples` latencies (default 1s)
+            hedge_min_delay: Never hedge sooner than this many seconds
+            max_hedge_ratio: Upper bound on hedges as a fraction of requests
+            min_samples: Latency samples needed before the percentile is trusted
+            error_penalty: Seconds added to an endpoint's score per unit of error EWMA
+            explore: Probability of routing to a random endpoint to refresh its statistics
+            failover: Retry endpoint failures (connection errors, timeouts, 429, 5xx) on the next endpoint
+            max_workers: Threads available for hedged requests
+        """
+        if not clients:
+            raise ValueError('RouterClient needs at least one client')
+        self.endpoints: List[Endpoint] = [c if isinstance(c, Endpoint) else Endpoint(c) for c in clients]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.error_penalty = error_penalty
+        self.explore = explore
+        self.failover = failover
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='router') if hedge else None
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'hedges': 0, 'hedge_wins': 0, 'failovers': 0}
+
+    @classmethod
+    def from_endpoints(cls, endpoints: Sequence[Union[str, Dict[str, Any]]], api_key: str, project_id: str,
+                       model: Optional[str] = None, iam_url: str = IAM_URL,
+                       transport: Optional[PooledTransport] = None, token_manager: Optional[IAMTokenManager] = None,
+                       client_kwargs: Optional[Dict[str, Any]] = None, **router_kwargs) -> 'RouterClient':
+        """Build a router from base URLs or dicts with `base_url` and optional `model`/`project_id`.
+
+        IBM Cloud IAM tokens are valid in every region, so all endpoints share
+        one token manager and one pooled transport.
+        """
+        transport = transport or get_default_transport()
+        token_manager = token_manager or IAMTokenManager(api_key, iam_url=iam_url, transport=transport)
+        clients = []
+        for spec in endpoints:
+            spec = {'base_url': spec} if isinstance(spec, str) else dict(spec)
+            clients.append(WatsonXClient(spec['base_url'], api_key, spec.get('project_id', project_id),
+                                         spec.get('model', model), transport=transport,
+                                         token_manager=token_manager, **(client_kwargs or {})))
+        return cls(clients, **router_kwargs)
+
+    def rank(self) -> List[Endpoint]:
+        """Endpoints from best to worst score (first one randomized when exploring)."""
+        ranked = sorted(self.endpoints, key=lambda e: e.score(self.error_penalty))
+        if len(ranked) > 1 and random.random() < self.explore:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self._counts['hedges'] + 1 > self.max_hedge_ratio * self._counts['requests']:
+                return False
+            self._counts['hedges'] += 1
+            return True
+
+    def _delay_for(self, endpoint: Endpoint) -> float:
+        delay = self.hedge_delay
+        if delay is None:
+            delay = endpoint.percentile(self.hedge_percentile, self.min_samples) or 1.0
+        return max(delay, self.hedge_min_delay)
+
+    @staticmethod
+    def _call(endpoint: Endpoint, call: Callable[[WatsonXClient, Deadline], Any], deadline: Deadline) -> Any:
+        endpoint.begin()
+        start = time.perf_counter()
+        try:
+            result = call(endpoint.client, deadline)
+        except Cancelled:
+            endpoint.end(time.perf_counter() - start, False, sample=False)
+            raise
+        except Exception as e:
+            endpoint.end(time.perf_counter() - start, is_endpoint_failure(e))
+            raise
+        endpoint.end(time.perf_counter() - start, False)
+        return result
+
+    def _route(self, call: Callable[[WatsonXClient, Deadline], Any], deadline: Deadline) -> Any:
+        self._count('requests')
+        ranked = self.rank()
+        if not self.hedge or len(ranked) < 2:
+            return self._route_serial(ranked, call, deadline)
+
+        remaining = iter(ranked)
+        owners: Dict[Future, Endpoint] = {}
+        attempts: Dict[Future, Deadline] = {}
+
+        def launch() -> Optional[Future]:
+            endpoint = next(remaining, None)
+            if endpoint is None:
+                return None
+            # Each attempt gets its own child deadline so a losing hedge can be cancelled alone
+            attempt = deadline.child()
+            future = self._executor.submit(self._call, endpoint, call, attempt)
+            future.add_done_callback(lambda _, attempt=attempt: attempt.close())
+            owners[future] = endpoint
+            attempts[future] = attempt
+            return future
+
+        def cancel(futures) -> None:
+            for future in futures:
+                future.cancel()
+                attempts[future].cancel()
+
+        pending = {launch()}
+        primary = ranked[0]
+        hedge_at = time.monotonic() + self._delay_for(primary)
+        hedged = False
+        last_error: Optional[BaseException] = None
+        while pending:
+            timeout = None if hedged else max(hedge_at - time.monotonic(), 0.0)
+            left = deadline.remaining()
+            if left is not None:
+                timeout = left if timeout is None else min(timeout, left)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline.expired:
+                    cancel(pending)
+                    raise DeadlineExceeded('deadline exceeded')
+                if hedged:
+                    continue
+                hedged = True
+                if self._take_hedge():
+                    future = launch()
+                    if future is not None:
+                        owners[future].count('hedges')
+                        pending.add(future)
+                continue
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    cancel(pending)
+                    if owners[future] is not primary:
+                        owners[future].count('hedge_wins')
+                        self._count('hedge_wins')
+                    return future.result()
+                last_error = error
+                if not pending and self.failover and is_endpoint_failure(error):
+                    future = launch()
+                    if future is not None:
+                        self._count('failovers')
+                        pending.add(future)
+        raise last_error
+
+    def _route_serial(self, ranked: List[Endpoint], call: Callable[[WatsonXClient, Deadline], Any],
+                      deadline: Deadline) -> Any:
+        for i, endpoint in enumerate(ranked):
+            try:
+                return self._call(endpoint, call, deadline)
+            except Exception as e:
+                if not self.failover or i == len(ranked) - 1 or not is_endpoint_failure(e):
+                    raise
+                self._count('failovers')
+
+    def generate(self, prompt: str, max_tokens: int = 512, conversation: Optional[Conversation] = None,
+                 deadline: Union[Deadline, float, None] = None, **kwargs) -> Dict[str, Any]:
+        """Generate text on the best endpoint (hedging/failing over as configured).
+
+        Takes the same arguments as `WatsonXClient.generate`.
+        """
+        deadline = Deadline.coerce(deadline)
+        if conversation is not None:
+            # Prepared once here; a hedged duplicate must not append the turn twice
+            kwargs['messages'] = conversation.prepare(prompt, max_tokens)
+        try:
+            result = self._route(lambda client, attempt: client.generate(prompt, max_tokens, deadline=attempt,
+                                                                         **kwargs), deadline)
+        except BaseException:
+            if conversation is not None:
+                conversation.pop()
+            raise
+        if conversation is not None:
+            conversation.add_assistant(extract_text_from_response(result))
+        return result
+
+    def stream_generate(self, prompt: str, max_tokens: int = 512, **kwargs) -> Iterator[ChatDelta]:
+        """Stream from the best endpoint; streams are routed but never hedged.
+
+        Only the time to the first chunk is sampled. A stream's full duration
+        depends on its length and on when the consumer stops reading, so it
+        says little about the endpoint. That sample feeds the routing score
+        but not the hedge delay of `generate`.
+        """
+        endpoint = self.rank()[0]
+        self._count('requests')
+        endpoint.begin()
+        start = time.perf_counter()
+        first_chunk: Optional[float] = None
+        failed = False
+        stream = endpoint.client.stream_generate(prompt, max_tokens, **kwargs)
+        try:
+            for delta in stream:
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                yield delta
+        except Cancelled:
+            first_chunk = None
+            raise
+        except Exception as e:
+            failed = is_endpoint_failure(e)
+            raise
+        finally:
+            stream.close()
+            if failed:
+                endpoint.end(time.perf_counter() - start, True)
+            elif first_chunk is not None:
+                endpoint.end(first_chunk, False, hedge_sample=False)
+            else:
+                # Cancelled or abandoned before the first chunk, or rejected for the request itself
+                endpoint.end(0.0, False, sample=False)
+
+    def warm_up(self, **kwargs) -> Dict[str, Any]:
+        """Warm every endpoint up; returns ``{endpoint name: WarmupReport}``."""
+        return {endpoint.name: endpoint.client.warm_up(**kwargs) for endpoint in self.endpoints}
+
+    def stats(self) -> Dict[str, Any]:
+        """Router counters plus per-endpoint statistics."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+        stats['endpoints'] = {endpoint.name: endpoint.stats() for endpoint in self.endpoints}
+        return stats
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
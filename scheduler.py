@@ -0,0 +1,274 @@
+"""Priority lanes for WatsonX calls that share one project's limits.
+
+Interactive chat and bulk jobs often run against the same WatsonX project
+and rate limits. Without a scheduler every call races for the network, so
+a large batch fills the concurrency limit and interactive users queue
+behind it. A `LaneScheduler` gives each call a slot before it is sent:
+
+- Calls wait in named lanes (by default ``interactive``, ``default`` and
+  ``bulk``).
+- When a slot frees up, the waiting call with the lowest start tag goes
+  next. This is start-time fair queuing: each lane gets slots in proportion
+  to its `weight` while it has work queued, and an idle lane's share goes
+  to the others.
+- ``max_share`` caps how much of the capacity one lane may hold. With the
+  default 75% for ``bulk``, a saturating batch always leaves slots free for
+  interactive calls, so they don't queue at all.
+- ``tenant_limits`` caps in-flight calls per caller id within the shared
+  capacity.
+
+    scheduler = LaneScheduler(max_concurrency=16, governor=governor)
+    chat = WatsonXClient(..., rate_governor=governor, scheduler=scheduler, lane='interactive')
+    batch = WatsonXClient(..., rate_governor=governor, scheduler=scheduler, lane='bulk')
+    chat.generate('Hi', tenant='alice')
+
+With a `RateGovernor`, the capacity follows its AIMD concurrency limit, so
+a 429 storm shrinks every lane's share instead of parking bulk calls inside
+the governor ahead of interactive ones. `stats()` reports each lane's queue
+depth, in-flight calls and wait percentiles. `render_metrics()` does the
+same in the Prometheus text format; pass it to
+`PrometheusExporter.add_collector`.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from deadline import Cancelled, Deadline
+from instrumentation import DEFAULT_BUCKETS, _Histogram, _labels
+from rate_limit import RateGovernor
+
+
+class Lane:
+    """A named traffic class with its share of the scheduler's capacity."""
+
+    def __init__(self, name: str, weight: float = 1.0, max_share: float = 1.0,
+                 max_concurrency: Optional[int] = None):
+        """Create a lane.
+
+        Args:
+            name: Lane name passed as ``lane=`` by callers
+            weight: Relative share of slots while several lanes have calls waiting
+            max_share: Largest fraction of the capacity this lane may hold at once
+            max_concurrency: Optional absolute cap on in-flight calls
+        """
+        if weight <= 0:
+            raise ValueError('Lane weight must be positive')
+        self.name = name
+        self.weight = float(weight)
+        self.max_share = max_share
+        self.max_concurrency = max_concurrency
+        self.queue: Deque['_Ticket'] = deque()
+        self.in_flight = 0
+        self.finish_tag = 0.0
+        self._waits: Deque[float] = deque(maxlen=2048)
+        self._histogram = _Histogram(DEFAULT_BUCKETS)
+        self._counts = {'admitted': 0, 'timed_out': 0}
+
+    def cap(self, capacity: int) -> int:
+        cap = max(1, int(capacity * self.max_share))
+        return cap if self.max_concurrency is None else min(cap, self.max_concurrency)
+
+
+def default_lanes() -> List[Lane]:
+    """``interactive`` (weight 8), ``default`` (weight 2) and ``bulk`` (weight 1, at most 75% of capacity)."""
+    return [Lane('interactive', weight=8), Lane('default', weight=2), Lane('bulk', weight=1, max_share=0.75)]
+
+
+class _Ticket:
+    __slots__ = ('lane', 'tenant', 'start_tag', 'enqueued', 'granted', 'event', 'waited')
+
+    def __init__(self, lane: Lane, tenant: Optional[str], start_tag: float):
+        self.lane = lane
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.event: Optional[threading.Event] = None
+        self.waited = 0.0
+
+
+class LaneScheduler:
+    """Admits calls from several lanes into a shared number of slots, by weighted fair queuing."""
+
+    def __init__(self, max_concurrency: int = 16, lanes: Optional[Sequence[Lane]] = None,
+                 governor: Optional[RateGovernor] = None, tenant_limits: Optional[Dict[str, int]] = None,
+                 default_tenant_limit: Optional[int] = None, default_lane: str = 'default'):
+        """Create a scheduler.
+
+        Args:
+            max_concurrency: Slots shared by all lanes
+            lanes: Lane definitions (default: `default_lanes`)
+            governor: Optional `RateGovernor`; capacity then never exceeds its AIMD concurrency limit
+            tenant_limits: Maximum in-flight calls per tenant id
+            default_tenant_limit: Limit for tenants missing from `tenant_limits` (None = unlimited)
+            default_lane: Lane used by calls that don't name one
+        """
+        self.max_concurrency = max_concurrency
+        self.governor = governor
+        self.tenant_limits = dict(tenant_limits or {})
+        self.default_tenant_limit = default_tenant_limit
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in (lanes or default_lanes())}
+        if default_lane not in self.lanes:
+            raise ValueError(f'Unknown default lane {default_lane!r}')
+        self.default_lane = default_lane
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tenants: Dict[str, int] = {}
+        self._vtime = 0.0
+
+    def capacity(self) -> int:
+        """Slots currently available to all lanes together."""
+        if self.governor is None:
+            return self.max_concurrency
+        return max(1, min(self.max_concurrency, int(self.governor.concurrency.limit)))
+
+    def _tenant_limit(self, tenant: Optional[str]) -> Optional[int]:
+        if tenant is None:
+            return None
+        return self.tenant_limits.get(tenant, self.default_tenant_limit)
+
+    def acquire(self, lane: Optional[str] = None, tenant: Optional[str] = None, cost: float = 1.0,
+                deadline: Optional[Deadline] = None) -> _Ticket:
+        """Wait for a slot in `lane`; returns a ticket to pass to `release`.
+
+        Args:
+            lane: Lane name (default: `default_lane`)
+            tenant: Optional caller id checked against the tenant limits
+            cost: Size of the call relative to others (e.g. 1 per request)
+            deadline: Optional budget for the wait; raises `DeadlineExceeded`/`Cancelled` when it runs out
+        """
+        name = lane or self.default_lane
+        queue_lane = self.lanes.get(name)
+        if queue_lane is None:
+            raise ValueError(f'Unknown lane {name!r}')
+        with self._lock:
+            start_tag = max(self._vtime, queue_lane.finish_tag)
+            queue_lane.finish_tag = start_tag + cost / queue_lane.weight
+            ticket = _Ticket(queue_lane, tenant, start_tag)
+            queue_lane.queue.append(ticket)
+            self._dispatch()
+            if not ticket.granted:
+                ticket.event = threading.Event()
+        if ticket.event is not None:
+            try:
+                if deadline is None:
+                    ticket.event.wait()
+                else:
+                    deadline.wait(ticket.event)
+            except Cancelled:
+                with self._lock:
+                    if not ticket.granted:
+                        queue_lane.queue.remove(ticket)
+                        queue_lane._counts['timed_out'] += 1
+                        raise
+                # Granted while giving up: hand the slot back
+                self.release(ticket)
+                raise
+        return ticket
+
+    def release(self, ticket: _Ticket) -> None:
+        """Free the slot held by `ticket` and admit the next waiting call."""
+        with self._lock:
+            ticket.lane.in_flight -= 1
+            self._in_flight -= 1
+            if ticket.tenant is not None:
+                left = self._tenants[ticket.tenant] - 1
+                if left:
+                    self._tenants[ticket.tenant] = left
+                else:
+                    del self._tenants[ticket.tenant]
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Caller holds the lock
+        capacity = self.capacity()
+        while self._in_flight < capacity:
+            best: Optional[_Ticket] = None
+            for lane in self.lanes.values():
+                if not lane.queue or lane.in_flight >= lane.cap(capacity):
+                    continue
+                candidate = self._eligible(lane)
+                if candidate is not None and (best is None or candidate.start_tag < best.start_tag):
+                    best = candidate
+            if best is None:
+                return
+            self._grant(best)
+
+    def _eligible(self, lane: Lane) -> Optional[_Ticket]:
+        # The oldest call in the lane whose tenant is under its limit
+        for ticket in lane.queue:
+            limit = self._tenant_limit(ticket.tenant)
+            if limit is None or self._tenants.get(ticket.tenant, 0) < limit:
+                return ticket
+        return None
+
+    def _grant(self, ticket: _Ticket) -> None:
+        lane = ticket.lane
+        if lane.queue[0] is ticket:
+            lane.queue.popleft()
+        else:
+            lane.queue.remove(ticket)
+        lane.in_flight += 1
+        self._in_flight += 1
+        if ticket.tenant is not None:
+            self._tenants[ticket.tenant] = self._tenants.get(ticket.tenant, 0) + 1
+        self._vtime = max(self._vtime, ticket.start_tag)
+        ticket.granted = True
+        ticket.waited = time.perf_counter() - ticket.enqueued
+        lane._counts['admitted'] += 1
+        lane._waits.append(ticket.waited)
+        lane._histogram.observe(ticket.waited)
+        if ticket.event is not None:
+            ticket.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Capacity, in-flight calls, per-tenant in-flight counts and per-lane queue/wait statistics."""
+        with self._lock:
+            capacity = self.capacity()
+            lanes = {}
+            for lane in self.lanes.values():
+                waits = sorted(lane._waits)
+                lanes[lane.name] = {
+                    'weight': lane.weight, 'cap': lane.cap(capacity), 'queued': len(lane.queue),
+                    'in_flight': lane.in_flight, **lane._counts,
+                    'wait_p50_ms': round(_percentile(waits, 0.50) * 1000, 2),
+                    'wait_p95_ms': round(_percentile(waits, 0.95) * 1000, 2),
+                    'wait_max_ms': round(waits[-1] * 1000, 2) if waits else 0.0,
+                }
+            return {'capacity': capacity, 'in_flight': self._in_flight, 'tenants': dict(self._tenants),
+                    'lanes': lanes}
+
+    def render_metrics(self) -> str:
+        """Per-lane queue depth, in-flight calls, admissions and wait histogram in Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, attr, help_text in (('watsonx_lane_queue_depth', 'queue', 'Calls waiting for a slot'),
+                                          ('watsonx_lane_in_flight', 'in_flight', 'Calls holding a slot')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+                for lane in self.lanes.values():
+                    value = getattr(lane, attr)
+                    lines.append(f'{name}{_labels({"lane": lane.name})} '
+                                 f'{len(value) if attr == "queue" else value}')
+            for key, help_text in (('admitted', 'Calls admitted to a slot'),
+                                   ('timed_out', 'Calls whose deadline ran out while queued')):
+                name = f'watsonx_lane_{key}_total'
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{_labels({"lane": lane.name})} {lane._counts[key]}' for lane in self.lanes.values()]
+            name = 'watsonx_lane_wait_seconds'
+            lines += [f'# HELP {name} Time spent queued for a slot', f'# TYPE {name} histogram']
+            for lane in self.lanes.values():
+                histogram = lane._histogram
+                labels = {'lane': lane.name}
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{_labels({**labels, "le": f"{bound:g}"})} {count}')
+                lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {histogram.count}')
+                lines.append(f'{name}_sum{_labels(labels)} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
@@ -3,6 +3,7 @@ import os
 
 load_dotenv()
 
+from token_manager import IAM_URL
 from watsonx_client import WatsonXClient, OpenAIClient, extract_text_from_response
 
 provider = os.getenv('PROVIDER', 'watsonx').lower()
@@ -36,7 +37,7 @@ try:
                 api_key=key,
                 project_id=os.getenv('WATSONX_PROJECT_ID'),
                 model=os.getenv('MODEL'),
-                infer_path=os.getenv('INFER_PATH'),
+                iam_url=os.getenv('WATSONX_IAM_URL') or IAM_URL,
             )
             print('WatsonX client instantiated')
             ok = True
@@ -0,0 +1,65 @@
+"""Server-sent-event parsing for the WatsonX chat stream endpoint.
+
+`POST /ml/v1/text/chat_stream` answers with an SSE stream whose `data:`
+lines carry chat-completion chunks; the content arrives in
+``choices[0].delta.content`` and the final chunk carries ``usage``.
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+import requests
+
+
+class ChatDelta(NamedTuple):
+    """One streamed chunk of a chat completion."""
+    content: str
+    finish_reason: Optional[str]
+    usage: Optional[Dict[str, Any]]
+    raw: Dict[str, Any]
+
+
+def iter_sse_events(lines: Iterable[bytes]) -> Iterator[Tuple[str, str]]:
+    """Parse SSE lines into (event, data) pairs, joining multi-line data."""
+    event, data = 'message', []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r')
+        if not line:
+            if data:
+                yield event, '\n'.join(data)
+            event, data = 'message', []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'data':
+            data.append(value)
+        elif field == 'event':
+            event = value
+    if data:
+        yield event, '\n'.join(data)
+
+
+def parse_chat_chunk(chunk: Dict[str, Any]) -> ChatDelta:
+    """Turn one decoded chat stream chunk into a `ChatDelta`."""
+    content, finish_reason = '', None
+    choices = chunk.get('choices') or []
+    if choices and isinstance(choices[0], dict):
+        delta = choices[0].get('delta') or {}
+        content = delta.get('content') or ''
+        finish_reason = choices[0].get('finish_reason')
+    return ChatDelta(content, finish_reason, chunk.get('usage'), chunk)
+
+
+def iter_chat_deltas(resp: requests.Response) -> Iterator[ChatDelta]:
+    """Yield `ChatDelta`s from a streaming chat response as the bytes arrive."""
+    # chunk_size=None hands over each chunk as soon as it is received
+    for event, data in iter_sse_events(resp.iter_lines(chunk_size=None)):
+        if event == 'error':
+            raise RuntimeError(f'WatsonX stream error: {data[:500]}')
+        if data.strip() == '[DONE]':
+            break
+        yield parse_chat_chunk(json.loads(data))
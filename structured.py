@@ -0,0 +1,458 @@
+"""Incremental structured (JSON) output from streamed chat completions.
+
+`IncrementalJSONParser` consumes the completion text as it streams and
+checks it against a JSON schema while it is still arriving. It reports
+each field with its path as soon as the field's value is complete, and
+raises `StructuredOutputError` at the first character that makes the
+output invalid. That can be a syntax error, an unexpected key or type, an
+enum miss or a bound violation. `iter_structured` drives the parser from a
+`stream_generate` iterator and closes the stream as soon as there is
+nothing more worth reading:
+
+- the output turned invalid;
+- the top-level object or array closed (the model's trailing chatter is
+  never downloaded or generated);
+- a client-side stop sequence appeared.
+
+Closing the stream shuts the connection, so the server stops generating
+and billing those tokens. `WatsonXClient.stream_structured` adds a
+wall-time cutoff on top (see `deadline.py`):
+
+    schema = {'type': 'object', 'required': ['sentiment'], 'additionalProperties': False,
+              'properties': {'sentiment': {'enum': ['positive', 'negative', 'neutral']},
+                             'topics': {'type': 'array', 'items': {'type': 'string'}}}}
+    for field in client.stream_structured(prompt, schema, max_wall_time=10):
+        print(field.path, field.value)      # ('sentiment',) 'negative' ... then () {...}
+
+The supported schema subset is `type` (including lists and ``integer``),
+`properties`, `required`, `additionalProperties`, `items`, `enum`,
+`const`, `minimum`/`maximum` (and the exclusive forms), `minLength`,
+`maxLength`, `pattern`, `minItems` and `maxItems`. Other keywords are
+ignored.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from streaming import ChatDelta
+
+Path = Tuple[Union[str, int], ...]
+
+_DECODER = json.JSONDecoder(strict=False)
+_WHITESPACE = ' \t\r\n'
+_NUMBER_CHARS = frozenset('0123456789+-.eE')
+_LITERALS = {'t': ('true', True), 'f': ('false', False), 'n': ('null', None)}
+
+
+class StructuredOutputError(ValueError):
+    """The streamed output is not valid JSON for the schema."""
+
+    def __init__(self, message: str, path: Path = ()):
+        super().__init__(f'{message} at {format_path(path)}')
+        self.path = path
+
+
+class StructuredField(NamedTuple):
+    """A completed value: `path` is () for the whole document."""
+    path: Path
+    value: Any
+
+
+def format_path(path: Path) -> str:
+    """Render a field path as ``$.items[2].name``."""
+    return '$' + ''.join(f'[{part}]' if isinstance(part, int) else f'.{part}' for part in path)
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if value is None:
+        return 'null'
+    return 'array' if isinstance(value, list) else 'object'
+
+
+def _check_kind(schema: Dict[str, Any], kind: str, path: Path) -> None:
+    """Fail as soon as a value's first character shows it can't match the schema."""
+    types = schema.get('type')
+    if types is not None:
+        types = [types] if isinstance(types, str) else list(types)
+        if kind not in types and not (kind == 'number' and 'integer' in types):
+            raise StructuredOutputError(f"expected {' or '.join(types)}, got {kind}", path)
+    options = schema.get('enum')
+    if options is not None and kind not in {_kind(option) for option in options}:
+        raise StructuredOutputError(f'{kind} is not one of the allowed values', path)
+    if 'const' in schema and kind != _kind(schema['const']):
+        raise StructuredOutputError(f'expected {_kind(schema["const"])}, got {kind}', path)
+
+
+def _check_value(schema: Dict[str, Any], value: Any, path: Path) -> None:
+    """Checks that need the complete value."""
+    if 'enum' in schema and value not in schema['enum']:
+        raise StructuredOutputError(f'{value!r} is not one of {schema["enum"]!r}', path)
+    if 'const' in schema and value != schema['const']:
+        raise StructuredOutputError(f'expected {schema["const"]!r}', path)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        types = schema.get('type')
+        if types == 'integer' or (isinstance(types, list) and 'integer' in types and 'number' not in types):
+            if isinstance(value, float) and not value.is_integer():
+                raise StructuredOutputError(f'{value!r} is not an integer', path)
+        for keyword, fails in (('minimum', lambda b: value < b), ('maximum', lambda b: value > b),
+                               ('exclusiveMinimum', lambda b: value <= b),
+                               ('exclusiveMaximum', lambda b: value >= b)):
+            bound = schema.get(keyword)
+            if isinstance(bound, (int, float)) and not isinstance(bound, bool) and fails(bound):
+                raise StructuredOutputError(f'{value!r} violates {keyword} {bound}', path)
+    elif isinstance(value, str):
+        if len(value) < schema.get('minLength', 0):
+            raise StructuredOutputError(f'string shorter than {schema["minLength"]}', path)
+        if 'maxLength' in schema and len(value) > schema['maxLength']:
+            raise StructuredOutputError(f'string longer than {schema["maxLength"]}', path)
+        if 'pattern' in schema and not re.search(schema['pattern'], value):
+            raise StructuredOutputError(f'string does not match {schema["pattern"]!r}', path)
+    elif isinstance(value, list):
+        if len(value) < schema.get('minItems', 0):
+            raise StructuredOutputError(f'fewer than {schema["minItems"]} items', path)
+    elif isinstance(value, dict):
+        missing = [key for key in schema.get('required', ()) if key not in value]
+        if missing:
+            raise StructuredOutputError(f'missing required {", ".join(missing)}', path)
+
+
+class _Frame:
+    __slots__ = ('container', 'schema', 'path', 'key', 'child_schema')
+
+    def __init__(self, container, schema: Dict[str, Any], path: Path):
+        self.container = container
+        self.schema = schema
+        self.path = path
+        self.key: Optional[str] = None
+        self.child_schema: Dict[str, Any] = {}
+
+
+class IncrementalJSONParser:
+    """Parses one JSON object or array from text fed in pieces, validating against a schema as it goes."""
+
+    def __init__(self, schema: Optional[Dict[str, Any]] = None, max_preamble: int = 64):
+        """Create a parser.
+
+        Args:
+            schema: JSON schema for the document (subset; see the module docstring)
+            max_preamble: Characters tolerated before the opening ``{`` or ``[``
+                (e.g. a Markdown code fence)
+        """
+        self.schema = schema or {}
+        self.max_preamble = max_preamble
+        self.done = False
+        self.value: Any = None
+        self.trailing = ''
+        self._stack: List[_Frame] = []
+        self._state = 'preamble'
+        self._preamble = 0
+        self._token: List[str] = []
+        self._token_schema: Dict[str, Any] = {}
+        self._is_key = False
+        self._escape = 0        # 1 after a backslash, 2-5 while reading \\uXXXX digits
+        self._hex = ''
+        self._length = 0        # decoded length of the current string so far
+
+    def feed(self, text: str) -> List[StructuredField]:
+        """Consume more text; returns the fields it completed.
+
+        Raises:
+            StructuredOutputError: The text can't be completed into a valid document
+        """
+        fields: List[StructuredField] = []
+        i, n = 0, len(text)
+        while i < n and not self.done:
+            if self._step(text[i], fields):
+                i += 1
+        if self.done and i < n:
+            self.trailing += text[i:]
+        return fields
+
+    def close(self) -> Any:
+        """Signal the end of the output; returns the document or raises if it is incomplete."""
+        if not self.done:
+            path = self._stack[-1].path if self._stack else ()
+            raise StructuredOutputError('output ended before the JSON document was complete', path)
+        return self.value
+
+    # -- state machine -------------------------------------------------------------------------
+
+    def _step(self, ch: str, fields: List[StructuredField]) -> bool:
+        """Process one character; returns False to process it again in the new state."""
+        state = self._state
+        if state == 'string':
+            self._string_char(ch, fields)
+            return True
+        if state == 'number':
+            if ch in _NUMBER_CHARS:
+                self._token.append(ch)
+                return True
+            self._finish_number(fields)
+            return False
+        if state == 'literal':
+            self._literal_char(ch, fields)
+            return True
+        if ch in _WHITESPACE:
+            return True
+        if state == 'preamble':
+            if ch in '{[':
+                self._start_value(ch, fields)
+            else:
+                self._preamble += 1
+                if self._preamble > self.max_preamble:
+                    raise StructuredOutputError('no JSON document found in the output')
+        elif state in ('value', 'value_or_end'):
+            if ch == ']' and state == 'value_or_end':
+                self._close(']', fields)
+            else:
+                self._start_value(ch, fields)
+        elif state in ('key', 'key_or_end'):
+            if ch == '"':
+                self._begin_string(is_key=True, schema={})
+            elif ch == '}' and state == 'key_or_end':
+                self._close('}', fields)
+            else:
+                raise StructuredOutputError(f'expected a key, got {ch!r}', self._stack[-1].path)
+        elif state == 'colon':
+            if ch != ':':
+                raise StructuredOutputError(f"expected ':', got {ch!r}", self._stack[-1].path)
+            self._state = 'value'
+        elif state == 'after_value':
+            frame = self._stack[-1]
+            is_object = isinstance(frame.container, dict)
+            if ch == ',':
+                self._state = 'key' if is_object else 'value'
+            elif ch == ('}' if is_object else ']'):
+                self._close(ch, fields)
+            else:
+                raise StructuredOutputError(f"expected ',' or {'}' if is_object else ']'!r}, got {ch!r}", frame.path)
+        return True
+
+    def _value_target(self) -> Tuple[Dict[str, Any], Path]:
+        """Schema and path of the value about to start."""
+        if not self._stack:
+            return self.schema, ()
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            return frame.child_schema, frame.path + (frame.key,)
+        max_items = frame.schema.get('maxItems')
+        if max_items is not None and len(frame.container) >= max_items:
+            raise StructuredOutputError(f'more than {max_items} items', frame.path)
+        items = frame.schema.get('items')
+        return (items if isinstance(items, dict) else {}), frame.path + (len(frame.container),)
+
+    def _start_value(self, ch: str, fields: List[StructuredField]) -> None:
+        schema, path = self._value_target()
+        if ch == '{' or ch == '[':
+            _check_kind(schema, 'object' if ch == '{' else 'array', path)
+            self._stack.append(_Frame({} if ch == '{' else [], schema, path))
+            self._state = 'key_or_end' if ch == '{' else 'value_or_end'
+        elif ch == '"':
+            _check_kind(schema, 'string', path)
+            self._begin_string(is_key=False, schema=schema)
+        elif ch == '-' or ch.isdigit():
+            _check_kind(schema, 'number', path)
+            self._token = [ch]
+            self._token_schema = schema
+            self._state = 'number'
+        elif ch in _LITERALS:
+            word, value = _LITERALS[ch]
+            _check_kind(schema, _kind(value), path)
+            self._token = [ch]
+            self._token_schema = schema
+            self._state = 'literal'
+        else:
+            raise StructuredOutputError(f'unexpected {ch!r}', path)
+
+    def _begin_string(self, is_key: bool, schema: Dict[str, Any]) -> None:
+        self._token = []
+        self._token_schema = schema
+        self._is_key = is_key
+        self._escape = 0
+        self._length = 0
+        self._state = 'string'
+
+    def _string_char(self, ch: str, fields: List[StructuredField]) -> None:
+        if self._escape == 0:
+            if ch == '"':
+                self._finish_string(fields)
+                return
+            self._token.append(ch)
+            if ch == '\\':
+                self._escape = 1
+                return
+            self._length += 1
+        elif self._escape == 1:
+            self._token.append(ch)
+            if ch == 'u':
+                self._escape, self._hex = 2, ''
+            else:
+                self._escape = 0
+                self._length += 1
+        else:
+            self._token.append(ch)
+            self._hex += ch
+            self._escape += 1
+            if self._escape == 6:
+                self._escape = 0
+                # The low half of a surrogate pair doesn't add a character
+                if not 0xDC00 <= int(self._hex, 16) <= 0xDFFF:
+                    self._length += 1
+        if not self._is_key:
+            self._check_partial_string()
+
+    def _check_partial_string(self) -> None:
+        schema = self._token_schema
+        max_length = schema.get('maxLength')
+        if max_length is not None and self._length > max_length:
+            raise StructuredOutputError(f'string longer than {max_length}', self._value_target()[1])
+        options = schema.get('enum')
+        if options is not None and '\\' not in self._token:
+            prefix = ''.join(self._token)
+            if not any(isinstance(option, str) and option.startswith(prefix) for option in options):
+                raise StructuredOutputError(f'{prefix!r}... is not one of {options!r}', self._value_target()[1])
+
+    def _finish_string(self, fields: List[StructuredField]) -> None:
+        raw = ''.join(self._token)
+        try:
+            value = _DECODER.decode(f'"{raw}"') if '\\' in raw else raw
+        except ValueError as e:
+            raise StructuredOutputError(f'invalid string escape ({e})', self._stack[-1].path if self._stack else ())
+        if self._is_key:
+            frame = self._stack[-1]
+            properties = frame.schema.get('properties') or {}
+            if value in properties:
+                frame.child_schema = properties[value]
+            else:
+                extra = frame.schema.get('additionalProperties', True)
+                if extra is False:
+                    raise StructuredOutputError(f'unexpected key {value!r}', frame.path)
+                frame.child_schema = extra if isinstance(extra, dict) else {}
+            frame.key = value
+            self._state = 'colon'
+        else:
+            self._complete(value, fields)
+
+    def _finish_number(self, fields: List[StructuredField]) -> None:
+        raw = ''.join(self._token)
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            raise StructuredOutputError(f'invalid number {raw!r}', self._value_target()[1])
+        self._complete(value, fields)
+
+    def _literal_char(self, ch: str, fields: List[StructuredField]) -> None:
+        self._token.append(ch)
+        word, value = _LITERALS[self._token[0]]
+        so_far = ''.join(self._token)
+        if not word.startswith(so_far):
+            raise StructuredOutputError(f'invalid literal {so_far!r}', self._value_target()[1])
+        if so_far == word:
+            self._complete(value, fields)
+
+    def _close(self, ch: str, fields: List[StructuredField]) -> None:
+        frame = self._stack.pop()
+        _check_value(frame.schema, frame.container, frame.path)
+        self._complete(frame.container, fields, checked=True, path=frame.path)
+
+    def _complete(self, value: Any, fields: List[StructuredField], checked: bool = False,
+                  path: Optional[Path] = None) -> None:
+        if not checked:
+            schema, path = self._value_target()
+            _check_value(schema, value, path)
+        if not self._stack:
+            self.value = value
+            self.done = True
+            self._state = 'done'
+        else:
+            frame = self._stack[-1]
+            if isinstance(frame.container, dict):
+                frame.container[frame.key] = value
+                frame.key = None
+            else:
+                frame.container.append(value)
+            self._state = 'after_value'
+        fields.append(StructuredField(path, value))
+
+
+class StopMatcher:
+    """Finds client-side stop sequences in streamed text, even when one spans two deltas."""
+
+    def __init__(self, stop: Sequence[str]):
+        self.stop = [s for s in stop if s]
+        self._pending = ''
+
+    def feed(self, text: str) -> Tuple[str, bool]:
+        """Return the text that is safe to pass on and whether a stop sequence was reached."""
+        text = self._pending + text
+        cut = min((i for i in (text.find(s) for s in self.stop) if i >= 0), default=-1)
+        if cut >= 0:
+            self._pending = ''
+            return text[:cut], True
+        # Hold back only a tail that could still grow into a stop sequence
+        hold = 0
+        for s in self.stop:
+            for k in range(min(len(s) - 1, len(text)), hold, -1):
+                if text.endswith(s[:k]):
+                    hold = k
+                    break
+        self._pending = text[len(text) - hold:] if hold else ''
+        return text[:len(text) - hold], False
+
+    def flush(self) -> str:
+        """Text held back at the end of the stream."""
+        text, self._pending = self._pending, ''
+        return text
+
+
+def iter_structured(deltas: Iterable[ChatDelta], schema: Optional[Dict[str, Any]] = None,
+                    stop: Sequence[str] = (), max_preamble: int = 64) -> Iterator[StructuredField]:
+    """Parse streamed deltas into fields, closing the stream as soon as it is done or invalid.
+
+    Args:
+        deltas: A `stream_generate`-style iterator of `ChatDelta`s
+        schema: JSON schema to validate against while streaming
+        stop: Client-side stop sequences; the output ends where the first one starts
+        max_preamble: Characters tolerated before the opening ``{`` or ``[``
+
+    Yields:
+        A `StructuredField` per completed value, ending with ``path == ()`` and the whole document
+
+    Raises:
+        StructuredOutputError: The output became invalid or ended incomplete (the stream is closed first)
+    """
+    parser = IncrementalJSONParser(schema, max_preamble)
+    matcher = StopMatcher(stop) if stop else None
+    try:
+        stopped = False
+        for delta in deltas:
+            if not delta.content:
+                continue
+            text = delta.content
+            if matcher is not None:
+                text, stopped = matcher.feed(text)
+            yield from parser.feed(text)
+            if parser.done or stopped:
+                break
+        else:
+            if matcher is not None:
+                yield from parser.feed(matcher.flush())
+        parser.close()
+    finally:
+        close = getattr(deltas, 'close', None)
+        if close is not None:
+            # Drops the connection if the model is still generating
+            close()
+
+
+def parse_structured(text: str, schema: Optional[Dict[str, Any]] = None, max_preamble: int = 64) -> Any:
+    """Parse and validate a complete (non-streamed) completion, e.g. from `generate`."""
+    parser = IncrementalJSONParser(schema, max_preamble)
+    parser.feed(text)
+    return parser.close()
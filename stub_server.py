@@ -0,0 +1,325 @@
+"""Local stand-in for IBM Cloud IAM and the WatsonX chat endpoints.
+
+Implements `/identity/token`, `/ml/v1/text/chat`, `/ml/v1/text/chat_stream`
+and `/ml/v1/text/embeddings` with configurable latency, error and 429 injection and token expiry, so the
+clients can be exercised and benchmarked offline. Point a client at it with
+``WatsonXClient(base_url=url, iam_url=url + '/identity/token', ...)``.
+
+Usage:
+    python stub_server.py [--port 8080] [--latency lognormal:0.3:0.5] [--error-rate 0.01]
+        [--rate-429 0.02] [--max-concurrency 32] [--token-ttl 3600] [--token-delay 0.02]
+        [--embedding-dim 384] [--completion-text '{"answer": 42}'] [--compress-responses] [--reject-gzip]
+
+Latency specs (seconds): ``fixed:S``, ``uniform:LO:HI``, ``lognormal:MEDIAN:SIGMA``.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import random
+import re
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from codec import decode_body
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument sampler returning seconds."""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(':')] if args else []
+    if kind == 'fixed':
+        return lambda: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        median, sigma = values[0], values[1]
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f'Unknown latency spec: {spec!r}')
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stand-in server."""
+    latency: str = 'fixed:0'            # time to first byte of a chat response
+    token_delay: float = 0.0            # seconds between streamed tokens
+    completion_tokens: int = 16         # tokens per completion
+    error_rate: float = 0.0             # fraction of chat requests answered with 500
+    rate_429: float = 0.0               # fraction of chat requests answered with 429
+    retry_after: float = 1.0            # Retry-After sent with 429s
+    max_concurrency: int = 0            # answer 429 above this many in-flight requests (0 = off)
+    token_ttl: int = 3600               # lifetime of issued IAM tokens in seconds
+    iam_latency: str = 'fixed:0'
+    require_auth: bool = True           # reject unknown or expired bearer tokens with 401
+    embedding_dim: int = 384            # length of the (deterministic, per-text) embedding vectors
+    completion_text: Optional[str] = None  # send this text (one word per token) instead of "tok0 tok1 ..."
+    compress_responses: bool = False    # gzip JSON responses for clients that accept it
+    accept_gzip: bool = True            # accept gzip request bodies (False answers them with 415)
+
+
+class StubState:
+    """Counters and issued tokens shared by all handler threads."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.sample_latency = parse_latency(config.latency)
+        self.sample_iam_latency = parse_latency(config.iam_latency)
+        self.lock = threading.Lock()
+        self.tokens: Dict[str, float] = {}
+        self.in_flight = 0
+        self.counts = {'iam': 0, 'chat': 0, 'stream': 0, 'embed': 0, 'embed_inputs': 0,
+                       '401': 0, '429': 0, '500': 0, 'stream_tokens': 0, 'stream_aborted': 0,
+                       'gzip_requests': 0, 'request_bytes': 0}
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state: StubState = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if self.state.config.compress_responses and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=5)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.state.count('request_bytes', len(data))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding:
+            self.state.count('gzip_requests')
+        return decode_body(data, encoding)
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        if self.headers.get('Content-Encoding') and not self.state.config.accept_gzip:
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self._send_json(415, {'errors': [{'code': 'unsupported_media_type',
+                                              'message': 'Content-Encoding is not supported'}]})
+            return
+        body = self._read_body()
+        if path == '/identity/token':
+            self._handle_iam(body)
+        elif path in ('/ml/v1/text/chat', '/ml/v1/text/chat_stream'):
+            self._handle_chat(body, stream=path.endswith('_stream'))
+        elif path == '/ml/v1/text/embeddings':
+            self._handle_embeddings(body)
+        else:
+            self._send_json(404, {'errors': [{'code': 'not_found', 'message': path}]})
+
+    def _handle_iam(self, body: bytes) -> None:
+        state = self.state
+        state.count('iam')
+        time.sleep(state.sample_iam_latency())
+        form = parse_qs(body.decode())
+        if not form.get('apikey'):
+            self._send_json(400, {'errorMessage': 'Provided API key could not be found.'})
+            return
+        token = f'stub-{secrets.token_hex(12)}'
+        now = time.time()
+        with state.lock:
+            state.tokens[token] = now + state.config.token_ttl
+        self._send_json(200, {'access_token': token, 'token_type': 'Bearer',
+                              'expires_in': state.config.token_ttl,
+                              'expiration': int(now + state.config.token_ttl)})
+
+    def _check_auth(self) -> bool:
+        if not self.state.config.require_auth:
+            return True
+        token = self.headers.get('Authorization', '').replace('Bearer ', '', 1)
+        with self.state.lock:
+            expires_at = self.state.tokens.get(token)
+        return expires_at is not None and time.time() < expires_at
+
+    def _reject_unauthorized(self) -> bool:
+        if self._check_auth():
+            return False
+        self.state.count('401')
+        self._send_json(401, {'errors': [{'code': 'authentication_token_expired',
+                                          'message': 'Failed to authenticate the request'}]})
+        return True
+
+    def _handle_chat(self, body: bytes, stream: bool) -> None:
+        state, config = self.state, self.state.config
+        state.count('stream' if stream else 'chat')
+        if self._reject_unauthorized():
+            return
+        with state.lock:
+            state.in_flight += 1
+            overloaded = config.max_concurrency and state.in_flight > config.max_concurrency
+        try:
+            if overloaded or random.random() < config.rate_429:
+                state.count('429')
+                self._send_json(429, {'errors': [{'code': 'rate_limit_exceeded', 'message': 'Too many requests'}]},
+                                {'Retry-After': f'{config.retry_after:g}'})
+                return
+            if random.random() < config.error_rate:
+                state.count('500')
+                self._send_json(500, {'errors': [{'code': 'internal_error', 'message': 'Injected failure'}]})
+                return
+            payload = json.loads(body or b'{}')
+            time.sleep(state.sample_latency())
+            if stream:
+                self._stream_completion(payload)
+            else:
+                self._send_json(200, self._completion(payload))
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _handle_embeddings(self, body: bytes) -> None:
+        state = self.state
+        state.count('embed')
+        if self._reject_unauthorized():
+            return
+        payload = json.loads(body or b'{}')
+        inputs = payload.get('inputs') or []
+        if len(inputs) > 1000:
+            self._send_json(400, {'errors': [{'code': 'invalid_input', 'message': 'Too many inputs (max 1000)'}]})
+            return
+        state.count('embed_inputs', len(inputs))
+        # One round trip per request, like the chat endpoint
+        time.sleep(state.sample_latency())
+        self._send_json(200, {
+            'model_id': payload.get('model_id'),
+            'results': [{'embedding': self._embedding(text)} for text in inputs],
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'input_token_count': sum(max(len(text) // 4, 1) for text in inputs),
+        })
+
+    def _embedding(self, text: str):
+        # Deterministic per text so callers can check that rows come back in input order
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'big')
+        rng = random.Random(seed)
+        return [round(rng.uniform(-1, 1), 6) for _ in range(self.state.config.embedding_dim)]
+
+    def _words(self, payload: dict):
+        limit = int(payload.get('max_tokens') or 1 << 30)
+        text = self.state.config.completion_text
+        if text is not None:
+            return re.findall(r'\s*\S+', text)[:limit] or ['']
+        n = min(self.state.config.completion_tokens, limit)
+        return [f'tok{i} ' for i in range(max(n, 1))]
+
+    def _usage(self, payload: dict, completion_tokens: int) -> dict:
+        prompt_chars = sum(len(str(m.get('content', ''))) for m in payload.get('messages', []))
+        prompt_tokens = max(prompt_chars // 4, 1)
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def _completion(self, payload: dict) -> dict:
+        words = self._words(payload)
+        time.sleep(self.state.config.token_delay * len(words))
+        return {
+            'id': f'chat-{secrets.token_hex(6)}',
+            'model_id': payload.get('model_id'),
+            'created': int(time.time()),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(words)},
+                         'finish_reason': 'stop'}],
+            'usage': self._usage(payload, len(words)),
+        }
+
+    def _stream_completion(self, payload: dict) -> None:
+        words = self._words(payload)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(self.state.config.token_delay)
+                last = i == len(words) - 1
+                chunk = {'model_id': payload.get('model_id'),
+                         'choices': [{'index': 0, 'delta': {'content': word},
+                                      'finish_reason': 'stop' if last else None}]}
+                if last:
+                    chunk['usage'] = self._usage(payload, len(words))
+                self._write_chunk(f'id: {i + 1}\nevent: message\ndata: {json.dumps(chunk)}\n\n'.encode())
+                self.state.count('stream_tokens')
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early; a real server stops generating here
+            self.state.count('stream_aborted')
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+
+def start_stub_server(config: Optional[StubConfig] = None, host: str = '127.0.0.1',
+                      port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stand-in on a background thread; return (server, base_url).
+
+    The server's `StubState` is available as ``server.state``; call
+    ``server.shutdown()`` to stop it.
+    """
+    state = StubState(config or StubConfig())
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for IBM IAM and the WatsonX chat API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help='0 picks a free port')
+    parser.add_argument('--latency', default='fixed:0', help='chat latency spec (see module doc)')
+    parser.add_argument('--iam-latency', default='fixed:0', help='IAM latency spec')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between tokens')
+    parser.add_argument('--completion-tokens', type=int, default=16)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--max-concurrency', type=int, default=0)
+    parser.add_argument('--token-ttl', type=int, default=3600)
+    parser.add_argument('--no-auth', action='store_true', help='accept any bearer token')
+    parser.add_argument('--embedding-dim', type=int, default=384)
+    parser.add_argument('--completion-text', help='fixed completion text (streamed one word per token)')
+    parser.add_argument('--compress-responses', action='store_true', help='gzip JSON responses')
+    parser.add_argument('--reject-gzip', action='store_true', help='answer gzip request bodies with 415')
+    args = parser.parse_args()
+
+    config = StubConfig(latency=args.latency, token_delay=args.token_delay,
+                        completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+                        rate_429=args.rate_429, retry_after=args.retry_after,
+                        max_concurrency=args.max_concurrency, token_ttl=args.token_ttl,
+                        iam_latency=args.iam_latency, require_auth=not args.no_auth,
+                        embedding_dim=args.embedding_dim, completion_text=args.completion_text,
+                        compress_responses=args.compress_responses, accept_gzip=not args.reject_gzip)
+    server, url = start_stub_server(config, args.host, args.port)
+    print(f'STUB_URL={url}', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
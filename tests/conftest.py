@@ -0,0 +1,42 @@
+import pytest
+
+from stub_server import StubConfig, start_stub_server
+from token_manager import IAMTokenManager
+from transport import PooledTransport
+from watsonx_client import WatsonXClient
+
+
+@pytest.fixture
+def stub():
+    """Factory starting a stand-in server with the given `StubConfig` fields; returns (server, base_url)."""
+    servers = []
+
+    def start(**config):
+        server, base = start_stub_server(StubConfig(**config))
+        servers.append(server)
+        return server, base
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_client():
+    """Factory for a `WatsonXClient` talking to a stand-in at `base` over its own transport."""
+    transports = []
+
+    def make(base, **kwargs):
+        transport = PooledTransport()
+        transports.append(transport)
+        iam_url = base + '/identity/token'
+        # No disk cache: a token cached from an earlier stand-in would be rejected with a 401
+        kwargs.setdefault('token_manager', IAMTokenManager('test-key', iam_url=iam_url, transport=transport,
+                                                           disk_cache=False))
+        return WatsonXClient(base, 'test-key', 'test-project', 'test-model', transport=transport,
+                             iam_url=iam_url, **kwargs)
+
+    yield make
+    for transport in transports:
+        transport.close()
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import pytest
+
+
+def test_401_refreshes_the_token_off_the_event_loop(stub):
+    pytest.importorskip('aiohttp')
+    from async_client import AsyncIAMTokenManager, AsyncWatsonXClient
+
+    server, base = stub()
+    iam_url = base + '/identity/token'
+    manager = AsyncIAMTokenManager('test-key', iam_url=iam_url, disk_cache=False)
+    # A token the stand-in never issued, as if it had been revoked
+    manager.access_token, manager.expires_at, manager.refresh_at = 'revoked', 2e9, 2e9
+    invalidated_on = []
+    invalidate = manager.invalidate
+
+    def spy(token=None):
+        invalidated_on.append(threading.current_thread())
+        invalidate(token)
+
+    manager.invalidate = spy
+
+    async def scenario():
+        client = AsyncWatsonXClient(base, 'test-key', 'test-project', 'test-model', token_manager=manager,
+                                    iam_url=iam_url)
+        try:
+            return await client.generate('hi', 8)
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(scenario())
+    assert result['choices'][0]['message']['content']
+    assert server.state.counts['401'] == 1 and server.state.counts['iam'] == 1
+    assert manager.access_token != 'revoked'
+    assert invalidated_on and invalidated_on[0] is not threading.main_thread()
@@ -0,0 +1,99 @@
+import json
+import threading
+
+from batch_runner import load_completed_ids, run
+from watsonx_client import BatchGenerateMixin
+
+
+class EchoClient(BatchGenerateMixin):
+    """Answers each prompt with its upper-cased text, counting calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, max_tokens=512, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return {'choices': [{'message': {'role': 'assistant', 'content': prompt.upper()}}],
+                'usage': {'prompt_tokens': 2, 'completion_tokens': 2, 'total_tokens': 4}}
+
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+
+def test_runs_every_item_and_records_results(tmp_path):
+    client = EchoClient()
+    inputs, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(inputs, [json.dumps({'id': f'q{i}', 'prompt': f'prompt {i}'}) for i in range(5)])
+    progress = run(client, str(inputs), str(output), concurrency=2, max_tokens=8)
+    records = read_records(output)
+    assert sorted(r['id'] for r in records) == [f'q{i}' for i in range(5)]
+    assert all(r['error'] is None and r['text'] for r in records)
+    assert progress.failed == 0
+
+
+def test_resume_skips_completed_items_and_retries_failed_ones(tmp_path):
+    client = EchoClient()
+    inputs, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(inputs, [json.dumps({'id': f'q{i}', 'prompt': f'prompt {i}'}) for i in range(5)])
+    # q0 and q1 done, q2 failed, and a torn line left by a crash
+    output.write_text(json.dumps({'id': 'q0', 'text': 'a', 'error': None}) + '\n'
+                      + json.dumps({'id': 'q1', 'text': 'b', 'error': None}) + '\n'
+                      + json.dumps({'id': 'q2', 'text': None, 'error': 'HTTPError: 500'}) + '\n'
+                      + '{"id": "q3", "te', encoding='utf-8')
+    assert load_completed_ids(str(output)) == {'q0', 'q1'}
+    run(client, str(inputs), str(output), concurrency=2, max_tokens=8)
+    assert client.calls == 3
+    assert load_completed_ids(str(output)) == {f'q{i}' for i in range(5)}
+    # The torn line was cut off, so every later line is intact JSON
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert all(json.loads(line) for line in lines[4:])
+
+
+def test_resume_after_a_tear_inside_a_multibyte_character(tmp_path):
+    client = EchoClient()
+    inputs, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(inputs, [json.dumps({'id': f'q{i}', 'prompt': f'prompt {i}'}) for i in range(3)])
+    done = json.dumps({'id': 'q0', 'text': 'größe', 'error': None}, ensure_ascii=False).encode('utf-8') + b'\n'
+    torn = json.dumps({'id': 'q1', 'text': 'größe'}, ensure_ascii=False).encode('utf-8')
+    output.write_bytes(done + torn[:torn.index('ö'.encode('utf-8')) + 1])
+    run(client, str(inputs), str(output), concurrency=2, max_tokens=8)
+    assert client.calls == 2
+    lines = output.read_bytes().decode('utf-8').splitlines()
+    assert lines[0] == done.decode('utf-8').strip()
+    assert sorted(json.loads(line)['id'] for line in lines) == ['q0', 'q1', 'q2']
+
+
+def test_invalid_input_lines_are_recorded_and_the_batch_goes_on(tmp_path):
+    client = EchoClient()
+    inputs, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(inputs, [json.dumps({'id': 'q0', 'prompt': 'first'}),
+                         '{"id": "q1", "prompt": ',
+                         json.dumps({'id': 'q2', 'text': 'no prompt'}),
+                         '42',
+                         json.dumps('plain string prompt')])
+    progress = run(client, str(inputs), str(output), concurrency=2, max_tokens=8)
+    records = {r['id']: r for r in read_records(output)}
+    assert client.calls == 2
+    assert records['q0']['error'] is None and records['5']['error'] is None
+    assert records['2']['line'] == 2 and records['2']['error'].startswith('line 2: JSONDecodeError')
+    assert records['q2']['line'] == 3 and "KeyError: 'prompt'" in records['q2']['error']
+    assert records['4']['line'] == 4 and records['4']['error'].startswith('line 4: ValueError')
+    assert progress.failed == 3
+
+
+def test_resume_does_not_record_invalid_lines_again(tmp_path):
+    client = EchoClient()
+    inputs, output = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_lines(inputs, [json.dumps({'id': 'q0', 'prompt': 'first'}), '{"id": "q1", "prompt": ', '42'])
+    run(client, str(inputs), str(output), concurrency=2, max_tokens=8)
+    progress = run(client, str(inputs), str(output), concurrency=2, max_tokens=8)
+    records = read_records(output)
+    assert sorted(r['id'] for r in records) == ['2', '3', 'q0']
+    assert client.calls == 1 and progress.failed == 0
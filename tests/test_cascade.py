@@ -0,0 +1,49 @@
+import pytest
+import requests
+
+from cascade import CascadeClient, Tier, min_length
+
+
+def test_rejected_answer_escalates_to_the_next_tier(stub, make_client):
+    small_server, small = stub(completion_text='Too short')
+    large_server, large = stub(completion_text='A long and careful answer from the large model')
+    cascade = CascadeClient([Tier(make_client(small), name='small'), Tier(make_client(large), name='large')],
+                            validator=min_length(20))
+    result = cascade.generate('hello', 16)
+    assert result['cascade'] == {'tier': 1, 'model': 'large', 'escalations': 1}
+    assert small_server.state.counts['chat'] == large_server.state.counts['chat'] == 1
+    stats = cascade.stats()
+    assert (stats['requests'], stats['escalations']) == (1, 1)
+    assert stats['tiers']['small']['rejected'] == 1 and stats['tiers']['small']['share'] == 0.0
+    assert stats['tiers']['large']['accepted'] == 1 and stats['tiers']['large']['share'] == 1.0
+
+
+def test_accepted_answer_stops_at_the_first_tier(stub, make_client):
+    _, small = stub(completion_text='A long enough answer from the small model')
+    large_server, large = stub()
+    cascade = CascadeClient([Tier(make_client(small), name='small'), Tier(make_client(large), name='large')],
+                            validator=min_length(20))
+    assert cascade.generate('hello', 16)['cascade']['tier'] == 0
+    assert large_server.state.counts['chat'] == 0
+    assert cascade.stats()['tiers']['small']['hit_rate'] == 1.0
+
+
+def test_server_error_escalates_unless_failover_is_off(stub, make_client):
+    _, broken = stub(error_rate=1.0)
+    _, large = stub(completion_text='A long and careful answer from the large model')
+    tiers = [Tier(make_client(broken), name='small'), Tier(make_client(large), name='large')]
+    result = CascadeClient(tiers, validator=min_length(20)).generate('hello', 16)
+    assert result['cascade']['model'] == 'large'
+    assert tiers[0].stats()['errors'] == 1
+
+    with pytest.raises(requests.HTTPError):
+        CascadeClient(tiers, validator=min_length(20), failover=False).generate('hello', 16)
+    assert tiers[1].stats()['requests'] == 1
+
+
+def test_tier_names_must_be_unique(make_client):
+    # Both clients default to the same model ID, which would merge their statistics
+    clients = [make_client('http://127.0.0.1:1'), make_client('http://127.0.0.1:1')]
+    with pytest.raises(ValueError, match='test-model'):
+        CascadeClient(clients)
+    CascadeClient([Tier(clients[0], name='a'), Tier(clients[1], name='b')])
@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from coalesce import SingleFlight
+from deadline import Cancelled
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait(1.0)
+        return {'answer': [1]}
+
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flight.do, 'k', fn) for _ in range(5)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result == {'answer': [1]} for result, _ in results)
+    # Followers get copies, not the leader's object
+    assert len({id(result) for result, _ in results}) == 5
+
+
+def test_errors_are_shared_and_the_next_call_runs_again():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flight.do('k', fail)
+    assert flight.do('k', lambda: 42) == (42, False)
+
+
+def run_behind_leader(flight, leader_fn, fn, waiters=4):
+    """Start a leader running `leader_fn`, queue `waiters` callers running `fn`, then let the leader finish."""
+    release = threading.Event()
+
+    def leader():
+        release.wait(1.0)
+        return leader_fn()
+
+    with ThreadPoolExecutor(waiters + 1) as pool:
+        first = pool.submit(flight.do, 'k', leader)
+        time.sleep(0.05)
+        rest = [pool.submit(flight.do, 'k', fn) for _ in range(waiters)]
+        time.sleep(0.1)
+        release.set()
+        return first, rest
+
+
+def test_one_waiter_takes_over_from_a_cancelled_leader():
+    flight = SingleFlight()
+    calls = []
+
+    def cancelled():
+        raise Cancelled('leader cancelled')
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'answer': 1}
+
+    first, rest = run_behind_leader(flight, cancelled, fn)
+    with pytest.raises(Cancelled):
+        first.result()
+    results = [f.result() for f in rest]
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert flight.stats() == {'leaders': 2, 'coalesced': 3, 'errors': 1, 'in_flight': 0}
+
+
+def test_each_waiter_raises_its_own_copy_of_the_error():
+    flight = SingleFlight()
+    original = ValueError('boom')
+
+    def fail():
+        raise original
+
+    first, rest = run_behind_leader(flight, fail, lambda: 42)
+    errors = [f.exception() for f in [first] + rest]
+    assert errors[0] is original
+    assert len({id(error) for error in errors}) == len(errors)
+    for error in errors[1:]:
+        assert type(error) is ValueError and error.args == ('boom',) and error.__cause__ is original
+    assert flight.stats()['coalesced'] == 4
+
+
+def test_sampled_payloads_can_be_excluded():
+    assert SingleFlight().accepts({'temperature': 0.7})
+    assert not SingleFlight(include_sampled=False).accepts({'temperature': 0.7})
+    assert SingleFlight(include_sampled=False).accepts({'temperature': 0})
+
+
+def test_identical_concurrent_generates_send_one_request(stub, make_client):
+    server, base = stub(latency='fixed:0.3')
+    client = make_client(base, coalescer=SingleFlight())
+    client.warm_up()
+    with ThreadPoolExecutor(5) as pool:
+        results = list(pool.map(lambda _: client.generate('same prompt', 8, temperature=0), range(5)))
+    assert server.state.counts['chat'] == 1
+    assert all(result == results[0] for result in results)
@@ -0,0 +1,55 @@
+import gzip
+import json
+
+import pytest
+
+from codec import PayloadTemplate, decode_body, dumps, encode_body, loads
+
+STATIC = {'model_id': 'ibm/granite-4-h-small', 'project_id': 'p-123'}
+
+
+def stdlib(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+@pytest.mark.parametrize('payload', [
+    {**STATIC, 'messages': [{'role': 'user', 'content': 'hi "there"\n'}], 'max_tokens': 8},
+    dict(STATIC),
+    {**STATIC, 'model_id': 'other-model', 'max_tokens': 8},
+    {'project_id': 'p-123', 'max_tokens': 8},
+])
+def test_template_encodes_like_json_dumps(payload):
+    assert PayloadTemplate(STATIC).encode(payload) == stdlib(payload)
+    assert PayloadTemplate({}).encode(payload) == stdlib(payload)
+
+
+def test_non_ascii_payloads_round_trip():
+    payload = {**STATIC, 'messages': [{'role': 'user', 'content': 'naïve café ☕'}]}
+    assert loads(PayloadTemplate(STATIC).encode(payload)) == payload == loads(dumps(payload))
+
+
+def test_bodies_are_gzipped_from_the_threshold_on():
+    payload = {**STATIC, 'prompt': 'x' * 100}
+    plain = dumps(payload)
+    assert encode_body(payload) == (plain, None)
+    assert encode_body(payload, gzip_threshold=len(plain) + 1) == (plain, None)
+    body, encoding = encode_body(payload, gzip_threshold=len(plain))
+    assert encoding == 'gzip' and gzip.decompress(body) == plain
+    assert decode_body(body, 'GZIP') == plain and decode_body(plain, None) == plain
+
+
+def test_client_gzips_large_bodies(stub, make_client):
+    server, base = stub()
+    client = make_client(base, gzip_threshold=1)
+    client.generate('hello ' * 200, 8)
+    assert server.state.counts['gzip_requests'] == 1
+    assert server.state.counts['request_bytes'] < len(('hello ' * 200).encode())
+
+
+def test_client_sends_uncompressed_after_a_415(stub, make_client):
+    server, base = stub(accept_gzip=False)
+    client = make_client(base, gzip_threshold=1)
+    client.generate('hello', 8)
+    assert client.gzip_threshold is None
+    client.generate('again', 8)
+    assert server.state.counts['chat'] == 2 and server.state.counts['gzip_requests'] == 0
@@ -0,0 +1,95 @@
+from conversation import Conversation, estimate_message_tokens
+
+
+def recount(conv):
+    """Token count of the context from scratch, to check the running total against."""
+    return sum(estimate_message_tokens(message) for message in conv.context())
+
+
+def chat(conv, turns, size=40):
+    for i in range(turns):
+        conv.add_user(f'u{i}'.ljust(size, '.'))
+        conv.add_assistant(f'a{i}'.ljust(size, '.'))
+
+
+def test_token_count_is_kept_incrementally():
+    conv = Conversation(system_prompt='Be brief.')
+    chat(conv, 3)
+    assert conv.token_count == recount(conv)
+    conv.pop()
+    conv.trim(recount(conv) - 1)
+    assert conv.token_count == recount(conv)
+    conv.clear()
+    assert conv.token_count == recount(conv) == estimate_message_tokens({'content': 'Be brief.'})
+
+
+def test_trim_drops_oldest_turns_and_a_leading_assistant_reply():
+    conv = Conversation()
+    chat(conv, 3)
+    conv.add_user('u3')
+    per_message = estimate_message_tokens({'content': 'x' * 40})
+    # Dropping u0 alone would fit, but a0 would then open the history without its prompt
+    dropped = conv.trim(conv.token_count - per_message)
+    assert dropped == 2 and conv.trimmed_messages == 2
+    assert [m['content'][:2] for m in conv.messages] == ['u1', 'a1', 'u2', 'a2', 'u3']
+    assert conv.trim(conv.token_count) == 0
+
+
+def test_trim_keeps_the_newest_message_even_over_budget():
+    conv = Conversation()
+    chat(conv, 2)
+    conv.add_user('x' * 400)
+    conv.trim(10)
+    assert [m['content'] for m in conv.messages] == ['x' * 400]
+
+
+def test_prepare_leaves_room_for_the_reply():
+    conv = Conversation(max_context_tokens=60)
+    chat(conv, 2)
+    messages = conv.prepare('next question', max_tokens=20)
+    assert messages[-1] == {'role': 'user', 'content': 'next question'}
+    assert conv.token_count <= 40 and recount(conv) == conv.token_count
+
+
+def test_summarizer_folds_dropped_turns_into_the_system_message():
+    calls = []
+
+    def summarizer(previous, dropped):
+        calls.append((previous, [m['content'][:2] for m in dropped]))
+        return f'summary {len(calls)}'
+
+    conv = Conversation(system_prompt='Be brief.', summarizer=summarizer)
+    chat(conv, 3)
+    # Room for dropping one turn (2 x 14 tokens) and the 12 tokens the summary adds
+    conv.trim(conv.token_count - 16)
+    conv.trim(conv.token_count - 16)
+    assert calls == [(None, ['u0', 'a0']), ('summary 1', ['u1', 'a1'])]
+    assert conv.context()[0] == {'role': 'system',
+                                 'content': 'Be brief.\n\nSummary of the earlier conversation: summary 2'}
+    assert conv.token_count == recount(conv)
+
+
+def test_an_oversized_summary_triggers_one_more_trim_without_resummarizing():
+    calls = []
+
+    def summarizer(previous, dropped):
+        calls.append(dropped)
+        return 's' * 200
+
+    conv = Conversation(summarizer=summarizer)
+    chat(conv, 3)
+    budget = conv.token_count - 20
+    conv.trim(budget)
+    assert len(calls) == 1 and conv.summarizer is summarizer
+    assert conv.token_count <= budget or len(conv) == 1
+    assert conv.token_count == recount(conv)
+
+
+def test_a_failing_summarizer_just_drops_the_turns(caplog):
+    def summarizer(previous, dropped):
+        raise RuntimeError('model unavailable')
+
+    conv = Conversation(summarizer=summarizer)
+    chat(conv, 2)
+    assert conv.trim(conv.token_count - 20) == 2
+    assert conv.summary is None and 'summarizer failed' in caplog.text
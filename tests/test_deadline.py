@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from deadline import Cancelled, Deadline, DeadlineExceeded
+
+
+def test_check_raises_once_the_budget_is_spent():
+    deadline = Deadline(0.05)
+    deadline.check()
+    time.sleep(0.06)
+    assert deadline.expired
+    with pytest.raises(DeadlineExceeded):
+        deadline.check()
+
+
+def test_cancel_ends_a_wait_early():
+    deadline = Deadline()
+    threading.Timer(0.05, deadline.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        deadline.wait(threading.Event())
+    assert time.monotonic() - start < 1.0
+
+
+def test_child_expires_with_parent_and_is_cancelled_with_it():
+    parent = Deadline(10)
+    child = parent.child(60)
+    assert child.expires_at == parent.expires_at
+    assert parent.child(1).expires_at < parent.expires_at
+    parent.cancel()
+    assert child.cancelled
+
+
+def test_cancelling_a_child_leaves_the_parent_running():
+    parent = Deadline()
+    parent.child().cancel()
+    assert not parent.cancelled
+
+
+def test_guard_aborts_when_the_deadline_passes():
+    aborted = threading.Event()
+    deadline = Deadline(0.05)
+    with deadline.guard(aborted.set):
+        assert aborted.wait(1.0)
+
+
+def test_guard_does_not_abort_after_exit():
+    aborted = threading.Event()
+    deadline = Deadline(0.05)
+    with deadline.guard(aborted.set):
+        pass
+    assert not aborted.wait(0.1)
+
+
+def test_abort_skips_a_guard_that_exited_after_the_callbacks_were_copied():
+    aborted = threading.Event()
+    deadline = Deadline()
+    with deadline.guard(aborted.set):
+        # What `_abort_all` copies before it releases the lock
+        pending = list(deadline._aborts.values())
+    for abort in pending:
+        abort()
+    assert not aborted.is_set()
+
+
+def test_generate_aborts_a_slow_request(stub, make_client):
+    server, base = stub(latency='fixed:5')
+    client = make_client(base)
+    client.warm_up()
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.generate('hi', 8, deadline=0.2)
+    assert time.monotonic() - start < 2.0
+
+
+def test_cancel_stops_a_stream_mid_read(stub, make_client):
+    server, base = stub(token_delay=0.2, completion_tokens=50)
+    client = make_client(base)
+    deadline = Deadline()
+    chunks = []
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        for delta in client.stream_generate('hi', 64, deadline=deadline):
+            chunks.append(delta)
+            deadline.cancel()
+    assert time.monotonic() - start < 3.0
+    assert len(chunks) < 50
+
+
+def test_guards_share_one_watchdog_thread():
+    before = threading.active_count()
+    deadlines = [Deadline(30) for _ in range(50)]
+    guards = [d.guard(lambda: None) for d in deadlines]
+    for guard in guards:
+        guard.__enter__()
+    try:
+        assert threading.active_count() <= before + 1
+    finally:
+        for guard in guards:
+            guard.__exit__(None, None, None)
+
+
+def test_watchdog_aborts_in_expiry_order():
+    fired = []
+    late, soon = Deadline(0.2), Deadline(0.05)
+    with late.guard(lambda: fired.append('late')), soon.guard(lambda: fired.append('soon')):
+        time.sleep(0.4)
+    assert fired == ['soon', 'late']
+
+
+def test_finished_children_detach_from_the_parent():
+    parent = Deadline(60)
+    for _ in range(100):
+        parent.child().close()
+    for _ in range(100):
+        parent.child(1).cancel()
+    for _ in range(100):
+        parent.child()
+    assert not parent._aborts
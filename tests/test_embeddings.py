@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from embeddings import MAX_INPUTS_PER_REQUEST, EmbeddingBatcher, chunk_ranges
+
+
+def test_chunks_respect_the_input_limit():
+    assert chunk_ranges(['a'] * 7, max_inputs=3) == [(0, 3), (3, 6), (6, 7)]
+    assert chunk_ranges([], max_inputs=3) == []
+    # Never more than the server accepts, never less than one input per chunk
+    assert chunk_ranges(['a'] * 2500, max_inputs=5000) == [(0, 1000), (1000, 2000), (2000, 2500)]
+    assert max(end - start for start, end in chunk_ranges(['a'] * 2500, 5000)) == MAX_INPUTS_PER_REQUEST
+    assert chunk_ranges(['a'] * 2, max_inputs=0) == [(0, 1), (1, 2)]
+
+
+def test_chunks_respect_the_character_limit():
+    texts = ['x' * 40, 'x' * 40, 'x' * 40, 'x' * 10]
+    assert chunk_ranges(texts, max_chars=100) == [(0, 2), (2, 4)]
+    # An oversized text gets a chunk of its own
+    assert chunk_ranges(['x' * 10, 'x' * 500, 'x' * 10], max_chars=100) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_chunked_embeddings_come_back_in_input_order(stub, make_client):
+    np = pytest.importorskip('numpy')
+    server, base = stub(latency='uniform:0:0.05', embedding_dim=8)
+    client = make_client(base)
+    texts = [f'text number {i}' for i in range(10)]
+    whole = client.embed(texts)
+    chunked = client.embed(texts, batch_size=3, concurrency=4)
+    assert chunked.shape == (10, 8) and chunked.dtype == np.float32
+    assert np.array_equal(chunked, whole)
+    assert server.state.counts['embed'] == 1 + 4
+
+
+def test_batched_embed_one_calls_get_their_own_rows(stub, make_client):
+    np = pytest.importorskip('numpy')
+    server, base = stub(embedding_dim=8)
+    client = make_client(base)
+    texts = [f'text number {i}' for i in range(16)]
+    expected = client.embed(texts)
+    with ThreadPoolExecutor(16) as pool:
+        rows = list(pool.map(client.embed_one, texts))
+    for row, want in zip(rows, expected):
+        assert np.array_equal(row, want)
+    assert server.state.counts['embed'] < 1 + len(texts)
+
+
+def test_batcher_hands_each_caller_its_row_and_shares_errors():
+    np = pytest.importorskip('numpy')
+    batches = []
+
+    def embed_fn(texts):
+        batches.append(list(texts))
+        if 'bad' in texts:
+            raise ValueError('rejected')
+        return np.array([[float(text)] for text in texts], dtype=np.float32)
+
+    batcher = EmbeddingBatcher(embed_fn, window=0.05, max_batch=4)
+    with ThreadPoolExecutor(8) as pool:
+        rows = list(pool.map(batcher.submit, [str(i) for i in range(8)]))
+    assert [row[0] for row in rows] == list(range(8))
+    assert all(len(batch) <= 4 for batch in batches) and len(batches) < 8
+    with pytest.raises(ValueError):
+        batcher.submit('bad')
+    assert batcher.stats()['errors'] == 1
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from watsonx_client import BatchGenerateMixin
+
+
+class SleepyClient(BatchGenerateMixin):
+    """Sleeps for the 'delay' param, fails prompts starting with 'fail', and tracks concurrency."""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, delay=0.0, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(delay)
+            if prompt.startswith('fail'):
+                raise ValueError(prompt)
+            return {'choices': [{'message': {'role': 'assistant', 'content': prompt.upper()}}]}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_results_come_back_in_input_order():
+    client = SleepyClient()
+    # Earlier prompts take longest, so they finish last
+    items = [{'prompt': f'p{i}', 'params': {'delay': 0.05 * (5 - i)}} for i in range(5)]
+    results = list(client.generate_many(items, concurrency=5))
+    assert [r.index for r in results] == list(range(5))
+    assert [r.prompt for r in results] == [f'p{i}' for i in range(5)]
+    assert results[0].item is items[0]
+
+
+def test_unordered_results_come_back_as_they_finish():
+    client = SleepyClient()
+    items = [{'prompt': 'slow', 'params': {'delay': 0.3}}, {'prompt': 'fast', 'params': {'delay': 0.0}}]
+    results = list(client.generate_many(items, concurrency=2, ordered=False))
+    assert [r.prompt for r in results] == ['fast', 'slow']
+
+
+def test_errors_are_captured_per_item():
+    client = SleepyClient()
+    results = list(client.generate_many(['ok 1', 'fail 2', 'ok 3'], concurrency=2))
+    assert [r.error is None for r in results] == [True, False, True]
+    assert isinstance(results[1].error, ValueError) and results[1].response is None
+    assert results[2].response['choices'][0]['message']['content'] == 'OK 3'
+
+
+def test_iterator_input_is_consumed_lazily_within_the_window():
+    client = SleepyClient()
+    pulled = []
+
+    def prompts():
+        for i in range(50):
+            pulled.append(i)
+            yield {'prompt': f'p{i}', 'params': {'delay': 0.01}}
+
+    concurrency = 3
+    results = client.generate_many(prompts(), concurrency=concurrency)
+    first = next(results)
+    assert first.index == 0
+    # Only the bounded window was read ahead of the first result
+    assert len(pulled) <= 2 * concurrency + 1
+    rest = list(results)
+    assert len(rest) == 49 and len(pulled) == 50
+    assert client.max_active <= concurrency
@@ -0,0 +1,54 @@
+from instrumentation import CallRecord, PrometheusExporter
+
+
+def record(operation='generate', model='m', status=200, error=None, total=0.3, ttfb=None, attempts=1, **fields):
+    call = CallRecord(operation, model)
+    call.status, call.error, call.total, call.ttfb, call.attempts = status, error, total, ttfb, attempts
+    for name, value in fields.items():
+        setattr(call, name, value)
+    return call
+
+
+def test_render_counts_requests_retries_and_tokens():
+    exporter = PrometheusExporter()
+    exporter(record(attempts=3, prompt_tokens=10, completion_tokens=5))
+    exporter(record(prompt_tokens=4, completion_tokens=1))
+    exporter(record(status=None, error='HTTPError'))
+    exporter(record(cached=True))
+    lines = exporter.render().splitlines()
+    assert '# TYPE watsonx_requests_total counter' in lines
+    ok = 'model="m",operation="generate"'
+    assert f'watsonx_requests_total{{cached="false",coalesced="false",{ok},outcome="200"}} 2' in lines
+    assert f'watsonx_requests_total{{cached="true",coalesced="false",{ok},outcome="200"}} 1' in lines
+    assert f'watsonx_requests_total{{cached="false",coalesced="false",{ok},outcome="HTTPError"}} 1' in lines
+    assert f'watsonx_retries_total{{{ok}}} 2' in lines
+    assert f'watsonx_tokens_total{{{ok},type="completion"}} 6' in lines
+    assert f'watsonx_tokens_total{{{ok},type="prompt"}} 14' in lines
+
+
+def test_render_histograms_are_cumulative():
+    exporter = PrometheusExporter(buckets=(0.1, 1.0))
+    for total in (0.05, 0.5, 5.0):
+        exporter(record(total=total, ttfb=0.05))
+    lines = exporter.render().splitlines()
+    name = 'watsonx_request_duration_seconds'
+    assert f'# TYPE {name} histogram' in lines
+    assert [line for line in lines if line.startswith(name)] == [
+        f'{name}_bucket{{le="0.1",model="m",operation="generate"}} 1',
+        f'{name}_bucket{{le="1",model="m",operation="generate"}} 2',
+        f'{name}_bucket{{le="+Inf",model="m",operation="generate"}} 3',
+        f'{name}_sum{{model="m",operation="generate"}} 5.550000',
+        f'{name}_count{{model="m",operation="generate"}} 3',
+    ]
+    assert 'watsonx_time_to_first_byte_seconds_count{model="m",operation="generate"} 3' in lines
+    # Zero connect/queue/IAM times are not observed
+    assert not any(line.startswith('watsonx_connect_seconds_') for line in lines)
+
+
+def test_render_escapes_labels_and_appends_collectors():
+    exporter = PrometheusExporter()
+    exporter(record(model='a "quoted"\\model\n'))
+    exporter.add_collector(lambda: 'lane_queue_depth{lane="batch"} 3\n')
+    text = exporter.render()
+    assert 'model="a \\"quoted\\"\\\\model\\n"' in text
+    assert text.endswith('\nlane_queue_depth{lane="batch"} 3\n')
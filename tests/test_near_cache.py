@@ -0,0 +1,66 @@
+import pytest
+
+from near_cache import NearDuplicateCache, normalize_prompt
+
+
+def test_normalize_drops_only_sentence_punctuation():
+    assert normalize_prompt('  What is   the CAPITAL of France?! ') == 'what is the capital of france'
+    assert normalize_prompt('"Quoted," she said.') == 'quoted she said'
+    assert normalize_prompt('What is 2+2?') == 'what is 2+2'
+    assert normalize_prompt('Is pi 3.14?') == 'is pi 3.14'
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('What is 2+2?', 'What is 2*2?'),
+    ('What is 2+2?', 'What is 22?'),
+    ('What is 2*2?', 'What is 22?'),
+    ('Is x > y for x = 3 and y = 5?', 'Is x < y for x = 3 and y = 5?'),
+    ('Please explain step by step how to evaluate the expression 17 + 25',
+     'Please explain step by step how to evaluate the expression 17 - 25'),
+])
+def test_operators_and_digits_do_not_collide(cached, asked):
+    cache = NearDuplicateCache()
+    cache.add(cached, {'answer': cached})
+    assert cache.lookup(cached) == ({'answer': cached}, 1.0)
+    assert cache.lookup(asked) is None
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('Is it safe to take ibuprofen with alcohol?', 'Is it unsafe to take ibuprofen with alcohol?'),
+    ('Write a Python function that sorts a list in ascending order',
+     'Write a Python function that sorts a list in descending order'),
+    ('Which countries border Germany?', 'Which countries border Germans?'),
+    ('How do I reset my account password?', 'How do I reset my account password now?'),
+])
+def test_similar_prompts_with_different_words_do_not_collide(cached, asked):
+    cache = NearDuplicateCache()
+    cache.add(cached, {'answer': cached})
+    assert cache.lookup(asked) is None
+    assert cache.stats()['near_hits'] == 0
+
+
+def test_casing_and_punctuation_hit_exactly():
+    cache = NearDuplicateCache()
+    cache.add('What is the capital of France?', 'Paris')
+    assert cache.lookup('what is the capital of france') == ('Paris', 1.0)
+    assert cache.stats()['exact_hits'] == 1
+
+
+def test_small_typo_is_a_near_hit():
+    cache = NearDuplicateCache(threshold=0.6)
+    cache.add('How do I reset my account password from the settings page?', 'Use Settings > Security')
+    hit = cache.lookup('How do I reset my acount password from the settings page?')
+    assert hit is not None and hit[0] == 'Use Settings > Security' and hit[1] < 1.0
+    assert cache.stats()['near_hits'] == 1
+    # Swapped neighbouring letters count as a typo too, but only one word may differ
+    assert cache.lookup('How do I reset my account pasword from the setitngs page?') is None
+    hit = cache.lookup('How do I reset my account password from the setitngs page?')
+    assert hit is not None and hit[0] == 'Use Settings > Security'
+
+
+def test_payload_namespace_must_match():
+    cache = NearDuplicateCache()
+    payload = {'model_id': 'm', 'temperature': 0, 'messages': [{'role': 'user', 'content': 'Hi there'}]}
+    cache.put(payload, {'text': 'hello'})
+    assert cache.get(payload) == {'text': 'hello'}
+    assert cache.get({**payload, 'model_id': 'other'}) is None
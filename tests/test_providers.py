@@ -0,0 +1,27 @@
+import pytest
+
+import main
+from providers import client_from_env
+
+ENV = {'WATSONX_BASE_URL': 'http://127.0.0.1:1', 'WATSONX_API_KEY': 'test-key',
+       'WATSONX_PROJECT_ID': 'test-project', 'MODEL': 'test-model'}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name, value in ENV.items():
+        monkeypatch.setenv(name, value)
+    return monkeypatch
+
+
+def test_async_client_from_env_uses_the_iam_url(env):
+    pytest.importorskip('aiohttp')
+    env.setenv('WATSONX_IAM_URL', 'http://127.0.0.1:1/identity/token')
+    client = client_from_env('watsonx-async')
+    assert client.token_manager.iam_url == 'http://127.0.0.1:1/identity/token'
+
+
+def test_cli_rejects_the_async_provider(env):
+    env.setenv('PROVIDER', 'watsonx-async')
+    with pytest.raises(SystemExit, match='asyncio client'):
+        main.create_client()
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+
+from proxy_server import openai_to_watsonx, watsonx_to_openai
+
+
+def run_proxy(proxy, scenario):
+    """Run `scenario(client)` against the proxy app on an aiohttp test server."""
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def main():
+        async with TestClient(TestServer(proxy.app())) as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+def make_proxy(base, **kwargs):
+    pytest.importorskip('aiohttp')
+    from proxy_server import WatsonXProxy
+    kwargs.setdefault('use_api_key_direct', True)
+    return WatsonXProxy(base, 'test-key', 'test-project', 'ibm/test-model', **kwargs)
+
+
+def test_openai_request_becomes_a_watsonx_payload():
+    body = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'hi'}], 'max_tokens': 50,
+            'max_completion_tokens': 20, 'temperature': 0, 'stop': ['\n'], 'seed': None, 'user': 'u1'}
+    payload = openai_to_watsonx(body, 'proj', 'ibm/granite')
+    assert payload['model_id'] == 'ibm/granite' and payload['project_id'] == 'proj'
+    assert payload['messages'] == body['messages']
+    assert payload['max_tokens'] == 20
+    assert payload['temperature'] == 0 and payload['stop'] == ['\n']
+    assert 'seed' not in payload and 'user' not in payload
+    assert openai_to_watsonx({'messages': body['messages']}, 'proj', 'm', max_tokens=7)['max_tokens'] == 7
+    with pytest.raises(ValueError):
+        openai_to_watsonx({'messages': []}, 'proj', 'm')
+
+
+def test_watsonx_response_becomes_an_openai_completion():
+    choices = [{'index': 0, 'message': {'role': 'assistant', 'content': 'ok'}, 'finish_reason': 'stop'}]
+    result = watsonx_to_openai({'id': 'chat-1', 'created': 5, 'choices': choices, 'usage': {'total_tokens': 3}},
+                               'gpt-4o')
+    assert result == {'id': 'chat-1', 'object': 'chat.completion', 'created': 5, 'model': 'gpt-4o',
+                      'choices': choices, 'usage': {'total_tokens': 3}}
+    bare = watsonx_to_openai({}, 'gpt-4o')
+    assert bare['id'].startswith('chatcmpl-') and bare['choices'] == [] and bare['usage'] == {}
+
+
+def test_callers_without_the_proxy_key_are_rejected(stub):
+    server, base = stub(require_auth=False)
+    proxy = make_proxy(base, proxy_api_key='secret')
+    request = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+    async def scenario(client):
+        denied = await client.post('/v1/chat/completions', json=request,
+                                   headers={'Authorization': 'Bearer wrong'})
+        allowed = await client.post('/v1/chat/completions', json=request,
+                                    headers={'Authorization': 'Bearer secret'})
+        return denied.status, await denied.json(), allowed.status, await allowed.json()
+
+    denied_status, denied, allowed_status, allowed = run_proxy(proxy, scenario)
+    assert denied_status == 401 and denied['error']['code'] == 'invalid_api_key'
+    assert allowed_status == 200 and allowed['object'] == 'chat.completion' and allowed['model'] == 'gpt-4o'
+    assert server.state.counts['chat'] == 1
+
+
+def test_stream_is_relayed_as_openai_chunks(stub):
+    server, base = stub(completion_text='Hello there friend', require_auth=False)
+    proxy = make_proxy(base)
+
+    async def scenario(client):
+        resp = await client.post('/v1/chat/completions', json={
+            'model': 'gpt-4o', 'stream': True, 'stream_options': {'include_usage': True},
+            'messages': [{'role': 'user', 'content': 'hi'}]})
+        return resp.status, resp.headers['Content-Type'], await resp.text()
+
+    status, content_type, text = run_proxy(proxy, scenario)
+    assert status == 200 and content_type.startswith('text/event-stream')
+    events = [line[len('data: '):] for line in text.split('\n\n') if line.startswith('data: ')]
+    assert events[-1] == '[DONE]'
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert all(c['object'] == 'chat.completion.chunk' and c['model'] == 'gpt-4o' for c in chunks)
+    assert len({c['id'] for c in chunks}) == 1
+    deltas = [c['choices'][0]['delta'] for c in chunks if c['choices']]
+    assert deltas[0]['role'] == 'assistant'
+    assert ''.join(d['content'] for d in deltas) == 'Hello there friend'
+    assert chunks[-1]['choices'] == [] and chunks[-1]['usage']['completion_tokens'] == 3
+
+
+def test_upstream_401_refreshes_the_shared_token(stub):
+    server, base = stub()
+    proxy = make_proxy(base, use_api_key_direct=False, iam_url=base + '/identity/token')
+    # Keep the stand-in's tokens out of the user's on-disk token cache
+    proxy.token_manager._cache_path = None
+    # A token the stand-in never issued, as if it had been revoked
+    proxy.token_manager.access_token, proxy.token_manager.refresh_at = 'revoked', 2e9
+
+    async def scenario(client):
+        resp = await client.post('/v1/chat/completions', json={'messages': [{'role': 'user', 'content': 'hi'}]})
+        return resp.status
+
+    assert run_proxy(proxy, scenario) == 200
+    assert server.state.counts['401'] == 1 and server.state.counts['iam'] == 1
+    assert proxy.token_manager.access_token != 'revoked'
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from deadline import Cancelled, Deadline
+from rate_limit import AIMDController, RateGovernor
+
+
+def governor(limit=4):
+    return RateGovernor(concurrency=AIMDController(initial=limit, maximum=limit))
+
+
+def test_stream_holds_its_governor_slot_until_consumed(stub, make_client):
+    server, base = stub(token_delay=0.02, completion_tokens=5, require_auth=False)
+    rate_governor = governor()
+    client = make_client(base, rate_governor=rate_governor)
+    stream = client.stream_generate('hi', 16)
+    next(stream)
+    assert rate_governor.concurrency.in_flight == 1
+    for _ in stream:
+        pass
+    assert rate_governor.concurrency.in_flight == 0
+
+
+def test_abandoned_stream_releases_its_governor_slot(stub, make_client):
+    server, base = stub(token_delay=0.02, completion_tokens=20, require_auth=False)
+    rate_governor = governor()
+    client = make_client(base, rate_governor=rate_governor)
+    stream = client.stream_generate('hi', 32)
+    next(stream)
+    stream.close()
+    assert rate_governor.concurrency.in_flight == 0
+
+
+def test_proxy_stream_holds_its_governor_slot(stub):
+    pytest.importorskip('aiohttp')
+    from aiohttp.test_utils import TestClient, TestServer
+
+    from proxy_server import WatsonXProxy
+
+    server, base = stub(token_delay=0.05, completion_tokens=5, require_auth=False)
+    proxy = WatsonXProxy(base, 'test-key', 'test-project', 'test-model', use_api_key_direct=True,
+                         rate_governor=governor())
+
+    async def scenario():
+        async with TestClient(TestServer(proxy.app())) as client:
+            resp = await client.post('/v1/chat/completions', json={
+                'model': 'test-model', 'stream': True, 'messages': [{'role': 'user', 'content': 'hi'}]})
+            assert resp.status == 200
+            await resp.content.readline()
+            in_flight = proxy.rate_governor.concurrency.in_flight
+            await resp.read()
+            return in_flight
+
+    assert asyncio.run(scenario()) == 1
+    assert proxy.rate_governor.concurrency.in_flight == 0
+    assert proxy.stats()['errors'] == 0
+
+
+def test_cancel_interrupts_a_rate_limit_wait():
+    rate_governor = RateGovernor(requests_per_second=0.5)
+    rate_governor.acquire()
+    rate_governor.concurrency.release()
+    deadline = Deadline(30)
+    threading.Timer(0.05, deadline.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        rate_governor.acquire(deadline=deadline)
+    assert time.monotonic() - start < 1.0
+    # The cancelled wait handed its reservation back
+    assert rate_governor.request_bucket.reserve() < 2.5
+
+
+def test_cancel_interrupts_a_concurrency_slot_wait():
+    rate_governor = governor(limit=1)
+    rate_governor.acquire()
+    deadline = Deadline()
+    threading.Timer(0.05, deadline.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        rate_governor.acquire(deadline=deadline)
+    assert time.monotonic() - start < 1.0
+    assert rate_governor.concurrency.in_flight == 1
@@ -0,0 +1,51 @@
+import pytest
+import requests
+
+from recording import REDACTED, RecordingTransport, ReplayTransport, load_exchanges
+from token_manager import IAMTokenManager
+from watsonx_client import WatsonXClient, extract_text_from_response
+
+
+def make_client(base, transport):
+    iam_url = base + '/identity/token'
+    token_manager = IAMTokenManager('test-key', iam_url=iam_url, transport=transport, disk_cache=False)
+    return WatsonXClient(base, 'test-key', 'test-project', 'test-model', transport=transport, iam_url=iam_url,
+                         token_manager=token_manager)
+
+
+def test_recording_redacts_headers_api_key_and_tokens(stub, tmp_path):
+    _, base = stub()
+    path = str(tmp_path / 'traffic.jsonl')
+    recorder = RecordingTransport(path)
+    client = make_client(base, recorder)
+    client.generate('hello', 8)
+    token = client.token_manager.get_token()
+    recorder.close()
+
+    text = open(path, encoding='utf-8').read()
+    assert 'test-key' not in text and token not in text
+    iam, chat = load_exchanges(path)
+    assert iam['form']['apikey'] == REDACTED
+    assert iam['body']['json']['access_token'] == REDACTED
+    assert chat['request_headers']['Authorization'] == REDACTED
+    assert chat['status'] == 200 and chat['json']['messages'][-1]['content'] == 'hello'
+
+
+def test_replay_matches_by_fingerprint_then_by_path(stub, tmp_path):
+    server, base = stub(completion_text='recorded answer')
+    path = str(tmp_path / 'traffic.jsonl.gz')
+    recorder = RecordingTransport(path)
+    make_client(base, recorder).generate('hello', 8)
+    recorder.close()
+
+    replay = ReplayTransport(path, latency_scale=0)
+    client = make_client(base, replay)
+    assert extract_text_from_response(client.generate('hello', 8)) == 'recorded answer'
+    assert replay.replay_stats() == {'exact': 2, 'by_path': 0, 'missing': 0}
+    # A different prompt has no exact recording; the chat endpoint's exchange is served instead
+    assert extract_text_from_response(client.generate('something else', 8)) == 'recorded answer'
+    assert replay.replay_stats() == {'exact': 2, 'by_path': 1, 'missing': 0}
+    with pytest.raises(requests.ConnectionError):
+        replay.request('GET', base + '/unrecorded')
+    assert replay.replay_stats()['missing'] == 1
+    assert server.state.counts['chat'] == 1
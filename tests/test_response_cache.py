@@ -0,0 +1,95 @@
+import io
+import json
+
+import requests
+
+from response_cache import ResponseCache, is_deterministic, payload_key
+from watsonx_client import WatsonXClient, build_chat_payload
+
+
+class Transport:
+    """Answers every POST with the same completion, counting requests."""
+
+    def __init__(self):
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': '4'}}]}).encode()
+        resp.raw = io.BytesIO()
+        return resp
+
+    @staticmethod
+    def last_connect_time():
+        return 0.0
+
+
+def test_payload_key_ignores_key_order():
+    a = {'model_id': 'm', 'messages': [{'role': 'user', 'content': 'hi'}], 'temperature': 0}
+    b = {'temperature': 0, 'messages': [{'role': 'user', 'content': 'hi'}], 'model_id': 'm'}
+    assert payload_key(a) == payload_key(b)
+
+
+def test_payload_key_depends_on_prompt_and_parameters():
+    base = build_chat_payload('m', 'p', 'What is 2+2?', 50, temperature=0)
+    assert payload_key(base) != payload_key(build_chat_payload('m', 'p', 'What is 2*2?', 50, temperature=0))
+    assert payload_key(base) != payload_key(build_chat_payload('m', 'p', 'What is 2+2?', 51, temperature=0))
+    assert payload_key(base) != payload_key(build_chat_payload('other', 'p', 'What is 2+2?', 50, temperature=0))
+
+
+def test_only_greedy_payloads_are_deterministic():
+    assert is_deterministic({'temperature': 0})
+    assert not is_deterministic({'temperature': 0.7})
+
+
+def test_memory_tier_hits_misses_and_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    assert cache.get('a') is None
+    cache.put('a', {'v': 1})
+    cache.put('b', {'v': 2})
+    assert cache.get('a') == {'v': 1}
+    cache.put('c', {'v': 3})  # evicts b, the least recently used
+    assert cache.get('b') is None
+    assert cache.get('c') == {'v': 3}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 1)
+
+
+def test_returned_responses_are_copies():
+    cache = ResponseCache()
+    cache.put('a', {'v': [1]})
+    cache.get('a')['v'].append(2)
+    assert cache.get('a') == {'v': [1]}
+
+
+def test_disk_tier_survives_a_new_cache_instance(tmp_path):
+    path = str(tmp_path / 'responses.db')
+    first = ResponseCache(disk_path=path)
+    first.put('a', {'v': 1})
+    first.close()
+    second = ResponseCache(disk_path=path)
+    assert second.get('a') == {'v': 1}
+    assert second.stats()['disk_hits'] == 1
+    second.close()
+
+
+def test_ttl_expires_entries():
+    cache = ResponseCache(ttl=-1)
+    cache.put('a', {'v': 1})
+    assert cache.get('a') is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_client_serves_repeated_greedy_requests_from_cache():
+    transport = Transport()
+    client = WatsonXClient('http://127.0.0.1:1', 'test-key', 'test-project', 'test-model',
+                           use_api_key_direct=True, transport=transport, cache=ResponseCache())
+    first = client.generate('What is 2+2?', 16, temperature=0)
+    second = client.generate('What is 2+2?', 16, temperature=0)
+    assert first == second
+    assert transport.posts == 1
+    # Sampled requests bypass the cache
+    client.generate('What is 2+2?', 16, temperature=0.7)
+    assert transport.posts == 2
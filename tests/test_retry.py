@@ -0,0 +1,120 @@
+import io
+import time
+
+import pytest
+import requests
+
+from retry import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retries
+
+
+def response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    resp._content = b'{}'
+    resp.raw = io.BytesIO()
+    return resp
+
+
+class Sender:
+    """Returns (or raises) the given outcomes in order, counting calls."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return response(outcome)
+
+
+def fast_policy(**kwargs):
+    return RetryPolicy(backoff_base=0.001, backoff_max=0.001, **kwargs)
+
+
+def test_retries_5xx_until_success():
+    send = Sender(500, 503, 200)
+    assert call_with_retries(send, fast_policy()).status_code == 200
+    assert send.calls == 3
+
+
+def test_returns_last_error_status_when_attempts_run_out():
+    send = Sender(500, 500, 500)
+    assert call_with_retries(send, fast_policy(max_attempts=3)).status_code == 500
+    assert send.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    send = Sender(400)
+    assert call_with_retries(send, fast_policy()).status_code == 400
+    assert send.calls == 1
+
+
+def test_connection_errors_are_retried_then_reraised():
+    send = Sender(requests.ConnectionError('down'), requests.ConnectionError('down'))
+    with pytest.raises(requests.ConnectionError):
+        call_with_retries(send, fast_policy(max_attempts=2))
+    assert send.calls == 2
+
+
+def test_retry_after_sets_the_minimum_backoff():
+    assert fast_policy().backoff(1, retry_after=0.3) >= 0.3
+
+
+def test_retry_budget_limits_retries():
+    policy = fast_policy(budget_min=1.0)
+    call_with_retries(Sender(500, 500, 500), policy)
+    assert policy.stats()['retries'] == 1
+    assert policy.stats()['budget_rejections'] == 1
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    call_with_retries(Sender(500), None, breaker)
+    call_with_retries(Sender(500), None, breaker)
+    send = Sender(200)
+    with pytest.raises(CircuitOpenError):
+        call_with_retries(send, None, breaker)
+    assert send.calls == 0
+    time.sleep(0.06)
+    assert call_with_retries(send, None, breaker).status_code == 200
+    assert breaker.stats()['state'] == CircuitBreaker.CLOSED
+
+
+def test_non_idempotent_calls_only_retry_failures_before_processing():
+    send = Sender(requests.ReadTimeout('slow'))
+    with pytest.raises(requests.ReadTimeout):
+        call_with_retries(send, fast_policy(), idempotent=False)
+    assert send.calls == 1
+    send = Sender(requests.ConnectTimeout('no route'), 429, 503, 500)
+    assert call_with_retries(send, fast_policy(max_attempts=5), idempotent=False).status_code == 500
+    assert send.calls == 4
+
+
+def test_generate_does_not_retry_server_errors(stub, make_client):
+    server, base = stub(error_rate=1.0)
+    client = make_client(base, retry_policy=fast_policy(max_attempts=3))
+    with pytest.raises(requests.HTTPError):
+        client.generate('hi', 8)
+    assert server.state.counts['500'] == 1
+
+
+def test_generate_does_not_retry_a_read_timeout(stub, make_client):
+    server, base = stub(latency='fixed:0.5')
+    client = make_client(base, retry_policy=fast_policy(max_attempts=3), timeout=0.1)
+    client.warm_up()
+    with pytest.raises(requests.ReadTimeout):
+        client.generate('hi', 8)
+    time.sleep(0.5)
+    assert server.state.counts['chat'] == 1
+
+
+def test_generate_retries_throttling(stub, make_client):
+    server, base = stub(rate_429=1.0, retry_after=0)
+    client = make_client(base, retry_policy=fast_policy(max_attempts=3))
+    with pytest.raises(requests.HTTPError):
+        client.generate('hi', 8)
+    assert server.state.counts['429'] == 3
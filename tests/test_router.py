@@ -0,0 +1,85 @@
+import pytest
+
+from router import RouterClient
+
+
+@pytest.fixture
+def make_router():
+    """Factory for a `RouterClient` that never explores, so routing is deterministic."""
+    routers = []
+
+    def make(clients, **kwargs):
+        kwargs.setdefault('explore', 0.0)
+        router = RouterClient(clients, **kwargs)
+        routers.append(router)
+        return router
+
+    yield make
+    for router in routers:
+        router.close()
+
+
+def test_slow_primary_is_hedged_to_the_fast_endpoint(stub, make_client, make_router):
+    slow_server, slow = stub(latency='fixed:1.0')
+    fast_server, fast = stub(latency='fixed:0.01')
+    # Neither endpoint has samples yet, so the first one listed is the primary
+    router = make_router([make_client(slow), make_client(fast)], hedge=True, hedge_delay=0.05,
+                         max_hedge_ratio=1.0)
+    router.generate('hello', 8, deadline=5)
+    stats = router.stats()
+    assert (stats['requests'], stats['hedges'], stats['hedge_wins'], stats['failovers']) == (1, 1, 1, 0)
+    slow_stats, fast_stats = stats['endpoints'].values()
+    assert (slow_stats['requests'], slow_stats['hedges'], slow_stats['hedge_wins']) == (1, 0, 0)
+    assert (fast_stats['requests'], fast_stats['hedges'], fast_stats['hedge_wins']) == (1, 1, 1)
+    assert slow_server.state.counts['chat'] == fast_server.state.counts['chat'] == 1
+
+
+def test_hedges_are_capped_by_the_ratio(stub, make_client, make_router):
+    _, slow = stub(latency='fixed:0.2')
+    _, fast = stub(latency='fixed:0.2')
+    router = make_router([make_client(slow), make_client(fast)], hedge=True, hedge_delay=0.02,
+                         max_hedge_ratio=0.5)
+    for i in range(4):
+        router.generate(f'prompt {i}', 8)
+    stats = router.stats()
+    assert stats['requests'] == 4 and stats['hedges'] == 2
+
+
+@pytest.mark.parametrize('hedge', [False, True])
+def test_failing_endpoint_fails_over_and_is_then_avoided(stub, make_client, make_router, hedge):
+    broken_server, broken = stub(error_rate=1.0)
+    healthy_server, healthy = stub(latency='fixed:0.02')
+    router = make_router([make_client(broken), make_client(healthy)], hedge=hedge)
+    router.generate('hello', 8)
+    stats = router.stats()
+    assert stats['failovers'] == 1
+    broken_stats, healthy_stats = stats['endpoints'].values()
+    assert broken_stats['errors'] == 1 and healthy_stats['errors'] == 0
+    # The error penalty now ranks the healthy endpoint first
+    router.generate('again', 8)
+    assert router.stats()['failovers'] == 1
+    assert broken_server.state.counts['500'] == 1
+    assert healthy_server.state.counts['chat'] == 2
+
+
+def test_streams_sample_only_the_time_to_the_first_chunk(stub, make_client, make_router):
+    _, base = stub(latency='fixed:0.02', token_delay=0.05, completion_tokens=10)
+    router = make_router([make_client(base)], hedge=True, min_samples=1)
+    assert ''.join(delta.content for delta in router.stream_generate('hello', 16)).split()[0] == 'tok0'
+    [endpoint] = router.endpoints
+    # The whole stream took about half a second; only its first chunk counts
+    assert endpoint.latency_ewma < 0.25
+    # Streams stay out of the window that sets the hedge delay of generate()
+    assert endpoint.percentile(0.95, 1) is None
+    assert endpoint.in_flight == 0
+
+
+def test_abandoned_stream_samples_its_first_chunk_only(stub, make_client, make_router):
+    _, base = stub(latency='fixed:0.02', token_delay=0.05, completion_tokens=10)
+    router = make_router([make_client(base)])
+    stream = router.stream_generate('hello', 16)
+    next(stream)
+    stream.close()
+    [endpoint] = router.endpoints
+    assert endpoint.latency_ewma is not None and endpoint.latency_ewma < 0.25
+    assert endpoint.in_flight == 0 and endpoint.stats()['errors'] == 0
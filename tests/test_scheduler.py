@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+from scheduler import Lane, LaneScheduler
+
+
+def wait_until(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, 'timed out'
+        time.sleep(0.005)
+
+
+def test_weighted_fair_queuing_grants_slots_by_weight():
+    scheduler = LaneScheduler(max_concurrency=1, lanes=[Lane('a', weight=3), Lane('b', weight=1)], default_lane='a')
+    holder = scheduler.acquire('a')
+    order = []
+    threads = []
+    for lane in ['a'] * 6 + ['b'] * 6:
+        def work(lane=lane):
+            ticket = scheduler.acquire(lane)
+            order.append(lane)
+            scheduler.release(ticket)
+        queued = scheduler.stats()['lanes'][lane]['queued']
+        thread = threading.Thread(target=work)
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.stats()['lanes'][lane]['queued'] == queued + 1)
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join(2.0)
+    assert len(order) == 12
+    assert order[:8].count('a') >= 5
+
+
+def test_lane_max_share_leaves_room_for_other_lanes():
+    scheduler = LaneScheduler(max_concurrency=4)
+    bulk = [scheduler.acquire('bulk') for _ in range(3)]
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire('bulk', deadline=Deadline(0.05))
+    interactive = scheduler.acquire('interactive', deadline=Deadline(0.05))
+    for ticket in bulk + [interactive]:
+        scheduler.release(ticket)
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_tenant_limit_caps_in_flight_calls():
+    scheduler = LaneScheduler(max_concurrency=8, tenant_limits={'alice': 1})
+    first = scheduler.acquire(tenant='alice')
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(tenant='alice', deadline=Deadline(0.05))
+    other = scheduler.acquire(tenant='bob', deadline=Deadline(0.05))
+    scheduler.release(first)
+    scheduler.release(scheduler.acquire(tenant='alice', deadline=Deadline(0.05)))
+    scheduler.release(other)
+    assert scheduler.stats()['lanes']['default']['timed_out'] == 1
+
+
+def test_unknown_lane_is_rejected():
+    with pytest.raises(ValueError):
+        LaneScheduler().acquire('nope')
+
+
+def test_stream_holds_its_lane_slot_until_closed(stub, make_client):
+    server, base = stub(token_delay=0.02, completion_tokens=20, require_auth=False)
+    scheduler = LaneScheduler(max_concurrency=4)
+    client = make_client(base, scheduler=scheduler, lane='bulk')
+    stream = client.stream_generate('hi', 32)
+    next(stream)
+    assert scheduler.stats()['lanes']['bulk']['in_flight'] == 1
+    stream.close()
+    assert scheduler.stats()['lanes']['bulk']['in_flight'] == 0
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+import requests
+
+from streaming import iter_chat_deltas, iter_sse_events
+
+
+def response(body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.raw = io.BytesIO(body)
+    return resp
+
+
+def chunk(content, finish_reason=None, usage=None):
+    data = {'choices': [{'index': 0, 'delta': {'content': content}, 'finish_reason': finish_reason}]}
+    if usage is not None:
+        data['usage'] = usage
+    return json.dumps(data)
+
+
+def test_multi_line_data_is_joined_and_comments_are_skipped():
+    lines = [b': keep-alive', b'id: 1', b'event: message', b'data: {"a":', b'data:  1}', b'',
+             b':another comment', b'data: second\r', b'']
+    assert list(iter_sse_events(lines)) == [('message', '{"a":\n 1}'), ('message', 'second')]
+
+
+def test_event_type_resets_after_each_event():
+    lines = ['event: progress', 'data: x', '', 'data: y', '']
+    assert list(iter_sse_events(lines)) == [('progress', 'x'), ('message', 'y')]
+
+
+def test_a_final_event_without_a_blank_line_is_still_yielded():
+    assert list(iter_sse_events([b'data: last'])) == [('message', 'last')]
+
+
+def test_chat_deltas_stop_at_done():
+    body = (f'data: {chunk("Hel")}\n\n: ping\n\ndata: {chunk("lo", "stop", {"total_tokens": 3})}\n\n'
+            f'data: [DONE]\n\ndata: {chunk("never")}\n\n').encode()
+    deltas = list(iter_chat_deltas(response(body)))
+    assert [d.content for d in deltas] == ['Hel', 'lo']
+    assert deltas[-1].finish_reason == 'stop' and deltas[-1].usage == {'total_tokens': 3}
+
+
+def test_error_event_raises():
+    body = f'data: {chunk("partial")}\n\nevent: error\ndata: {{"errors": [{{"code": "overloaded"}}]}}\n\n'.encode()
+    deltas = iter_chat_deltas(response(body))
+    assert next(deltas).content == 'partial'
+    with pytest.raises(RuntimeError, match='overloaded'):
+        next(deltas)
@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+from streaming import ChatDelta
+from structured import (IncrementalJSONParser, StopMatcher, StructuredOutputError, iter_structured,
+                        parse_structured)
+
+SENTIMENT = {'type': 'object', 'required': ['sentiment'], 'additionalProperties': False,
+             'properties': {'sentiment': {'enum': ['positive', 'negative', 'neutral']},
+                            'summary': {'type': 'string', 'maxLength': 10},
+                            'topics': {'type': 'array', 'items': {'type': 'string'}, 'maxItems': 2}}}
+
+
+class Deltas:
+    """A `stream_generate` stand-in that records how far it was read and whether it was closed."""
+
+    def __init__(self, *pieces):
+        self.pieces = list(pieces)
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed or self.read == len(self.pieces):
+            raise StopIteration
+        self.read += 1
+        return ChatDelta(self.pieces[self.read - 1], None, None, {})
+
+    def close(self):
+        self.closed = True
+
+
+def collect(deltas, schema=SENTIMENT, **kwargs):
+    return list(iter_structured(deltas, schema, **kwargs))
+
+
+def test_keys_strings_and_escapes_split_across_deltas():
+    deltas = Deltas('{"senti', 'ment": "neg', 'ative", "summary": "caf\\', 'u00', 'e9 \\"ok', '\\""}')
+    fields = collect(deltas)
+    assert fields[0] == (('sentiment',), 'negative')
+    assert fields[1] == (('summary',), 'café "ok"')
+    assert fields[-1] == ((), {'sentiment': 'negative', 'summary': 'café "ok"'})
+    assert deltas.closed
+
+
+def test_escaped_characters_count_once_towards_max_length():
+    # Ten decoded characters, one of them written as a \\u escape split over two deltas
+    assert parse_structured('{"sentiment": "neutral", "summary": "123456789\\u00e9"}', SENTIMENT)
+    parser = IncrementalJSONParser(SENTIMENT)
+    parser.feed('{"sentiment": "neutral", "summary": "123456789\\u00')
+    with pytest.raises(StructuredOutputError, match='longer than 10'):
+        parser.feed('e9x')
+
+
+def test_enum_prefix_miss_aborts_before_the_string_closes():
+    deltas = Deltas('{"sentiment": "an', 'gry", ', '"summary": "never read"}')
+    with pytest.raises(StructuredOutputError, match=r'\$\.sentiment') as info:
+        collect(deltas)
+    assert info.value.path == ('sentiment',)
+    assert deltas.read == 1 and deltas.closed
+
+
+def test_max_length_and_max_items_fail_as_soon_as_exceeded():
+    deltas = Deltas('{"sentiment": "positive", "summary": "0123456789', 'X', '"}')
+    with pytest.raises(StructuredOutputError, match='longer than 10'):
+        collect(deltas)
+    assert deltas.read == 2
+    deltas = Deltas('{"sentiment": "positive", "topics": ["a", "b", ', '"c"', ']}')
+    with pytest.raises(StructuredOutputError, match='more than 2 items') as info:
+        collect(deltas)
+    assert info.value.path == ('topics',)
+    assert deltas.read == 2
+
+
+def test_additional_properties_false_rejects_unknown_keys():
+    deltas = Deltas('{"sentiment": "positive", "mood": ', '"fine"}')
+    with pytest.raises(StructuredOutputError, match="unexpected key 'mood'"):
+        collect(deltas)
+    assert deltas.read == 1 and deltas.closed
+    # Without the restriction the key is accepted
+    assert parse_structured('{"mood": "fine"}', {'type': 'object'}) == {'mood': 'fine'}
+
+
+def test_preamble_and_code_fence_before_the_object_are_skipped():
+    fields = collect(Deltas('Sure, here it is:\n```', 'json\n{"sentiment": ', '"neutral"}\n```'))
+    assert fields[-1] == ((), {'sentiment': 'neutral'})
+    with pytest.raises(StructuredOutputError, match='no JSON document'):
+        collect(Deltas('x' * 30, 'y' * 30), max_preamble=40)
+
+
+def test_stop_sequence_spanning_two_deltas_ends_the_output():
+    deltas = Deltas('{"sentiment": "positive"}<', '/s', '>', 'more')
+    # The object closes first, so the stop sequence is never needed
+    assert collect(deltas, stop=['</s>'])[-1] == ((), {'sentiment': 'positive'})
+    deltas = Deltas('{"sentiment": "positive", "topics": ["a"<', '/s>', ']}')
+    with pytest.raises(StructuredOutputError, match='ended before'):
+        collect(deltas, stop=['</s>'])
+    assert deltas.read == 2 and deltas.closed
+
+
+def test_stop_matcher_holds_back_only_a_possible_prefix():
+    matcher = StopMatcher(['</s>'])
+    assert matcher.feed('ab<') == ('ab', False)
+    assert matcher.feed('x') == ('<x', False)
+    assert matcher.feed('cd</') == ('cd', False)
+    assert matcher.feed('s>tail') == ('', True)
+
+
+def test_trailing_text_after_the_object_is_not_read():
+    deltas = Deltas('{"sentiment": "negative"} ', 'Let me know', ' if you need more.')
+    fields = collect(deltas)
+    assert fields[-1] == ((), {'sentiment': 'negative'})
+    assert deltas.read == 1 and deltas.closed
+    parser = IncrementalJSONParser(SENTIMENT)
+    parser.feed('{"sentiment": "negative"} and more')
+    assert parser.done and parser.trailing == ' and more'
+
+
+def test_output_ending_early_raises_and_closes_the_stream():
+    deltas = Deltas('{"sentiment": "negative"')
+    with pytest.raises(StructuredOutputError, match='ended before'):
+        collect(deltas)
+    assert deltas.closed
+
+
+def test_stream_structured_yields_fields_and_the_document(stub, make_client):
+    server, base = stub(completion_text='```json {"sentiment": "neutral", "topics": ["a", "b"]} ``` Hope this helps!')
+    client = make_client(base)
+    fields = list(client.stream_structured('classify', SENTIMENT))
+    assert fields[0] == (('sentiment',), 'neutral')
+    assert fields[-1] == ((), {'sentiment': 'neutral', 'topics': ['a', 'b']})
+    assert client.generate_structured('classify', SENTIMENT) == {'sentiment': 'neutral', 'topics': ['a', 'b']}
+
+
+def test_invalid_output_closes_the_response_stream(stub, make_client):
+    filler = ' '.join(['word'] * 200)
+    server, base = stub(completion_text=f'{{"sentiment": "angry", "summary": "{filler}"}}', token_delay=0.01)
+    client = make_client(base)
+    with pytest.raises(StructuredOutputError, match='not one of'):
+        list(client.stream_structured('classify', SENTIMENT))
+    # The stand-in notices the dropped connection on its next write
+    stop = time.monotonic() + 2
+    while server.state.counts['stream_aborted'] == 0 and time.monotonic() < stop:
+        time.sleep(0.01)
+    assert server.state.counts['stream_aborted'] == 1
+    assert server.state.counts['stream_tokens'] < 50
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+CHAT = '/ml/v1/text/chat?version=2023-05-29'
+
+
+def get_token(base):
+    resp = requests.post(base + '/identity/token', data={'apikey': 'test-key'}, timeout=5)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def chat(base, token, **kwargs):
+    return requests.post(base + CHAT, json={'messages': [{'role': 'user', 'content': 'hi'}]},
+                         headers={'Authorization': f'Bearer {token}'}, timeout=5, **kwargs)
+
+
+def test_iam_tokens_expire_after_their_ttl(stub):
+    server, base = stub(token_ttl=1)
+    issued = get_token(base)
+    assert issued['expires_in'] == 1
+    assert isinstance(issued['expiration'], int) and issued['expiration'] <= time.time() + 1
+    assert chat(base, issued['access_token']).status_code == 200
+    time.sleep(1.1)
+    resp = chat(base, issued['access_token'])
+    assert resp.status_code == 401
+    assert resp.json()['errors'][0]['code'] == 'authentication_token_expired'
+    assert chat(base, 'not-a-token').status_code == 401
+    assert server.state.counts['401'] == 2 and server.state.counts['iam'] == 1
+
+
+def test_iam_rejects_a_missing_api_key(stub):
+    _, base = stub()
+    assert requests.post(base + '/identity/token', data={}, timeout=5).status_code == 400
+
+
+def test_429_mode_sends_retry_after(stub):
+    server, base = stub(rate_429=1.0, retry_after=2.5, require_auth=False)
+    resp = chat(base, 'any')
+    assert resp.status_code == 429 and resp.headers['Retry-After'] == '2.5'
+    assert server.state.counts['429'] == 1 and server.state.counts['chat'] == 1
+
+
+def test_requests_above_max_concurrency_get_429(stub):
+    server, base = stub(latency='fixed:0.3', max_concurrency=1, require_auth=False)
+    with ThreadPoolExecutor(2) as pool:
+        statuses = sorted(pool.map(lambda _: chat(base, 'any').status_code, range(2)))
+    assert statuses == [200, 429]
+    assert server.state.counts['429'] == 1
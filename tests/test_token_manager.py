@@ -0,0 +1,90 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from token_manager import IAMTokenManager
+from transport import PooledTransport
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    """Factory for an `IAMTokenManager` talking to a stand-in at `base`, caching tokens under `tmp_path`."""
+    managers = []
+
+    def make(base, **kwargs):
+        kwargs.setdefault('background_refresh', False)
+        manager = IAMTokenManager('test-key', iam_url=base + '/identity/token', transport=PooledTransport(),
+                                  cache_dir=str(tmp_path), **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+        manager.transport.close()
+
+
+def test_token_is_refreshed_before_it_expires(stub, make_manager):
+    server, base = stub(token_ttl=2)
+    manager = make_manager(base, disk_cache=False)
+    first = manager.get_token()
+    assert manager.get_token() == first
+    expires_at = manager.expires_at
+    time.sleep(max(manager.refresh_at - time.time(), 0) + 0.05)
+    assert time.time() < expires_at
+    second = manager.get_token()
+    assert second != first
+    assert server.state.counts['iam'] == 2
+
+
+def test_concurrent_callers_share_one_iam_request(stub, make_manager):
+    server, base = stub(iam_latency='fixed:0.2')
+    manager = make_manager(base, disk_cache=False)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(tokens) == 8 and len(set(tokens)) == 1
+    assert server.state.counts['iam'] == 1
+
+
+def test_invalidating_a_replaced_token_is_a_no_op(stub, make_manager):
+    server, base = stub()
+    manager = make_manager(base)
+    stale = manager.get_token()
+    manager.invalidate(stale)
+    current = manager.get_token()
+    assert current != stale
+    # A late 401 for the old token must not throw away the new one
+    manager.invalidate(stale)
+    assert manager.get_token() == current
+    assert server.state.counts['iam'] == 2
+
+
+def test_second_instance_reuses_the_disk_cache(stub, make_manager, tmp_path):
+    server, base = stub()
+    token = make_manager(base).get_token()
+    other = make_manager(base)
+    assert other.get_token() == token
+    assert server.state.counts['iam'] == 1
+    [cache_file] = tmp_path.glob('iam-*.json')
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+    assert 'test-key' not in cache_file.read_text()
+
+
+def test_background_timer_refreshes_the_token(stub, make_manager):
+    server, base = stub(token_ttl=2)
+    manager = make_manager(base, disk_cache=False, background_refresh=True)
+    first = manager.get_token()
+    stop = time.monotonic() + 3
+    while manager.refresh_count < 2 and time.monotonic() < stop:
+        time.sleep(0.02)
+    assert manager.refresh_count == 2
+    # Callers get the new token without another IAM round trip
+    assert manager.get_token() != first
+    assert server.state.counts['iam'] == 2
@@ -0,0 +1,19 @@
+from transport import get_default_transport
+from watson_connect import WatsonXConnector
+from watsonx_client import WatsonXClient
+
+
+def test_sequential_calls_reuse_one_connection(stub, make_client):
+    server, base = stub(require_auth=False)
+    client = make_client(base, use_api_key_direct=True)
+    n = 5
+    for i in range(n):
+        client.generate(f'prompt {i}', 8)
+    assert client.transport.stats_snapshot() == {'requests': n, 'connections_opened': 1, 'connections_reused': n - 1}
+
+
+def test_clients_without_a_transport_share_the_default_one():
+    connector = WatsonXConnector('http://127.0.0.1:1', 'test-key', 'test-project', 'test-model')
+    client = WatsonXClient('http://127.0.0.1:1', 'test-key', 'test-project', 'test-model')
+    assert connector.transport is client.transport is get_default_transport()
+    assert client.token_manager.transport is client.transport
@@ -0,0 +1,46 @@
+from warmup import WarmupReport, WarmupStep
+
+
+def test_warm_up_reports_each_step_against_the_stub(stub, make_client):
+    server, base = stub()
+    client = make_client(base)
+    report = client.warm_up(validate=True)
+    assert report.ready
+    assert [step.name for step in report.steps] == ['iam', 'connect', 'validate']
+    assert all(step.ok and step.seconds is not None and step.error is None for step in report.steps)
+    assert report.summary().startswith('ready in ')
+    # Validation shares the token exchange with the iam step
+    assert server.state.counts['iam'] == 1 and server.state.counts['chat'] == 1
+
+
+def test_warmed_up_connections_are_reused(stub, make_client):
+    _, base = stub()
+    client = make_client(base)
+    assert client.warm_up().ready
+    opened = client.transport.stats_snapshot()['connections_opened']
+    client.generate('hello', 8)
+    assert client.transport.stats_snapshot()['connections_opened'] == opened
+
+
+def test_unreachable_host_is_not_ready(make_client):
+    client = make_client('http://127.0.0.1:1')
+    report = client.warm_up()
+    assert not report.ready
+    assert report.step('connect').error == 'ConnectionError: could not connect to http://127.0.0.1:1'
+    assert report.as_dict()['steps']['connect']['ok'] is False
+    assert 'not ready' in report.summary() and 'connect failed' in report.summary()
+
+
+def test_steps_still_running_at_the_timeout_are_reported_as_failed(stub, make_client):
+    _, base = stub(iam_latency='fixed:1.0')
+    client = make_client(base)
+    report = client.warm_up(timeout=0.2)
+    assert report.elapsed < 1.0
+    iam = report.step('iam')
+    assert (iam.ok, iam.seconds, iam.error) == (False, None, 'timed out after 0.2s')
+    assert report.step('connect').ok and not report.ready
+
+
+def test_summary_lists_steps_in_order():
+    report = WarmupReport([WarmupStep('iam', True, 0.38), WarmupStep('connect', False, 0.1, 'boom')], 0.41)
+    assert report.summary() == 'not ready in 0.41s (iam 0.38s, connect failed: boom)'
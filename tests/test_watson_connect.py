@@ -0,0 +1,93 @@
+import io
+
+import requests
+
+from conversation import Conversation
+from instrumentation import Instrumentation
+from near_cache import NearDuplicateCache
+from scheduler import LaneScheduler
+from transport import PooledTransport
+from watson_connect import WatsonXConnector
+
+
+class Tokens:
+    """Token manager stand-in handing out numbered tokens and recording invalidations."""
+
+    def __init__(self):
+        self.issued = 0
+        self.refresh_count = 0
+        self.invalidated = []
+
+    def get_token(self, timeout=None):
+        self.issued += 1
+        return f'token-{self.issued}'
+
+    def invalidate(self, token=None):
+        self.invalidated.append(token)
+
+
+class Transport:
+    """Answers 401 first; meanwhile another request on the connector has moved on to a newer token."""
+
+    def __init__(self, connector):
+        self.connector = connector
+        self.statuses = [401, 200]
+
+    def post(self, url, headers=None, **kwargs):
+        self.connector.access_token = 'token-from-another-thread'
+        resp = requests.Response()
+        resp.status_code = self.statuses.pop(0)
+        resp._content = b'{"choices": [{"message": {"content": "ok"}}]}'
+        resp.raw = io.BytesIO()
+        return resp
+
+    @staticmethod
+    def last_connect_time():
+        return 0.0
+
+
+def test_401_invalidates_the_token_the_request_used():
+    tokens = Tokens()
+    connector = WatsonXConnector('http://127.0.0.1:1', 'test-key', 'test-project', 'test-model',
+                                 token_manager=tokens)
+    connector.transport = Transport(connector)
+    assert connector.chat('hi', 8) == 'ok'
+    assert tokens.invalidated == ['token-1']
+
+
+def test_stream_holds_its_lane_slot_until_closed(stub):
+    server, base = stub(token_delay=0.02, completion_tokens=20, require_auth=False)
+    scheduler = LaneScheduler(max_concurrency=4)
+    connector = WatsonXConnector(base, 'test-key', 'test-project', 'test-model', transport=PooledTransport(),
+                                 token_manager=Tokens(), scheduler=scheduler, lane='bulk')
+    stream = connector.stream_chat('hi', 32)
+    next(stream)
+    assert scheduler.stats()['lanes']['bulk']['in_flight'] == 1
+    stream.close()
+    assert scheduler.stats()['lanes']['bulk']['in_flight'] == 0
+
+
+def test_connector_settings_apply_to_its_requests(stub):
+    server, base = stub(accept_gzip=True, require_auth=False)
+    connector = WatsonXConnector(base, 'test-key', 'test-project', 'test-model', transport=PooledTransport(),
+                                 token_manager=Tokens())
+    connector.gzip_threshold = 1
+    assert connector.chat('hi', 8)
+    assert server.state.counts['gzip_requests'] == 1
+
+
+def test_chat_and_stream_chat_share_the_client_request_path(stub):
+    server, base = stub(completion_text='Paris is the capital', require_auth=False)
+    records = []
+    connector = WatsonXConnector(base, 'test-key', 'test-project', 'test-model', transport=PooledTransport(),
+                                 token_manager=Tokens(), instrumentation=Instrumentation(records.append),
+                                 near_cache=NearDuplicateCache())
+    assert connector.chat('What is the capital of France?', 8, temperature=0) == 'Paris is the capital'
+    assert connector.chat('what is the capital of france', 8, temperature=0) == 'Paris is the capital'
+    assert server.state.counts['chat'] == 1
+    conversation = Conversation()
+    text = ''.join(d.content for d in connector.stream_chat('And of Spain?', 8, conversation=conversation))
+    assert text == 'Paris is the capital'
+    assert conversation.messages[-1] == {'role': 'assistant', 'content': text}
+    assert server.state.counts['stream'] == 1
+    assert [r.operation for r in records] == ['chat', 'chat', 'stream_chat']
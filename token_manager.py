@@ -0,0 +1,270 @@
+"""Expiry-aware IBM Cloud IAM token manager.
+
+`IAMTokenManager` exchanges an API key for an access token, tracks when it
+expires and refreshes it in the background shortly before that happens.
+Concurrent callers share a single refresh, and tokens are shared between
+processes through a small on-disk cache guarded by a file lock, so
+short-lived workers started with the same key reuse one IAM exchange.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from deadline import DeadlineExceeded
+from transport import PooledTransport, get_default_transport
+
+try:
+    import fcntl
+except ImportError:  # Windows: the cache still works, just without the cross-process lock
+    fcntl = None
+
+IAM_URL = 'https://iam.cloud.ibm.com/identity/token'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'watsonx')
+
+logger = logging.getLogger(__name__)
+
+
+class IAMTokenManager:
+    """Hands out valid IAM access tokens and refreshes them before they expire."""
+
+    def __init__(self, api_key: str, iam_url: str = IAM_URL, transport: Optional[PooledTransport] = None,
+                 refresh_margin: float = 300, background_refresh: bool = True,
+                 disk_cache: bool = True, cache_dir: Optional[str] = None, timeout: float = 10):
+        """Create a token manager.
+
+        Args:
+            api_key: IBM API key to exchange
+            iam_url: IAM token endpoint
+            transport: Pooled HTTP transport (defaults to the shared process-wide one)
+            refresh_margin: Seconds before expiry at which a token is considered stale
+            background_refresh: Refresh proactively on a timer instead of on the next call
+            disk_cache: Share tokens between processes through a cache file
+            cache_dir: Directory for the cache file (default ~/.cache/watsonx)
+            timeout: Timeout in seconds for the IAM request
+        """
+        self.api_key = api_key
+        self.iam_url = iam_url
+        self.transport = transport or get_default_transport()
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.timeout = timeout
+
+        self.access_token: Optional[str] = None
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+        self.refresh_count = 0
+
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._cache_path = None
+        if disk_cache:
+            # Never store the key itself; the file name only identifies which key the token is for
+            digest = hashlib.sha256(f'{iam_url}\0{api_key}'.encode()).hexdigest()[:24]
+            self._cache_path = os.path.join(cache_dir or DEFAULT_CACHE_DIR, f'iam-{digest}.json')
+
+    def _is_fresh(self) -> bool:
+        return self.access_token is not None and time.time() < self.refresh_at
+
+    def get_token(self, timeout: Optional[float] = None) -> str:
+        """Return a valid access token, refreshing it first if it is stale.
+
+        Args:
+            timeout: Seconds the caller can wait for a refresh (None = `self.timeout`
+                for the IAM request, unbounded wait for another caller's refresh)
+        """
+        if self._is_fresh():
+            return self.access_token
+        return self.refresh(timeout=timeout)
+
+    def prefetch(self) -> None:
+        """Start obtaining a token on a background thread unless a fresh one is held."""
+        if not self._is_fresh():
+            threading.Thread(target=self._prefetch, name='iam-prefetch', daemon=True).start()
+
+    def _prefetch(self) -> None:
+        try:
+            self.get_token()
+        except Exception as e:
+            # The first request will retry synchronously and surface the error
+            logger.warning('IAM token prefetch failed: %s', e)
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Mark a token as rejected (e.g. after a 401) so the next call refreshes.
+
+        Passing the rejected token makes this a no-op if another caller has
+        already replaced it, so a burst of 401s triggers only one refresh.
+        """
+        with self._lock:
+            if token is None or token == self.access_token:
+                self.access_token = None
+                self.expires_at = self.refresh_at = 0.0
+                if token is not None:
+                    with self._cache_file_lock():
+                        self._write_cache_locked(None, 0.0, only_if_token=token)
+
+    def refresh(self, force: bool = False, timeout: Optional[float] = None) -> str:
+        """Obtain a fresh token, sharing one IAM round trip among concurrent callers.
+
+        Raises `DeadlineExceeded` if `timeout` runs out while waiting for
+        another caller's refresh.
+        """
+        start = time.monotonic()
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise DeadlineExceeded('timed out waiting for the IAM token refresh')
+        try:
+            # Another thread may have refreshed while we waited for the lock
+            if not force and self._is_fresh():
+                return self.access_token
+            with self._cache_file_lock():
+                if not force and self._load_cache():
+                    logger.info('Using cached IBM IAM access token')
+                else:
+                    left = None if timeout is None else timeout - (time.monotonic() - start)
+                    if left is not None and left <= 0:
+                        raise DeadlineExceeded('no time left for the IAM token request')
+                    self._request_token(self.timeout if left is None else min(self.timeout, left))
+                    self._store_cache()
+            self._schedule_refresh()
+            return self.access_token
+        finally:
+            self._lock.release()
+
+    def _token_request(self):
+        """Return the (headers, form data) for an IAM API-key exchange."""
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json',
+        }
+        data = {
+            'grant_type': 'urn:ibm:params:oauth:grant-type:apikey',
+            'apikey': self.api_key,
+            'response_type': 'cloud_iam',
+        }
+        return headers, data
+
+    def _accept_token_response(self, token_response: dict) -> None:
+        access_token = token_response.get('access_token')
+        if not access_token:
+            raise RuntimeError('Failed to obtain access token from IBM IAM')
+
+        expires_in = token_response.get('expires_in', 0)
+        expiration = token_response.get('expiration')
+        now = time.time()
+        self.access_token = access_token
+        self.expires_at = float(expiration) if expiration else now + float(expires_in or 0)
+        # Short-lived tokens (e.g. from a test IAM stand-in) refresh halfway through their lifetime
+        self.refresh_at = self.expires_at - min(self.refresh_margin, max(self.expires_at - now, 0) / 2)
+        self.refresh_count += 1
+        logger.info('Access token obtained (expires in %ss)', expires_in)
+
+    def _request_token(self, timeout: Optional[float] = None) -> None:
+        headers, data = self._token_request()
+        logger.info('Requesting access token from IBM IAM...')
+        resp = self.transport.post(self.iam_url, headers=headers, data=data, timeout=timeout or self.timeout)
+        resp.raise_for_status()
+        self._accept_token_response(resp.json())
+
+    def _schedule_refresh(self) -> None:
+        if not self.background_refresh:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(self.refresh_at - time.time(), 1.0)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning('Background IAM token refresh failed: %s', e)
+            # Try again soon; callers still refresh synchronously once the token is stale
+            with self._lock:
+                if self.background_refresh:
+                    self._timer = threading.Timer(30.0, self._background_refresh)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def close(self) -> None:
+        """Stop the background refresh timer."""
+        with self._lock:
+            self.background_refresh = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    # -- on-disk cache -------------------------------------------------
+
+    def _cache_file_lock(self):
+        return _FileLock(self._cache_path + '.lock' if self._cache_path else None)
+
+    def _load_cache(self) -> bool:
+        if not self._cache_path:
+            return False
+        try:
+            with open(self._cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        token, expires_at = cached.get('access_token'), float(cached.get('expires_at', 0))
+        refresh_at = float(cached.get('refresh_at', expires_at - self.refresh_margin))
+        if not token or time.time() >= refresh_at:
+            return False
+        self.access_token, self.expires_at, self.refresh_at = token, expires_at, refresh_at
+        return True
+
+    def _store_cache(self) -> None:
+        self._write_cache_locked(self.access_token, self.expires_at, self.refresh_at)
+
+    def _write_cache_locked(self, token: Optional[str], expires_at: float, refresh_at: float = 0.0,
+                            only_if_token: Optional[str] = None) -> None:
+        if not self._cache_path:
+            return
+        try:
+            if only_if_token is not None:
+                # Only drop the shared entry if it still holds the rejected token
+                try:
+                    with open(self._cache_path, 'r', encoding='utf-8') as f:
+                        if json.load(f).get('access_token') != only_if_token:
+                            return
+                except (OSError, ValueError):
+                    return
+            directory = os.path.dirname(self._cache_path)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.iam-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'access_token': token, 'expires_at': expires_at, 'refresh_at': refresh_at}, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self._cache_path)
+        except OSError as e:
+            logger.warning('Could not write IAM token cache: %s', e)
+
+
+class _FileLock:
+    """Exclusive advisory lock on a file (no-op without fcntl or a path)."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if self.path and fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except OSError:
+                self._fd = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
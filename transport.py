@@ -0,0 +1,256 @@
+"""Shared pooled HTTP transport for WatsonX and IBM Cloud IAM calls.
+
+Both `WatsonXClient` and `WatsonXConnector` send their requests through a
+`PooledTransport` instead of the module-level `requests.post`, so TCP/TLS
+connections to the WatsonX host and to `iam.cloud.ibm.com` are kept alive
+and reused across calls and threads.
+"""
+import socket
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from deadline import Deadline
+
+
+class TransportStats:
+    """Thread-safe counters for requests sent and connections opened."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a consistent copy of the counters."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'connections_reused': max(self.requests - self.connections_opened, 0),
+            }
+
+
+# Per-thread seconds spent establishing connections during the current request
+_connect_timing = threading.local()
+# Per-thread holder that learns which pooled connection a deadline-bound request checked out
+_checkout = threading.local()
+
+
+def _timed_connect(conn):
+    connect = conn.connect
+
+    def timed():
+        start = time.perf_counter()
+        try:
+            connect()
+        finally:
+            _connect_timing.seconds = getattr(_connect_timing, 'seconds', 0.0) + time.perf_counter() - start
+
+    conn.connect = timed
+    return conn
+
+
+def _shutdown(connections) -> None:
+    for conn in connections:
+        sock = getattr(conn, 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _counting_pool(base: type, stats: TransportStats) -> type:
+    """Build a urllib3 pool class that counts and times every new connection."""
+
+    class _CountingPool(base):
+        def _new_conn(self):
+            stats.record_connection()
+            return _timed_connect(super()._new_conn())
+
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            holder = getattr(_checkout, 'holder', None)
+            if holder is not None:
+                holder.append(conn)
+            return conn
+
+    _CountingPool.__name__ = f'Counting{base.__name__}'
+    return _CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count the connections they open."""
+
+    def __init__(self, stats: TransportStats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self._stats),
+            'https': _counting_pool(HTTPSConnectionPool, self._stats),
+        }
+
+    def send(self, request, **kwargs):
+        self._stats.record_request()
+        return super().send(request, **kwargs)
+
+
+class PooledTransport:
+    """Keep-alive HTTP transport backed by a pooled `requests.Session`.
+
+    The underlying urllib3 pools are thread-safe, so one transport can be
+    shared by every client and thread in the process.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 32, pool_block: bool = False):
+        """Create a transport.
+
+        Args:
+            pool_connections: Number of distinct hosts to keep pools for
+            pool_maxsize: Maximum idle keep-alive connections kept per host
+            pool_block: Block when a host's pool is exhausted instead of
+                opening (and later discarding) an extra connection
+        """
+        self.stats = TransportStats()
+        self.session = requests.Session()
+        adapter = _CountingAdapter(
+            self.stats,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, url: str, deadline: Optional[Deadline] = None, **kwargs) -> requests.Response:
+        """Send a request over a pooled connection.
+
+        With a `deadline`, the timeout is capped at the time it has left, and a
+        timeout or abort caused by it raises `DeadlineExceeded`/`Cancelled`.
+        """
+        _connect_timing.seconds = 0.0
+        if deadline is None:
+            return self.session.request(method, url, **kwargs)
+        kwargs['timeout'] = deadline.timeout(kwargs.get('timeout'))
+        # Cancelling the deadline shuts down the socket this request is waiting on
+        connections = _checkout.holder = []
+        try:
+            with deadline.guard(lambda: _shutdown(connections)):
+                return self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            error = deadline.translate(e)
+            if error is e:
+                raise
+            raise error from e
+        finally:
+            _checkout.holder = None
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request over a pooled connection."""
+        return self.request('POST', url, **kwargs)
+
+    @staticmethod
+    def abort(resp: requests.Response) -> None:
+        """Interrupt a response being read on another thread.
+
+        Shuts its socket down so the blocked read fails right away; the reader
+        then closes the response and the connection is discarded, not pooled.
+        """
+        _shutdown([getattr(resp.raw, 'connection', None) or getattr(resp.raw, '_connection', None)])
+
+    @staticmethod
+    def release_on_close(resp: requests.Response, release: Callable[[], None]) -> None:
+        """Run `release` once `resp` is closed (or garbage-collected unclosed).
+
+        Used to keep a concurrency slot for a streamed response until its body
+        has been read, instead of only until its headers arrived.
+        """
+        released = threading.Lock()
+
+        def release_once() -> None:
+            if released.acquire(blocking=False):
+                release()
+
+        close = resp.close
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                release_once()
+
+        resp.close = close_and_release
+        weakref.finalize(resp, release_once)
+
+    def preconnect(self, url: str, connections: int = 1, timeout: float = 10) -> int:
+        """Open keep-alive connections to `url`'s host ahead of the first real request.
+
+        Sends `connections` concurrent HEAD requests so DNS, TCP and TLS are done
+        and the sockets wait in the pool; any HTTP status counts as connected.
+        Returns the number of connections that succeeded.
+        """
+        def head() -> bool:
+            try:
+                self.request('HEAD', url, timeout=timeout).close()
+                return True
+            except requests.RequestException:
+                return False
+
+        if connections <= 1:
+            return int(head())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(head()), daemon=True) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(results)
+
+    @staticmethod
+    def last_connect_time() -> float:
+        """Seconds this thread's last request spent opening a connection (0.0 when reused)."""
+        return getattr(_connect_timing, 'seconds', 0.0)
+
+    def stats_snapshot(self) -> Dict[str, int]:
+        """Return request/connection counters (opened vs reused)."""
+        return self.stats.snapshot()
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_transport: Optional[PooledTransport] = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport() -> PooledTransport:
+    """Return the process-wide transport shared by clients that don't pass one."""
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = PooledTransport()
+        return _default_transport
@@ -0,0 +1,112 @@
+"""Concurrent warm-up for WatsonX clients.
+
+`warm_up` runs the start-up work that would otherwise land on the first
+real request in parallel: the IAM token exchange, the DNS/TCP/TLS handshake
+to the inference host (left open in the pooled transport) and, optionally,
+a one-token validation request against the configured model. It returns a
+`WarmupReport` saying whether the client is ready and how long each step
+took, so a service can gate its readiness probe on it.
+
+    report = client.warm_up(validate=True)
+    print(report.summary())       # "ready in 0.41s (iam 0.38s, connect 0.12s, validate 0.40s)"
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class WarmupStep:
+    """Outcome of one warm-up step."""
+    name: str
+    ok: bool = False
+    seconds: Optional[float] = None     # None if the step hadn't finished by the deadline
+    error: Optional[str] = None
+
+
+@dataclass
+class WarmupReport:
+    """Result of `warm_up`: per-step outcomes and the total wall time."""
+    steps: List[WarmupStep] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return all(step.ok for step in self.steps)
+
+    def step(self, name: str) -> Optional[WarmupStep]:
+        return next((step for step in self.steps if step.name == name), None)
+
+    def summary(self) -> str:
+        parts = []
+        for step in self.steps:
+            if step.ok:
+                parts.append(f'{step.name} {step.seconds:.2f}s')
+            else:
+                parts.append(f'{step.name} failed: {step.error}')
+        status = 'ready' if self.ready else 'not ready'
+        return f"{status} in {self.elapsed:.2f}s ({', '.join(parts)})"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'ready': self.ready, 'elapsed': self.elapsed,
+                'steps': {step.name: {'ok': step.ok, 'seconds': step.seconds, 'error': step.error}
+                          for step in self.steps}}
+
+
+def _timed(step: WarmupStep, func: Callable[[], Any]) -> None:
+    start = time.perf_counter()
+    try:
+        func()
+        step.ok = True
+    except Exception as e:
+        step.error = f'{type(e).__name__}: {e}'
+    step.seconds = time.perf_counter() - start
+
+
+def _validate(client) -> None:
+    # WatsonXClient.generate returns JSON; WatsonXConnector.chat returns text
+    if hasattr(client, 'generate'):
+        client.generate('ping', max_tokens=1, temperature=0)
+    else:
+        client.chat('ping', max_tokens=1, temperature=0)
+
+
+def warm_up(client, validate: bool = False, connections: int = 1, timeout: float = 15.0) -> WarmupReport:
+    """Warm a `WatsonXClient` or `WatsonXConnector` up; steps run concurrently.
+
+    Args:
+        client: Client with `base_url`, `transport` and (optionally) `token_manager`
+        validate: Also send a one-token request to check credentials, project and model
+        connections: Keep-alive connections to open to the inference host
+        timeout: Seconds to wait for all steps; unfinished steps are reported as failed
+    """
+    plan: List[WarmupStep] = []
+    work: Dict[str, Callable[[], Any]] = {}
+    if getattr(client, 'token_manager', None) is not None:
+        work['iam'] = client.token_manager.get_token
+
+    def connect():
+        opened = client.transport.preconnect(client.base_url, connections=connections, timeout=timeout)
+        if not opened:
+            raise ConnectionError(f'could not connect to {client.base_url}')
+
+    work['connect'] = connect
+    if validate:
+        # Shares the token exchange with the 'iam' step instead of starting a second one
+        work['validate'] = lambda: _validate(client)
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(work), thread_name_prefix='warmup')
+    futures = []
+    for name, func in work.items():
+        step = WarmupStep(name)
+        plan.append(step)
+        futures.append(executor.submit(_timed, step, func))
+    wait(futures, timeout=timeout)
+    executor.shutdown(wait=False)
+    elapsed = time.perf_counter() - start
+    # Copy the steps so ones still running past the deadline can't change the report
+    steps = [replace(step) if step.seconds is not None else replace(step, ok=False, error=f'timed out after {timeout:g}s')
+             for step in plan]
+    return WarmupReport(steps, elapsed)
@@ -10,101 +10,185 @@ Usage:
     python watson_connect.py
 """
 
+import logging
 import os
 import sys
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional, Union
 import requests
 from dotenv import load_dotenv
 
+from conversation import Conversation
+from deadline import Cancelled, Deadline
+from instrumentation import CallRecord, Instrumentation
+from near_cache import NearDuplicateCache
+from retry import CircuitBreaker, RetryPolicy
+from scheduler import LaneScheduler
+from streaming import ChatDelta
+from token_manager import IAM_URL, IAMTokenManager
+from transport import PooledTransport
+from warmup import WarmupReport, warm_up
+from watsonx_client import CHAT_PATH, WatsonXClient, build_chat_payload
+
+logger = logging.getLogger(__name__)
+
+
+def _delegated(name: str) -> property:
+    """Connector attribute stored on its underlying `WatsonXClient`."""
+    return property(lambda self: getattr(self._client, name), lambda self, value: setattr(self._client, name, value))
+
 
 class WatsonXConnector:
     """Handles WatsonX authentication and API requests."""
     
-    def __init__(self, base_url: str, api_key: str, project_id: str, model: str):
+    def __init__(self, base_url: str, api_key: str, project_id: str, model: str,
+                 transport: Optional[PooledTransport] = None, token_manager: Optional[IAMTokenManager] = None,
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 iam_url: str = IAM_URL, instrumentation: Optional[Instrumentation] = None,
+                 prefetch_token: bool = False, near_cache: Optional[NearDuplicateCache] = None,
+                 timeout: float = 60, deadline: Optional[float] = None,
+                 scheduler: Optional[LaneScheduler] = None, lane: Optional[str] = None,
+                 gzip_threshold: Optional[int] = None):
         """Initialize WatsonX connector with credentials.
         
+        The IAM exchange happens on the first request, or in the background
+        right away when `prefetch_token` is set.
+        
         Args:
             base_url: WatsonX base URL (e.g., 'https://us-south.ml.cloud.ibm.com')
             api_key: IBM Service ID API key
             project_id: WatsonX project ID
             model: Model ID (e.g., 'ibm/granite-4-h-small')
+            transport: Pooled HTTP transport (defaults to the shared process-wide one)
+            token_manager: IAM token manager to share with other clients (created if omitted)
+            retry_policy: Optional retry policy for timeouts, connection errors and 5xx/429
+            circuit_breaker: Optional circuit breaker that fails fast while WatsonX is unhealthy
+            iam_url: IAM token endpoint (override to point at a local stand-in)
+            instrumentation: Optional hooks receiving a latency/usage record per call
+            prefetch_token: Start the IAM exchange in the background instead of on first use
+            near_cache: Optional `NearDuplicateCache` answering near-duplicate prompts from earlier responses
+            timeout: Timeout in seconds for each HTTP request
+            deadline: Default time budget in seconds for each call (None = unbounded)
+            scheduler: Optional `LaneScheduler` shared with other clients; each request waits
+                for a slot in its lane before it is sent
+            lane: Scheduler lane for this connector's calls (default: the scheduler's default lane)
+            gzip_threshold: Gzip request bodies of at least this many bytes (None = never)
         """
         self.base_url = base_url.rstrip('/')
         self.project_id = project_id
         self.model = model
         self.api_key = api_key
-        self.access_token = None
+        # Requests go through a WatsonXClient, so token refresh, retries, lanes, caching and compression
+        # behave the same
+        self._client = WatsonXClient(base_url, api_key, project_id, model, transport=transport,
+                                     token_manager=token_manager, retry_policy=retry_policy,
+                                     circuit_breaker=circuit_breaker, iam_url=iam_url,
+                                     instrumentation=instrumentation, near_cache=near_cache, timeout=timeout,
+                                     deadline=deadline, scheduler=scheduler, lane=lane,
+                                     gzip_threshold=gzip_threshold)
         
-        # Exchange API key for access token on initialization
-        self._refresh_access_token()
+        if prefetch_token:
+            self.token_manager.prefetch()
+    
+    access_token = _delegated('access_token')
+    transport = _delegated('transport')
+    token_manager = _delegated('token_manager')
+    retry_policy = _delegated('retry_policy')
+    circuit_breaker = _delegated('circuit_breaker')
+    instrumentation = _delegated('instrumentation')
+    near_cache = _delegated('near_cache')
+    deadline = _delegated('deadline')
+    timeout = _delegated('timeout')
+    scheduler = _delegated('scheduler')
+    lane = _delegated('lane')
+    gzip_threshold = _delegated('gzip_threshold')
+    
+    def warm_up(self, validate: bool = False, connections: int = 1, timeout: float = 15.0) -> WarmupReport:
+        """Get a token and open connections before the first request; see `warmup.warm_up`."""
+        return warm_up(self, validate=validate, connections=connections, timeout=timeout)
     
     def _refresh_access_token(self) -> str:
-        """Exchange IBM Service ID API key for access token via IBM Cloud IAM."""
-        iam_url = 'https://iam.cloud.ibm.com/identity/token'
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Accept': 'application/json',
-        }
-        data = {
-            'grant_type': 'urn:ibm:params:oauth:grant-type:apikey',
-            'apikey': self.api_key,
-            'response_type': 'cloud_iam',
-        }
-        
-        print("[INFO] Requesting access token from IBM IAM...")
-        resp = requests.post(iam_url, headers=headers, data=data, timeout=10)
-        resp.raise_for_status()
-        
-        token_response = resp.json()
-        self.access_token = token_response.get('access_token')
-        expires_in = token_response.get('expires_in', 0)
-        
-        if not self.access_token:
-            raise RuntimeError('Failed to obtain access token from IBM IAM')
-        
-        print(f"[INFO] Access token obtained (expires in {expires_in}s)")
-        return self.access_token
+        """Exchange IBM Service ID API key for a new access token via IBM Cloud IAM."""
+        return self._client._refresh_access_token()
     
-    def chat(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7) -> str:
+    def _post_json(self, url: str, payload: Dict[str, Any], timeout: Optional[float] = None,
+                   stream: bool = False, record: Optional[CallRecord] = None,
+                   deadline: Optional[Deadline] = None, lane: Optional[str] = None,
+                   tenant: Optional[str] = None, idempotent: bool = True) -> requests.Response:
+        """POST a JSON payload through the underlying `WatsonXClient._post_json`.
+
+        Generation passes ``idempotent=False`` so a request that may have reached the model isn't re-sent.
+        """
+        return self._client._post_json(url, payload, timeout, stream, record, deadline, lane, tenant, idempotent)
+    
+    def chat(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7,
+             conversation: Optional[Conversation] = None, deadline: Union[Deadline, float, None] = None,
+             lane: Optional[str] = None, tenant: Optional[str] = None) -> str:
         """Send a message to WatsonX and get a response.
         
         Args:
             prompt: User question/message
             max_tokens: Maximum response length (default 2000)
             temperature: Response creativity (0-1, default 0.7)
+            conversation: Optional history to send (trimmed to its budget) and extend with this turn
+            deadline: Time budget for the whole call, in seconds or as a shared `Deadline`
+            lane: Scheduler lane for this call (default: the connector's `lane`)
+            tenant: Caller id checked against the scheduler's per-tenant limits
             
         Returns:
             Response text from the model
         """
-        url = f"{self.base_url}/ml/v1/text/chat?version=2023-05-29"
-        
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-        }
+        deadline = self._client._deadline(deadline)
+        messages = conversation.prepare(prompt, max_tokens) if conversation is not None else None
+        payload = build_chat_payload(self.model, self.project_id, prompt, max_tokens, messages,
+                                     temperature=temperature)
+        record = self.instrumentation.start('chat', self.model) if self.instrumentation else None
         
-        payload = {
-            "model_id": self.model,
-            "project_id": self.project_id,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": 1.0,
-            "frequency_penalty": 0,
-            "presence_penalty": 0,
-        }
-        
-        print(f"[DEBUG] POST {url}")
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        
-        if resp.status_code != 200:
-            print(f"[ERROR] Status {resp.status_code}: {resp.text[:500]}")
+        try:
+            result = self.near_cache.get(payload) if self.near_cache is not None else None
+            if result is not None:
+                if record is not None:
+                    record.cached = True
+            else:
+                # Sends, parses, and stores the answer in the near-duplicate cache
+                result = self._client._request_completion(f"{self.base_url}{CHAT_PATH}", payload, None, False,
+                                                          record, deadline, lane, tenant)
+        except BaseException as e:
+            if conversation is not None:
+                conversation.pop()
+            if record is not None:
+                self.instrumentation.finish(record, e)
+            raise
+        if record is not None:
+            self.instrumentation.finish(record)
+        text = self._extract_response(result)
+        if conversation is not None:
+            conversation.add_assistant(text)
+        return text
+    
+    def stream_chat(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7,
+                    conversation: Optional[Conversation] = None,
+                    deadline: Union[Deadline, float, None] = None, lane: Optional[str] = None,
+                    tenant: Optional[str] = None) -> Iterator[ChatDelta]:
+        """Send a message to WatsonX and stream the response as it is generated.
         
-        resp.raise_for_status()
-        return self._extract_response(resp.json())
+        Args:
+            prompt: User question/message
+            max_tokens: Maximum response length (default 2000)
+            temperature: Response creativity (0-1, default 0.7)
+            conversation: Optional history to send (trimmed to its budget) and extend with this turn
+            deadline: Time budget for the whole stream; `deadline.cancel()` from another
+                thread aborts it mid-read
+            lane: Scheduler lane for this call (default: the connector's `lane`)
+            tenant: Caller id checked against the scheduler's per-tenant limits
+            
+        Yields:
+            ChatDelta for each chunk; the last one carries `usage`
+        """
+        deadline = self._client._deadline(deadline)
+        messages = conversation.prepare(prompt, max_tokens) if conversation is not None else None
+        payload = build_chat_payload(self.model, self.project_id, prompt, max_tokens, messages,
+                                     temperature=temperature)
+        yield from self._client._stream_completion(payload, conversation, deadline, lane, tenant, 'stream_chat')
     
     @staticmethod
     def _extract_response(response_json: Dict[str, Any]) -> str:
@@ -139,14 +223,30 @@ def load_config() -> Dict[str, str]:
         print("[ERROR] Please configure .env file with required credentials")
         sys.exit(1)
     
+    # Optional: alternate IAM endpoint (e.g. the local stand-in from stub_server.py)
+    required_vars['WATSONX_IAM_URL'] = os.getenv('WATSONX_IAM_URL') or IAM_URL
     return required_vars
 
 
-def interactive_chat(connector: WatsonXConnector):
-    """Run interactive chat loop."""
+def interactive_chat(connector: WatsonXConnector, conversation: Optional[Conversation] = None,
+                     answer_timeout: Optional[float] = None):
+    """Run interactive chat loop; earlier turns are kept (within budget) as context.
+    
+    Ctrl-C while an answer is streaming cancels it and returns to the prompt.
+    
+    Args:
+        connector: Connector to chat through
+        conversation: History to continue (a new one sized by WATSONX_CONTEXT_TOKENS if omitted)
+        answer_timeout: Seconds allowed per answer (default: $WATSONX_ANSWER_TIMEOUT, else unbounded)
+    """
+    if conversation is None:
+        conversation = Conversation(max_context_tokens=int(os.getenv('WATSONX_CONTEXT_TOKENS', '8192')))
+    if answer_timeout is None and os.getenv('WATSONX_ANSWER_TIMEOUT'):
+        answer_timeout = float(os.getenv('WATSONX_ANSWER_TIMEOUT'))
     print("\n" + "="*60)
     print("WatsonX Interactive Chat")
-    print("Type 'exit' or 'quit' to exit")
+    print("Type 'exit' or 'quit' to exit, 'reset' to start a new conversation")
+    print("Press Ctrl-C to stop an answer")
     print("="*60 + "\n")
     
     while True:
@@ -163,15 +263,32 @@ def interactive_chat(connector: WatsonXConnector):
             print("[INFO] Exiting...")
             break
         
+        if user_input.lower() == 'reset':
+            conversation.clear()
+            print("[INFO] Conversation cleared\n")
+            continue
+        
+        # Print tokens as they arrive instead of waiting for the whole answer
+        print()
+        stream = connector.stream_chat(user_input, conversation=conversation,
+                                       deadline=Deadline(answer_timeout))
         try:
-            response = connector.chat(user_input)
-            print(f"\n{response}\n")
+            for delta in stream:
+                print(delta.content, end='', flush=True)
+            print("\n")
+        except KeyboardInterrupt:
+            # Closing the stream aborts the request and releases its connection
+            stream.close()
+            print("\n[INFO] Answer cancelled\n")
+        except Cancelled as e:
+            print(f"\n[WARN] Answer stopped: {e}\n")
         except Exception as e:
             print(f"[ERROR] {e}\n")
 
 
 def main():
     """Main entry point."""
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper(), format='[%(levelname)s] %(message)s')
     print("[INFO] Loading configuration...")
     config = load_config()
     
@@ -182,9 +299,19 @@ def main():
             api_key=config['WATSONX_API_KEY'],
             project_id=config['WATSONX_PROJECT_ID'],
             model=config['MODEL'],
+            iam_url=config['WATSONX_IAM_URL'],
+            retry_policy=RetryPolicy(),
+            circuit_breaker=CircuitBreaker(),
+            gzip_threshold=int(os.getenv('WATSONX_GZIP_THRESHOLD')) if os.getenv('WATSONX_GZIP_THRESHOLD') else None,
         )
         
-        print("[SUCCESS] Connected to WatsonX\n")
+        # Token exchange, TLS handshake and (optionally) a model ping run concurrently
+        validate = os.getenv('WATSONX_WARMUP_VALIDATE', 'false').lower() in ('1', 'true', 'yes')
+        report = connector.warm_up(validate=validate)
+        if report.ready:
+            print(f"[SUCCESS] WatsonX connector {report.summary()}\n")
+        else:
+            print(f"[WARN] WatsonX connector {report.summary()}\n")
         interactive_chat(connector)
         
     except Exception as e:
@@ -2,28 +2,196 @@
 
 This client exchanges IBM API keys for access tokens via IBM Cloud IAM,
 then uses those tokens to query the WatsonX text generation endpoint.
-No external SDK required—uses standard requests library.
+No external SDK required—uses standard requests library through a pooled,
+keep-alive transport shared by all clients (see transport.py).
 """
-from typing import Any, Dict, Optional
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
 import requests
 
-try:
-    import openai
-except Exception:
-    openai = None
+from codec import PayloadTemplate, encode_body, loads
+from coalesce import SingleFlight
+from conversation import Conversation
+from deadline import Deadline
+from embeddings import (DEFAULT_EMBED_MODEL, EMBED_PATH, EmbeddingBatcher, build_embed_payload, chunk_ranges,
+                        parse_embeddings, require_numpy)
+from instrumentation import CallRecord, Instrumentation
+from near_cache import NearDuplicateCache
+from rate_limit import RateGovernor, estimate_tokens
+from retry import CircuitBreaker, RetryPolicy, call_with_retries
+from response_cache import ResponseCache, is_deterministic, payload_key
+from scheduler import LaneScheduler
+from streaming import ChatDelta, iter_chat_deltas
+from structured import StructuredField, iter_structured
+from token_manager import IAM_URL, IAMTokenManager
+from transport import PooledTransport, get_default_transport
+from warmup import WarmupReport, warm_up
+
+logger = logging.getLogger(__name__)
+
+CHAT_PATH = '/ml/v1/text/chat?version=2023-05-29'
+CHAT_STREAM_PATH = '/ml/v1/text/chat_stream?version=2023-05-29'
+CHAT_PARAMS = ('temperature', 'top_p', 'frequency_penalty', 'presence_penalty', 'max_tokens', 'logprobs',
+               'top_logprobs')
+
+
+def build_chat_payload(model: str, project_id: str, prompt: str, max_tokens: int = 512,
+                       messages: Optional[List[Dict[str, str]]] = None, **kwargs) -> Dict[str, Any]:
+    """Build the WatsonX chat API payload shared by the sync and async clients.
+
+    `messages` (e.g. from `Conversation.prepare`) replaces the single user turn built from `prompt`.
+    """
+    # WatsonX chat API payload with messages format
+    payload = {
+        "model_id": model,
+        "project_id": project_id,
+        "messages": messages if messages is not None else [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "top_p": 1.0,
+        "frequency_penalty": 0,
+        "presence_penalty": 0,
+    }
+    # Merge any additional kwargs
+    for key in CHAT_PARAMS:
+        if key in kwargs:
+            payload[key] = kwargs[key]
+    return payload
+
+
+class BatchResult(NamedTuple):
+    """Outcome of one prompt in `WatsonXClient.generate_many`."""
+    index: int
+    prompt: str
+    response: Optional[Dict[str, Any]]
+    error: Optional[Exception]
+    elapsed: float
+    item: Any = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 
+class BatchGenerateMixin:
+    """Adds `generate_many` to any client with a `generate(prompt, **kwargs)` method."""
 
-class WatsonXClient:
+    def _generate_item(self, index: int, item: Union[str, Dict[str, Any]], kwargs: Dict[str, Any]) -> BatchResult:
+        prompt = item
+        if isinstance(item, dict):
+            prompt = item['prompt']
+            kwargs = {**kwargs, **(item.get('params') or {})}
+        start = time.perf_counter()
+        try:
+            response = self.generate(prompt, **kwargs)
+            return BatchResult(index, prompt, response, None, time.perf_counter() - start, item)
+        except Exception as e:
+            return BatchResult(index, prompt, None, e, time.perf_counter() - start, item)
+
+    def generate_many(self, prompts: Iterable[Union[str, Dict[str, Any]]], concurrency: int = 8,
+                      ordered: bool = True, **kwargs) -> Iterator[BatchResult]:
+        """Generate completions for many prompts on a bounded thread pool.
+        
+        Prompts are consumed lazily, so `prompts` may be a long-running iterator;
+        at most ``2 * concurrency`` of them are held at once. Errors are captured
+        per item in `BatchResult.error` instead of aborting the batch. (Callers
+        already running an event loop should gather on `AsyncWatsonXClient.generate`.)
+        
+        Args:
+            prompts: List or iterator of prompt strings, or of dicts with a 'prompt'
+                and optional 'params' overriding **kwargs for that item
+            concurrency: Number of requests in flight at once
+            ordered: Yield results in input order (True) or as they finish (False)
+            **kwargs: Parameters passed to `generate` (max_tokens, temperature, etc.)
+            
+        Yields:
+            BatchResult for each prompt
+        """
+        window = max(concurrency, 1) * 2
+        items = enumerate(prompts)
+        pending = {}
+        finished = {}
+        next_index = 0
+        exhausted = False
+        pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix='watsonx-batch')
+        try:
+            while True:
+                # Keep the pipeline full, counting out-of-order results still waiting to be yielded
+                while not exhausted and len(pending) + len(finished) < window:
+                    try:
+                        index, prompt = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[pool.submit(self._generate_item, index, prompt, kwargs)] = index
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    result = future.result()
+                    if ordered:
+                        finished[result.index] = result
+                    else:
+                        yield result
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+class WatsonXClient(BatchGenerateMixin):
     """Client for WatsonX text generation with automatic token refresh."""
     
-    def __init__(self, base_url: str, api_key: str, project_id: str, model: str, use_api_key_direct: bool = False):
+    def __init__(self, base_url: str, api_key: str, project_id: str, model: str, use_api_key_direct: bool = False,
+                 transport: Optional[PooledTransport] = None, token_manager: Optional[IAMTokenManager] = None,
+                 cache: Optional[ResponseCache] = None, rate_governor: Optional[RateGovernor] = None,
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 iam_url: str = IAM_URL, instrumentation: Optional[Instrumentation] = None,
+                 prefetch_token: bool = False, coalescer: Optional[SingleFlight] = None,
+                 near_cache: Optional[NearDuplicateCache] = None, embed_model: str = DEFAULT_EMBED_MODEL,
+                 timeout: float = 60, deadline: Optional[float] = None,
+                 scheduler: Optional[LaneScheduler] = None, lane: Optional[str] = None,
+                 gzip_threshold: Optional[int] = None):
         """Initialize WatsonX client with API key (exchanges for access token internally).
+
+        No IAM request is made here: the token is obtained on the first call,
+        or on a background thread right away when `prefetch_token` is set.
         
         Args:
             base_url: e.g., 'https://us-south.ml.cloud.ibm.com'
             api_key: IBM API key
             project_id: WatsonX project ID
             model: Model ID (e.g., 'pb-2', 'PB14250', etc.)
+            transport: Pooled HTTP transport (defaults to the shared process-wide one)
+            token_manager: IAM token manager to share with other clients (created if omitted)
+            cache: Optional response cache consulted by `generate`
+            rate_governor: Optional rate/concurrency governor shared by all calls on this client
+            retry_policy: Optional retry policy for timeouts, connection errors and 5xx/429
+            circuit_breaker: Optional circuit breaker that fails fast while WatsonX is unhealthy
+            iam_url: IAM token endpoint (override to point at a local stand-in)
+            instrumentation: Optional hooks receiving a latency/usage record per call
+            prefetch_token: Start the IAM exchange in the background instead of on first use
+            coalescer: Optional `SingleFlight` so identical in-flight `generate` calls share one request
+            near_cache: Optional `NearDuplicateCache` answering near-duplicate prompts from earlier responses
+            embed_model: Model used by `embed` / `embed_one` when none is given
+            timeout: Timeout in seconds for each HTTP request
+            deadline: Default time budget in seconds for each call, covering token refresh,
+                queueing, retries and reading the response (None = unbounded); calls
+                can pass their own `deadline`
+            scheduler: Optional `LaneScheduler` shared with other clients; each request waits
+                for a slot in its lane before it is sent
+            lane: Scheduler lane for this client's calls (default: the scheduler's default lane);
+                calls can pass their own `lane`
+            gzip_threshold: Gzip request bodies of at least this many bytes (None = never);
+                the endpoint must accept ``Content-Encoding: gzip``
         """
         self.base_url = base_url.rstrip('/')
         self.project_id = project_id
@@ -31,102 +199,533 @@ class WatsonXClient:
         self.api_key = api_key
         self.access_token = None
         self.use_api_key_direct = bool(use_api_key_direct)
+        self.transport = transport or get_default_transport()
+        self.token_manager = None
+        self.cache = cache
+        self.rate_governor = rate_governor
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.instrumentation = instrumentation
+        self.coalescer = coalescer
+        self.near_cache = near_cache
+        self.embed_model = embed_model
+        self.timeout = timeout
+        self.deadline = deadline
+        self.scheduler = scheduler
+        self.lane = lane
+        self.gzip_threshold = gzip_threshold
+        # Model and project are encoded once; requests only encode their own fields
+        self._template = PayloadTemplate({'model_id': model, 'project_id': project_id})
+        self._header_cache: Tuple[Optional[str], Dict[Tuple[bool, Optional[str]], Dict[str, str]]] = (None, {})
+        self._embed_batchers: Dict[str, EmbeddingBatcher] = {}
+        self._embed_lock = threading.Lock()
 
         # If configured to use API key directly, use it as the auth token
         if self.use_api_key_direct:
             # Note: Some IBM endpoints may reject raw API keys; use only if supported.
             self.access_token = self.api_key
         else:
-            # Exchange API key for access token on initialization
-            self._refresh_access_token()
+            self.token_manager = token_manager or IAMTokenManager(api_key, iam_url=iam_url, transport=self.transport)
+            if prefetch_token:
+                self.token_manager.prefetch()
+
+    def warm_up(self, validate: bool = False, connections: int = 1, timeout: float = 15.0) -> WarmupReport:
+        """Get a token and open connections before the first request; see `warmup.warm_up`."""
+        return warm_up(self, validate=validate, connections=connections, timeout=timeout)
 
     def _refresh_access_token(self) -> str:
-        """Exchange IBM API key for access token via IBM Cloud IAM."""
-        iam_url = 'https://iam.cloud.ibm.com/identity/token'
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Accept': 'application/json',
-        }
-        data = {
-            'grant_type': 'urn:ibm:params:oauth:grant-type:apikey',
-            'apikey': self.api_key,
-            'response_type': 'cloud_iam',
-        }
-        
-        print(f"[DEBUG] Requesting access token from IBM IAM...")
-        resp = requests.post(iam_url, headers=headers, data=data, timeout=10)
-        resp.raise_for_status()
-        
-        token_response = resp.json()
-        self.access_token = token_response.get('access_token')
-        expires_in = token_response.get('expires_in', 0)
-        
-        if not self.access_token:
-            raise RuntimeError('Failed to obtain access token from IBM IAM')
-        
-        print(f"[DEBUG] Access token obtained (expires in {expires_in}s, length: {len(self.access_token)})")
+        """Exchange IBM API key for a new access token via IBM Cloud IAM."""
+        if self.token_manager is None:
+            return self.access_token
+        self.access_token = self.token_manager.refresh(force=True)
+        return self.access_token
+
+    def _deadline(self, deadline: Union[Deadline, float, None]) -> Deadline:
+        return Deadline.coerce(deadline if deadline is not None else self.deadline)
+
+    def _current_token(self, record: Optional[CallRecord] = None, deadline: Optional[Deadline] = None) -> str:
+        if self.token_manager is not None:
+            timeout = deadline.timeout() if deadline is not None else None
+            refreshes, start = self.token_manager.refresh_count, time.perf_counter()
+            try:
+                self.access_token = self.token_manager.get_token(timeout)
+            except requests.RequestException as e:
+                error = deadline.translate(e) if deadline is not None else e
+                if error is e:
+                    raise
+                raise error from e
+            if record is not None and self.token_manager.refresh_count != refreshes:
+                record.iam_refresh += time.perf_counter() - start
         return self.access_token
 
-    def generate(self, prompt: str, max_tokens: int = 512, **kwargs) -> Dict[str, Any]:
+    def _headers(self, token: str, stream: bool, encoding: Optional[str]) -> Dict[str, str]:
+        """Request headers, built once per access token and kind of request."""
+        cached = self._header_cache
+        if cached[0] != token:
+            cached = self._header_cache = (token, {})
+        headers = cached[1].get((stream, encoding))
+        if headers is None:
+            headers = {
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream' if stream else 'application/json',
+            }
+            if encoding is not None:
+                headers['Content-Encoding'] = encoding
+            cached[1][(stream, encoding)] = headers
+        return headers
+
+    def _post_json(self, url: str, payload: Dict[str, Any], timeout: Optional[float] = None,
+                   stream: bool = False, record: Optional[CallRecord] = None,
+                   deadline: Optional[Deadline] = None, lane: Optional[str] = None,
+                   tenant: Optional[str] = None, idempotent: bool = True) -> requests.Response:
+        """POST a JSON payload under the client's retry policy and circuit breaker.
+
+        The body is encoded (and compressed) once and re-sent as is by retries.
+        Pass ``idempotent=False`` for generation: a failure after the request
+        may have reached the model (read timeout, 5xx other than 503) is then
+        not retried, so a completion is never generated and billed twice.
+        """
+        timeout = timeout or self.timeout
+        body = encode_body(payload, self._template, self.gzip_threshold)
+        if self.retry_policy is None and self.circuit_breaker is None:
+            return self._send_once(url, payload, body, timeout, stream, record, deadline, lane, tenant)
+        return call_with_retries(
+            lambda: self._send_once(url, payload, body, timeout, stream, record, deadline, lane, tenant),
+            self.retry_policy, self.circuit_breaker, idempotent=idempotent, deadline=deadline)
+
+    def _send_once(self, url: str, payload: Dict[str, Any], body: Tuple[bytes, Optional[str]], timeout: float,
+                   stream: bool, record: Optional[CallRecord] = None, deadline: Optional[Deadline] = None,
+                   lane: Optional[str] = None, tenant: Optional[str] = None) -> requests.Response:
+        """POST an encoded JSON payload with a valid bearer token.
+        
+        Retries once with a fresh token on 401 and, when a rate governor is
+        configured without a retry policy, re-sends throttled (429/503)
+        requests after the governor's back-off. A gzip body rejected with 415
+        is re-sent uncompressed and turns compression off for the client.
+        A streamed response holds its rate-governor slot until it is closed.
+        With a scheduler, each attempt holds a slot in its lane until the
+        response headers arrive, or for a stream until it is closed.
+        """
+        auth_retried = False
+        throttle_retries = 0
+        tokens = estimate_tokens(payload) if self.rate_governor is not None else 0
+        data, encoding = body
+        while True:
+            token = self._current_token(record, deadline)
+            headers = self._headers(token, stream, encoding)
+            throttled = False
+            ticket = None
+            if self.scheduler is not None:
+                ticket = self.scheduler.acquire(lane or self.lane, tenant, deadline=deadline)
+                if record is not None:
+                    record.lane = ticket.lane.name
+                    record.queue_wait += ticket.waited
+            resp = None
+            try:
+                if self.rate_governor is not None:
+                    waited = self.rate_governor.acquire(tokens, deadline=deadline)
+                    if record is not None:
+                        record.queue_wait += waited
+                    status, retry_after, held = None, None, False
+                    try:
+                        resp = self.transport.post(url, headers=headers, data=data, timeout=timeout,
+                                                   stream=stream, deadline=deadline)
+                        status, retry_after = resp.status_code, resp.headers.get('Retry-After')
+                        # A stream keeps its slot until it is consumed or closed, so the cap bounds the whole read
+                        held = stream and status == 200
+                        if held:
+                            PooledTransport.release_on_close(
+                                resp, lambda status=status: self.rate_governor.release(status, None))
+                    finally:
+                        if not held:
+                            throttled = self.rate_governor.release(status, retry_after)
+                else:
+                    resp = self.transport.post(url, headers=headers, data=data, timeout=timeout, stream=stream,
+                                               deadline=deadline)
+            finally:
+                if ticket is not None:
+                    if stream and resp is not None and resp.status_code == 200:
+                        PooledTransport.release_on_close(resp, lambda ticket=ticket: self.scheduler.release(ticket))
+                    else:
+                        self.scheduler.release(ticket)
+            if record is not None:
+                record.observe_attempt(resp, self.transport.last_connect_time())
+            if resp.status_code == 401 and self.token_manager is not None and not auth_retried:
+                logger.debug("Access token rejected (401); refreshing and retrying once")
+                resp.close()
+                self.token_manager.invalidate(token)
+                auth_retried = True
+                continue
+            if resp.status_code == 415 and encoding is not None:
+                logger.warning("Endpoint rejected a gzip request body (415); sending uncompressed from now on")
+                resp.close()
+                self.gzip_threshold = None
+                data, encoding = encode_body(payload, self._template)
+                continue
+            if (throttled and self.retry_policy is None
+                    and throttle_retries < self.rate_governor.max_throttle_retries):
+                logger.debug("Throttled (%s); backing off and retrying", resp.status_code)
+                resp.close()
+                throttle_retries += 1
+                continue
+            return resp
+
+    def generate(self, prompt: str, max_tokens: int = 512, force_cache: bool = False,
+                 conversation: Optional[Conversation] = None, coalesce: bool = True,
+                 deadline: Union[Deadline, float, None] = None, lane: Optional[str] = None,
+                 tenant: Optional[str] = None, **kwargs) -> Dict[str, Any]:
         """Generate text using WatsonX chat endpoint.
         
         Args:
             prompt: The input text to generate from
             max_tokens: Maximum tokens to generate (default 512)
+            force_cache: Use the response cache even for sampled (temperature > 0) requests
+            conversation: Optional history to send (trimmed to its budget) and extend with this turn
+            coalesce: Share an identical in-flight request's result (needs a `coalescer`)
+            deadline: Time budget for the whole call, in seconds or as a shared `Deadline`
+                (default: the client's `deadline`)
+            lane: Scheduler lane for this call (default: the client's `lane`)
+            tenant: Caller id checked against the scheduler's per-tenant limits
             **kwargs: Additional parameters (temperature, top_p, etc.)
             
         Returns:
             Response JSON from WatsonX
+            
+        Raises:
+            DeadlineExceeded: The budget ran out (`Cancelled` if the deadline was cancelled)
         """
+        deadline = self._deadline(deadline)
+        if conversation is not None:
+            kwargs['messages'] = conversation.prepare(prompt, max_tokens)
+        record = self.instrumentation.start('generate', self.model) if self.instrumentation else None
+        try:
+            result = self._generate(prompt, max_tokens, force_cache, coalesce, record, deadline, lane, tenant,
+                                    kwargs)
+        except BaseException as e:
+            if conversation is not None:
+                conversation.pop()
+            if record is not None:
+                self.instrumentation.finish(record, e)
+            raise
+        if conversation is not None:
+            conversation.add_assistant(extract_text_from_response(result))
+        if record is not None:
+            self.instrumentation.finish(record)
+        return result
+
+    def _generate(self, prompt: str, max_tokens: int, force_cache: bool, coalesce: bool,
+                  record: Optional[CallRecord], deadline: Deadline, lane: Optional[str], tenant: Optional[str],
+                  kwargs: Dict[str, Any]) -> Dict[str, Any]:
         # WatsonX chat API uses messages format
-        url = f"{self.base_url}/ml/v1/text/chat?version=2023-05-29"
-        
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-        }
-        
-        # WatsonX chat API payload with messages format
-        payload = {
-            "model_id": self.model,
-            "project_id": self.project_id,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": 0.7,
-            "top_p": 1.0,
-            "frequency_penalty": 0,
-            "presence_penalty": 0,
-        }
-        # Merge any additional kwargs
-        for key in ['temperature', 'top_p', 'frequency_penalty', 'presence_penalty', 'max_tokens']:
-            if key in kwargs:
-                payload[key] = kwargs[key]
-        
-        print(f"[DEBUG] Calling WatsonX: POST {url}")
-        
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        
-        if resp.status_code != 200:
-            print(f"[DEBUG] Error {resp.status_code}: {resp.text[:500]}")
+        url = f"{self.base_url}{CHAT_PATH}"
+        payload = build_chat_payload(self.model, self.project_id, prompt, max_tokens, **kwargs)
+        
+        cache_key = None
+        if self.cache is not None and (force_cache or is_deterministic(payload)):
+            cache_key = payload_key(payload)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if record is not None:
+                    record.cached = True
+                return cached
+        if self.near_cache is not None:
+            cached = self.near_cache.get(payload, force=force_cache)
+            if cached is not None:
+                if record is not None:
+                    record.cached = True
+                return cached
+        
+        if coalesce and self.coalescer is not None and self.coalescer.accepts(payload):
+            led = []
+
+            def lead():
+                led.append(True)
+                return self._request_completion(url, payload, cache_key, force_cache, record, deadline, lane, tenant)
+
+            try:
+                result, _ = self.coalescer.do(cache_key or payload_key(payload), lead, deadline)
+            finally:
+                if record is not None and not led:
+                    # Shared another caller's outcome; that caller's record holds the timings and usage
+                    record.coalesced = True
+            if record is not None and not led:
+                record.status = 200
+            return result
+        return self._request_completion(url, payload, cache_key, force_cache, record, deadline, lane, tenant)
+
+    def _request_completion(self, url: str, payload: Dict[str, Any], cache_key: Optional[str], force_cache: bool,
+                            record: Optional[CallRecord], deadline: Optional[Deadline] = None,
+                            lane: Optional[str] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        logger.debug("Calling WatsonX: POST %s", url)
+        
+        resp = self._post_json(url, payload, record=record, deadline=deadline, lane=lane, tenant=tenant,
+                               idempotent=False)
+        
+        if resp.status_code != 200 and logger.isEnabledFor(logging.WARNING):
+            logger.warning("WatsonX error %s: %s", resp.status_code, resp.text[:500])
         
         resp.raise_for_status()
-        return resp.json()
+        result = loads(resp.content)
+        usage = result.get('usage') or {}
+        if record is not None:
+            record.set_usage(usage)
+        if self.rate_governor is not None and usage.get('total_tokens') is not None:
+            self.rate_governor.refund_tokens(estimate_tokens(payload) - usage['total_tokens'])
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+        if self.near_cache is not None:
+            self.near_cache.put(payload, result, force=force_cache)
+        return result
+
+    def stream_generate(self, prompt: str, max_tokens: int = 512, conversation: Optional[Conversation] = None,
+                        deadline: Union[Deadline, float, None] = None, lane: Optional[str] = None,
+                        tenant: Optional[str] = None, **kwargs) -> Iterator[ChatDelta]:
+        """Stream a completion from the WatsonX chat stream endpoint.
+        
+        Args:
+            prompt: The input text to generate from
+            max_tokens: Maximum tokens to generate (default 512)
+            conversation: Optional history to send (trimmed to its budget) and extend with this turn
+            deadline: Time budget for the whole stream, in seconds or as a shared `Deadline`;
+                when it passes (or is cancelled) the stream is aborted mid-read
+            lane: Scheduler lane for this call (default: the client's `lane`)
+            tenant: Caller id checked against the scheduler's per-tenant limits
+            **kwargs: Additional parameters (temperature, top_p, etc.)
+            
+        Yields:
+            ChatDelta for each chunk; the last one carries `usage`
+        """
+        deadline = self._deadline(deadline)
+        if conversation is not None:
+            kwargs['messages'] = conversation.prepare(prompt, max_tokens)
+        payload = build_chat_payload(self.model, self.project_id, prompt, max_tokens, **kwargs)
+        yield from self._stream_completion(payload, conversation, deadline, lane, tenant, 'stream_generate')
 
+    def _stream_completion(self, payload: Dict[str, Any], conversation: Optional[Conversation], deadline: Deadline,
+                           lane: Optional[str], tenant: Optional[str], operation: str) -> Iterator[ChatDelta]:
+        """Stream `payload`, recording the call as `operation` and extending `conversation` with the answer."""
+        url = f"{self.base_url}{CHAT_STREAM_PATH}"
+        record = self.instrumentation.start(operation, self.model) if self.instrumentation else None
+        error = None
+        parts: List[str] = []
+        
+        logger.debug("Streaming from WatsonX: POST %s", url)
+        
+        resp = None
+        try:
+            resp = self._post_json(url, payload, stream=True, record=record, deadline=deadline, lane=lane,
+                                   tenant=tenant, idempotent=False)
+            if resp.status_code != 200 and logger.isEnabledFor(logging.WARNING):
+                logger.warning("WatsonX error %s: %s", resp.status_code, resp.text[:500])
+            resp.raise_for_status()
+            with deadline.guard(lambda: PooledTransport.abort(resp)):
+                try:
+                    for delta in iter_chat_deltas(resp):
+                        if record is not None:
+                            if delta.content:
+                                record.observe_first_token()
+                            if delta.usage:
+                                record.set_usage(delta.usage)
+                        if conversation is not None and delta.content:
+                            parts.append(delta.content)
+                        yield delta
+                except Exception as e:
+                    cause = deadline.translate(e)
+                    if cause is e:
+                        raise
+                    raise cause from e
+        except GeneratorExit:
+            # Abandoned by the consumer: not a failure
+            raise
+        except BaseException as e:
+            # Includes KeyboardInterrupt, so a Ctrl-C'd answer is kept only as far as it was shown
+            error = e
+            raise
+        finally:
+            if resp is not None:
+                resp.close()
+            if conversation is not None:
+                # Keep what the user saw of an abandoned stream; forget the prompt of a failed one
+                if error is None or parts:
+                    conversation.add_assistant(''.join(parts))
+                else:
+                    conversation.pop()
+            if record is not None:
+                self.instrumentation.finish(record, error)
 
-class OpenAIClient:
+    def stream_structured(self, prompt: str, schema: Optional[Dict[str, Any]] = None, max_tokens: int = 512,
+                          stop: Sequence[str] = (), max_wall_time: Optional[float] = None,
+                          deadline: Union[Deadline, float, None] = None, **kwargs) -> Iterator[StructuredField]:
+        """Stream a JSON completion, yielding fields as they complete (see `structured.iter_structured`).
+        
+        The request is aborted as soon as the output is invalid for `schema`,
+        the top-level JSON value has closed, or a stop sequence appears, so
+        neither the wait nor the billing covers tokens nobody will use.
+        
+        Args:
+            prompt: The input text (asking for JSON)
+            schema: JSON schema the output must match while it streams
+            max_tokens: Maximum tokens to generate (default 512)
+            stop: Client-side stop sequences
+            max_wall_time: Abort the stream after this many seconds
+            deadline: Time budget for the whole call, in seconds or as a shared `Deadline`
+            **kwargs: Additional `stream_generate` arguments (temperature, conversation, lane, etc.)
+            
+        Yields:
+            `StructuredField(path, value)` per completed value, ending with ``path == ()``
+            
+        Raises:
+            StructuredOutputError: The output became invalid or ended incomplete
+            DeadlineExceeded: `max_wall_time` or the deadline ran out first
+        """
+        deadline = self._deadline(deadline)
+        if max_wall_time is None:
+            yield from iter_structured(self.stream_generate(prompt, max_tokens, deadline=deadline, **kwargs),
+                                       schema, stop)
+            return
+        deadline = deadline.child(max_wall_time)
+        try:
+            yield from iter_structured(self.stream_generate(prompt, max_tokens, deadline=deadline, **kwargs),
+                                       schema, stop)
+        finally:
+            deadline.close()
+
+    def generate_structured(self, prompt: str, schema: Optional[Dict[str, Any]] = None, max_tokens: int = 512,
+                            **kwargs) -> Any:
+        """Return the JSON document from `stream_structured` (same arguments)."""
+        for field in self.stream_structured(prompt, schema, max_tokens, **kwargs):
+            if not field.path:
+                return field.value
+
+    def embed(self, texts: Sequence[str], model: Optional[str] = None, batch_size: int = 256,
+              max_batch_chars: int = 200_000, concurrency: int = 4, truncate_input_tokens: Optional[int] = None,
+              deadline: Union[Deadline, float, None] = None, lane: Optional[str] = None,
+              tenant: Optional[str] = None):
+        """Embed texts with the WatsonX embeddings endpoint.
+        
+        Texts are split into chunks of at most `batch_size` inputs and
+        `max_batch_chars` characters, which are sent concurrently.
+        
+        Args:
+            texts: Texts to embed
+            model: Embedding model ID (default: the client's `embed_model`)
+            batch_size: Maximum inputs per request (WatsonX accepts up to 1000)
+            max_batch_chars: Maximum total characters per request
+            concurrency: Chunk requests in flight at once
+            truncate_input_tokens: Let WatsonX truncate inputs longer than this many tokens
+            deadline: Time budget for all chunks, in seconds or as a shared `Deadline`
+            lane: Scheduler lane for the chunk requests (default: the client's `lane`)
+            tenant: Caller id checked against the scheduler's per-tenant limits
+            
+        Returns:
+            C-contiguous float32 NumPy array of shape ``(len(texts), dim)``, rows in input order
+        """
+        np = require_numpy()
+        if isinstance(texts, str):
+            raise TypeError('embed() takes a sequence of texts; use embed_one() for a single text')
+        texts = list(texts)
+        model = model or self.embed_model
+        deadline = self._deadline(deadline)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        url = f"{self.base_url}{EMBED_PATH}"
+        ranges = chunk_ranges(texts, batch_size, max_batch_chars)
+        record = self.instrumentation.start('embed', model) if self.instrumentation else None
+        input_tokens = 0
+        out = None
+        try:
+            if len(ranges) == 1:
+                out, input_tokens = self._embed_chunk(url, model, texts, truncate_input_tokens, record, deadline,
+                                                      lane, tenant)
+            else:
+                pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(ranges))),
+                                          thread_name_prefix='watsonx-embed')
+                try:
+                    futures = {pool.submit(self._embed_chunk, url, model, texts[start:end], truncate_input_tokens,
+                                           record, deadline, lane, tenant): start for start, end in ranges}
+                    for future in as_completed(futures):
+                        vectors, tokens = future.result()
+                        if out is None:
+                            out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                        start = futures[future]
+                        out[start:start + len(vectors)] = vectors
+                        input_tokens += tokens
+                finally:
+                    pool.shutdown(wait=True, cancel_futures=True)
+        except Exception as e:
+            if record is not None:
+                self.instrumentation.finish(record, e)
+            raise
+        if record is not None:
+            record.set_usage({'prompt_tokens': input_tokens, 'completion_tokens': 0, 'total_tokens': input_tokens})
+            self.instrumentation.finish(record)
+        return out
+
+    def _embed_chunk(self, url: str, model: str, texts: List[str], truncate_input_tokens: Optional[int],
+                     record: Optional[CallRecord], deadline: Optional[Deadline] = None,
+                     lane: Optional[str] = None, tenant: Optional[str] = None):
+        payload = build_embed_payload(model, self.project_id, texts, truncate_input_tokens)
+        resp = self._post_json(url, payload, record=record, deadline=deadline, lane=lane, tenant=tenant)
+        if resp.status_code != 200 and logger.isEnabledFor(logging.WARNING):
+            logger.warning("WatsonX error %s: %s", resp.status_code, resp.text[:500])
+        resp.raise_for_status()
+        result = loads(resp.content)
+        tokens = int(result.get('input_token_count') or 0)
+        if self.rate_governor is not None and tokens:
+            self.rate_governor.refund_tokens(estimate_tokens(payload) - tokens)
+        return parse_embeddings(result, len(texts)), tokens
+
+    def embed_one(self, text: str, model: Optional[str] = None, deadline: Union[Deadline, float, None] = None):
+        """Embed a single text, batched with concurrent `embed_one` calls from other threads.
+        
+        Calls arriving within a few milliseconds share one request (see
+        `embeddings.EmbeddingBatcher`); `deadline` bounds this caller's wait.
+        Returns a float32 vector.
+        """
+        model = model or self.embed_model
+        batcher = self._embed_batchers.get(model)
+        if batcher is None:
+            with self._embed_lock:
+                batcher = self._embed_batchers.get(model)
+                if batcher is None:
+                    batcher = self._embed_batchers[model] = EmbeddingBatcher(
+                        lambda batch: self.embed(batch, model=model))
+        return batcher.submit(text, self._deadline(deadline))
+
+
+def _import_openai():
+    # Imported on first use so WatsonX-only processes never pay for the openai package
+    try:
+        import openai
+    except Exception as e:
+        raise RuntimeError('openai package not installed') from e
+    return openai
+
+
+class OpenAIClient(BatchGenerateMixin):
     def __init__(self, api_key: str, model: str = 'gpt-4o'):
-        if openai is None:
-            raise RuntimeError('openai package not installed')
-        openai.api_key = api_key
+        self._openai = _import_openai()
+        self._openai.api_key = api_key
         self.model = model
 
-    def generate(self, prompt: str, max_tokens: int = 512, **kwargs) -> Dict[str, Any]:
+    def generate(self, prompt: str, max_tokens: int = 512, conversation: Optional[Conversation] = None,
+                 deadline: Union[Deadline, float, None] = None, **kwargs) -> Dict[str, Any]:
         # Use Chat Completions style for modern OpenAI models
-        messages = [{'role': 'user', 'content': prompt}]
-        resp = openai.ChatCompletion.create(model=self.model, messages=messages, max_tokens=max_tokens, **kwargs)
+        if deadline is not None:
+            kwargs['request_timeout'] = Deadline.coerce(deadline).timeout()
+        if conversation is not None:
+            messages = conversation.prepare(prompt, max_tokens)
+        else:
+            messages = [{'role': 'user', 'content': prompt}]
+        try:
+            resp = self._openai.ChatCompletion.create(model=self.model, messages=messages, max_tokens=max_tokens, **kwargs)
+        except BaseException:
+            if conversation is not None:
+                conversation.pop()
+            raise
+        if conversation is not None:
+            conversation.add_assistant(extract_text_from_response(resp))
         return resp
 
 